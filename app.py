@@ -6,11 +6,24 @@ Supports: YouTube, Instagram, Facebook, TikTok
 import os
 import re
 import sys
+import signal
+import asyncio
 import logging
+from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile, InputMediaPhoto, InputMediaVideo
+from telegram import (
+    Chat,
+    Message,
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+)
 from telegram.ext import (
     ApplicationBuilder,
     ContextTypes,
@@ -19,8 +32,33 @@ from telegram.ext import (
     filters,
 )
 
-from downloaders import YouTubeDownloader, InstagramDownloader, FacebookDownloader, TikTokDownloader
-from utils import cleanup_old_files, cleanup_all_except_active, upload_to_gofile
+from downloaders import YouTubeDownloader, InstagramDownloader, FacebookDownloader, TikTokDownloader, DownloadPlan, EXECUTOR, PROCESSES, COOKIES, ARTIFACTS, REMUX_STATS
+from downloaders.instagram import INSTALOADER_POOL
+from downloaders.postprocess import MP4_VIDEO_CODECS, MP4_AUDIO_CODECS
+from utils import (
+    cleanup_all_except_active,
+    make_job_dir,
+    remove_job_dir,
+    FileIdCache,
+    SingleFlight,
+    JobScheduler,
+    QueueFullError,
+    ProgressEditor,
+    make_bar,
+    WebhookServer,
+    create_job_queue,
+    MediaDelivery,
+    StreamingUploader,
+    LocalBotApiFiles,
+    DownloadPipe,
+    LinkResolver,
+    parse_limits,
+    DiskJanitor,
+    DiskAdmission,
+    VideoSplitter,
+    GofileUploader,
+)
+from utils.delivery import MAX_UPLOAD_SIZE
 
 
 # ---------------------------------------------------------
@@ -49,7 +87,73 @@ load_dotenv(".env", override=True)
 # STORAGE
 # ---------------------------------------------------------
 USER_LINK = {}  # chat_id → link
-ACTIVE_DOWNLOADS = set()  # файли, які зараз завантажуються
+ACTIVE_DOWNLOADS = set()  # директорії задач, які зараз працюють
+
+# (platform, media_id, mode, quality) → Telegram file_id's вже надісланих медіа
+FILE_CACHE = FileIdCache(
+    Path(os.getenv("FILE_ID_CACHE_PATH", "cache/file_ids.sqlite3")),
+    ttl_seconds=int(os.getenv("FILE_ID_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+    max_entries=int(os.getenv("FILE_ID_CACHE_MAX_ENTRIES", "50000")),
+)
+
+# (platform, media_id, mode, quality) → завантаження, яке зараз виконується
+IN_FLIGHT = SingleFlight()
+
+
+# Всі редагування статус-повідомлень йдуть через один сервіс з лімітами Telegram
+PROGRESS = ProgressEditor(
+    edits_per_second=float(os.getenv("PROGRESS_EDITS_PER_SEC", "20")),
+    min_interval=float(os.getenv("PROGRESS_MIN_INTERVAL", "1.0")),
+)
+
+# Короткі посилання (vm.tiktok.com, fb share, fb.watch) → справжня адреса
+RESOLVER = LinkResolver(ttl=int(os.getenv("LINK_CACHE_TTL_HOURS", "24")) * 3600)
+
+# Відправка в Telegram паралельно із завантаженням (формати без merge/конвертації)
+PIPELINE_ENABLED = os.getenv("PIPELINE_UPLOADS", "1") == "1"
+
+# Local-mode Bot API на спільному томі: файли передаються шляхом (file://), без HTTP
+LOCAL_API = LocalBotApiFiles(
+    Path(os.environ["BOT_API_LOCAL_DIR"]),
+    server_dir=os.getenv("BOT_API_LOCAL_SERVER_DIR") or None,
+    grace=float(os.getenv("BOT_API_LOCAL_GRACE", "600")),
+) if os.getenv("BOT_API_LOCAL_DIR") else None
+
+# Відео понад ліміт Telegram - частинами, розрізаними по keyframes без перекодування
+SPLITTER = VideoSplitter(max_size=MAX_UPLOAD_SIZE) if os.getenv("SPLIT_OVERSIZED", "1") == "1" else None
+
+# gofile.io для файлів, які не йдуть у Telegram: пул з'єднань + кешований список серверів
+GOFILE = GofileUploader(
+    api_url=os.getenv("GOFILE_API_URL", "https://api.gofile.io"),
+    upload_url=os.getenv("GOFILE_UPLOAD_URL", "https://{server}.gofile.io/contents/uploadfile"),
+    refresh_interval=float(os.getenv("GOFILE_REFRESH_INTERVAL", "300")),
+    attempts=int(os.getenv("DELIVERY_ATTEMPTS", "3")),
+    chunk_size=int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024,
+)
+
+# Доставка файлів у Telegram: ретраї + gofile.io fallback для всіх платформ
+DELIVERY = MediaDelivery(
+    attempts=int(os.getenv("DELIVERY_ATTEMPTS", "3")),
+    uploader=StreamingUploader(chunk_size=int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024),
+    local=LOCAL_API,
+    splitter=SPLITTER,
+    gofile=GOFILE,
+)
+
+# Бюджет розміру файлу: якість обирається так, щоб вміститись у нього ще до завантаження
+SIZE_TARGET = int(os.getenv("VIDEO_SIZE_TARGET_MB", "0")) * 1024 * 1024 or DELIVERY.max_size
+
+# Черга завантажень: handlers тільки ставлять задачі, виконує scheduler
+SCHEDULER = JobScheduler(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_JOBS", "4")),
+    platform_limits=parse_limits(os.getenv("PLATFORM_JOB_LIMITS", "youtube=2,instagram=2,facebook=2,tiktok=2")),
+    max_queued=int(os.getenv("MAX_QUEUED_JOBS", "100")),
+    max_queued_per_chat=int(os.getenv("MAX_QUEUED_JOBS_PER_CHAT", "5")),
+)
+
+# Durable черга для окремих воркерів: "local" - виконуємо в цьому процесі
+JOB_BACKEND = os.getenv("JOB_BACKEND", "local")
+JOB_QUEUE = create_job_queue(JOB_BACKEND) if JOB_BACKEND != "local" else None
 
 
 # ---------------------------------------------------------
@@ -57,9 +161,35 @@ ACTIVE_DOWNLOADS = set()  # файли, які зараз завантажуют
 # ---------------------------------------------------------
 AUDIO = "audio"
 VIDEO = "video"
+VIDEO_QUALITIES = ("360", "480", "720")
+
+# Скільки чекати незавершений prefetch перед показом кнопок якості, сек
+PREFETCH_WAIT = float(os.getenv("YOUTUBE_PREFETCH_WAIT", "3"))
+
+# Custom Telegram Bot API server з підтримкою великих файлів (до 2GB)
+BOT_API_URL = "https://tgbot.agro-post.com/bot"
+BOT_API_FILE_URL = "https://tgbot.agro-post.com/file/bot"
 DOWNLOAD_DIR = Path("downloads")
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 
+# Фонове прибирання downloads/ за бюджетом байтів (LRU), активні задачі не чіпає
+JANITOR = DiskJanitor(
+    DOWNLOAD_DIR,
+    budget_bytes=int(float(os.getenv("DISK_BUDGET_GB", "10")) * 1024 ** 3),
+    min_free_bytes=int(float(os.getenv("DISK_MIN_FREE_GB", "1")) * 1024 ** 3),
+    interval=float(os.getenv("JANITOR_INTERVAL", "60")),
+    min_age=float(os.getenv("JANITOR_MIN_AGE_MINUTES", "30")) * 60,
+    protected=lambda: ACTIVE_DOWNLOADS,
+)
+
+# Резервування місця під завантаження до його старту (той самий бюджет, що й у janitor)
+ADMISSION = DiskAdmission(
+    DOWNLOAD_DIR,
+    budget_bytes=JANITOR.budget_bytes,
+    min_free_bytes=JANITOR.min_free_bytes,
+    default_size=int(os.getenv("ADMISSION_DEFAULT_MB", "200")) * 1024 * 1024,
+)
+
 
 # ---------------------------------------------------------
 # DOWNLOADERS
@@ -72,36 +202,257 @@ DOWNLOADERS = [
 ]
 
 
+# Один regex на всі платформи: група d<N> → DOWNLOADERS[N]
+DISPATCH = re.compile(
+    "|".join(
+        f"(?P<d{n}>{'|'.join(f'(?:{p})' for p in downloader.PATTERNS)})"
+        for n, downloader in enumerate(DOWNLOADERS)
+    ),
+    re.I,
+)
+
+
 def get_downloader(url: str):
     """Get appropriate downloader for URL"""
-    for downloader in DOWNLOADERS:
-        downloader_name = downloader.__class__.__name__
-        can_handle = downloader.can_handle(url)
-        log.debug(f"🔍 {downloader_name}.can_handle({url[:50]}...) = {can_handle}")
-        if can_handle:
-            log.info(f"✅ Using {downloader_name}")
-            return downloader
-    log.warning(f"❌ No downloader found for: {url}")
-    return None
+    match = DISPATCH.search(url)
+    if not match:
+        log.warning(f"❌ No downloader found for: {url}")
+        return None
+    downloader = DOWNLOADERS[int(match.lastgroup[1:])]
+    log.info(f"✅ Using {downloader.__class__.__name__}")
+    return downloader
 
 
 # ---------------------------------------------------------
 # HELPER FUNCTIONS
 # ---------------------------------------------------------
-async def safe_edit_message(message, text: str):
-    """Safely edit message, ignoring timeout errors"""
+async def safe_edit_message(message, text: str, final: bool = False):
+    """Safely edit message via ProgressEditor (flood control aware)"""
+    await PROGRESS.edit(message, text, final=final)
+
+
+# ---------------------------------------------------------
+# FILE_ID CACHE
+# ---------------------------------------------------------
+async def send_cached(bot, chat_id: int, items: list):
+    """Re-send media by file_id (no download, no upload)"""
+    media = [item for item in items if item["kind"] != "link"]
+    
+    if len(media) > 1:
+        media_types = {
+            "photo": InputMediaPhoto,
+            "video": InputMediaVideo,
+            "audio": InputMediaAudio,
+            "document": InputMediaDocument,
+        }
+        for i in range(0, len(media), 10):  # Max 10 items per group
+            media_group = [
+                media_types[item["kind"]](media=item["file_id"], caption=item.get("caption"))
+                for item in media[i:i + 10]
+            ]
+            await bot.send_media_group(chat_id, media=media_group)
+    
+    elif media:
+        item = media[0]
+        if item["kind"] == "video":
+            await bot.send_video(chat_id, video=item["file_id"], supports_streaming=True, caption=item.get("caption"))
+        elif item["kind"] == "audio":
+            await bot.send_audio(chat_id, audio=item["file_id"])
+        elif item["kind"] == "photo":
+            await bot.send_photo(chat_id, photo=item["file_id"])
+        else:
+            await bot.send_document(chat_id, document=item["file_id"])
+    
+    for item in items:
+        if item["kind"] == "link":
+            await bot.send_message(chat_id, item["text"])
+
+
+async def try_send_from_cache(
+    bot, chat_id: int, downloader, url: str, mode: str, quality: str = "", record_miss: bool = True
+) -> bool:
+    """Send media from file_id cache. Returns True on cache hit"""
+    media_id = downloader.media_id(url)
+    if not media_id:
+        return False
+    
+    # SQLite-запит і commit - не в event loop
+    items = await asyncio.to_thread(FILE_CACHE.get, downloader.PLATFORM, media_id, mode, quality, record_miss=record_miss)
+    if not items:
+        return False
+    
     try:
-        await message.edit_text(text)
+        await send_cached(bot, chat_id, items)
     except Exception as e:
-        log.debug(f"Failed to edit message: {e}")
+        # file_id міг стати невалідним - видаляємо і качаємо заново
+        log.warning(f"⚠️ Cached file_id rejected: {e}")
+        await asyncio.to_thread(FILE_CACHE.invalidate, downloader.PLATFORM, media_id, mode, quality)
+        return False
+    
+    stats = await asyncio.to_thread(FILE_CACHE.stats)
+    log.info(
+        f"⚡ Cache hit {downloader.PLATFORM}/{media_id} ({mode} {quality}) | "
+        f"hits={stats['hits']} misses={stats['misses']} ratio={stats['hit_ratio']:.0%}"
+    )
+    return True
+
+
+async def remember_file_ids(downloader, url: str, mode: str, quality: str, items: list):
+    """Store file_id's of delivered media for next requests"""
+    media_id = downloader.media_id(url)
+    if not media_id or not items:
+        return
+    # Посилання gofile.io тимчасові - такий результат не кешуємо
+    if any(item["kind"] == "link" for item in items):
+        return
+    await asyncio.to_thread(FILE_CACHE.put, downloader.PLATFORM, media_id, mode, quality, items)
 
 
 # ---------------------------------------------------------
-# PROGRESS BAR
+# IN-FLIGHT COALESCING
 # ---------------------------------------------------------
-def make_bar(percent: float):
-    filled = int(percent / 5)
-    return "█" * filled + "░" * (20 - filled)
+def flight_key(downloader, url: str, mode: str, quality: str = ""):
+    """Coalescing key, None if media id is unknown before download"""
+    media_id = downloader.media_id(url)
+    if not media_id:
+        return None
+    return (downloader.PLATFORM, media_id, mode, quality)
+
+
+async def finish_flight(job, downloader, url: str, mode: str, quality: str, delivered: list, error=None):
+    """Cache leader result and hand it to attached requesters"""
+    if not error:
+        try:
+            await remember_file_ids(downloader, url, mode, quality, delivered)
+        except Exception as e:
+            # Без кешу обійдемось, а учасники мають отримати результат
+            log.warning(f"⚠️ Failed to cache file_id's: {e}")
+    if job.followers:
+        log.info(f"🔗 Sharing result of {job.key} with {job.followers} requester(s)")
+    IN_FLIGHT.finish(job, delivered, error)
+
+
+async def follow_flight(job, bot, chat_id: int, status_msg):
+    """Wait for the leader of the same media and re-send its result"""
+    items = await IN_FLIGHT.wait(job)
+    
+    if items:
+        try:
+            await send_cached(bot, chat_id, items)
+            await PROGRESS.delete(status_msg)
+            return
+        except Exception as e:
+            log.warning(f"⚠️ Failed to re-send shared result: {e}")
+            await safe_edit_message(status_msg, f"❌ Помилка: {str(e)[:100]}", final=True)
+            return
+    
+    if job.error:
+        await safe_edit_message(status_msg, f"❌ Помилка: {str(job.error)[:150]}", final=True)
+    else:
+        await safe_edit_message(status_msg, "❌ Не вдалося завантажити", final=True)
+
+
+# ---------------------------------------------------------
+# JOB SCHEDULING
+# ---------------------------------------------------------
+async def prepare_status(bot, chat_id: int, status_msg, text: str):
+    """Reuse status message created by the front-end or send a new one"""
+    if status_msg is None:
+        return await bot.send_message(chat_id, text)
+    await safe_edit_message(status_msg, text)
+    return status_msg
+
+
+def status_message(bot, chat_id: int, message_id: int) -> Message:
+    """Rebuild status message from ids (job came from the durable queue)"""
+    msg = Message(message_id, datetime.now(), Chat(chat_id, Chat.PRIVATE))
+    msg.set_bot(bot)
+    return msg
+
+
+async def run_download(bot, chat_id: int, platform: str, url: str, mode: str, quality: str, status_msg=None):
+    """Run download + delivery for one job"""
+    if platform == YouTubeDownloader.PLATFORM:
+        await download_youtube(bot, chat_id, url, mode, video_quality=quality or None, status_msg=status_msg)
+    elif platform == InstagramDownloader.PLATFORM:
+        await download_instagram(bot, chat_id, url, status_msg=status_msg)
+    elif platform == FacebookDownloader.PLATFORM:
+        await download_facebook(bot, chat_id, url, status_msg=status_msg)
+    elif platform == TikTokDownloader.PLATFORM:
+        await download_tiktok(bot, chat_id, url, status_msg=status_msg)
+    else:
+        raise ValueError(f"Unknown platform: {platform}")
+
+
+async def schedule_download(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    downloader,
+    url: str,
+    mode: str,
+    quality: str,
+):
+    """Put download job into the queue and return immediately"""
+    bot = context.bot
+    chat_id = update.effective_chat.id
+    platform = downloader.PLATFORM
+    
+    # Швидкий шлях: кеш file_id не займає слот і не йде в чергу
+    if await try_send_from_cache(bot, chat_id, downloader, url, mode, quality, record_miss=False):
+        return
+    
+    if JOB_QUEUE is not None:
+        # Окремі воркери (worker.py) заберуть задачу з durable черги
+        status_msg = await bot.send_message(chat_id, "🕐 Запит у черзі...")
+        job_id = await asyncio.to_thread(JOB_QUEUE.put, {
+            "chat_id": chat_id,
+            "platform": platform,
+            "url": url,
+            "mode": mode,
+            "quality": quality,
+            "status_message_id": status_msg.message_id,
+        })
+        log.info(f"📥 Job {job_id} queued ({platform}, chat {chat_id})")
+        return
+    
+    key = flight_key(downloader, url, mode, quality)
+    if IN_FLIGHT.has(key):
+        # Те саме вже качається - приєднуємось одразу, без черги і без слота
+        flight, _ = IN_FLIGHT.join(key)
+        status_msg = await bot.send_message(chat_id, "🔗 Вже завантажується, надішлю щойно буде готово...")
+        if flight.renderer:
+            flight.listeners.append(flight.renderer(status_msg))
+        context.application.create_task(follow_flight(flight, bot, chat_id, status_msg))
+        return
+    
+    state = {"started": False, "notice": None}
+    
+    async def job():
+        state["started"] = True
+        await run_download(bot, chat_id, platform, url, mode, quality, status_msg=state["notice"])
+    
+    try:
+        position = SCHEDULER.submit(chat_id, platform, job)
+    except QueueFullError as e:
+        log.warning(f"🚦 Rejected job for chat {chat_id}: {e}")
+        await bot.send_message(
+            chat_id,
+            "🚦 Бот зараз перевантажений або у вас забагато запитів у черзі.\n"
+            "Спробуйте, будь ласка, трохи пізніше."
+        )
+        return
+    
+    if position > 0:
+        notice = await bot.send_message(chat_id, f"🕐 Ваш запит у черзі, позиція: {position}")
+        if state["started"]:
+            # Задача вже стартувала поки ми відправляли повідомлення
+            try:
+                await notice.delete()
+            except Exception:
+                pass
+        else:
+            # Повідомлення про чергу стане статусом завантаження
+            state["notice"] = notice
 
 
 # ---------------------------------------------------------
@@ -138,12 +489,20 @@ async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
+    # Короткі посилання розгортаємо, варіанти однієї адреси зводимо до канонічної
+    url = downloader.canonical_url(await RESOLVER.resolve(url))
+    if url != url_match.group(0):
+        log.info(f"🔗 Canonical URL: {url}")
+    
     # Зберігаємо URL
     context.user_data["url"] = url
     USER_LINK[chat_id] = url
     
     # Визначаємо тип downloader
     if isinstance(downloader, YouTubeDownloader):
+        # Поки користувач обирає формат - вже витягуємо метадані
+        context.application.create_task(downloader.prefetch(url))
+        
         # YouTube - вибір аудіо/відео
         keyboard = [
             [InlineKeyboardButton("🎵 Audio", callback_data="audio")],
@@ -152,223 +511,223 @@ async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await msg.reply_text("Виберіть формат:", reply_markup=InlineKeyboardMarkup(keyboard))
     
     elif isinstance(downloader, InstagramDownloader):
-        # Instagram - одразу завантажуємо
-        await download_instagram(update, context, url)
+        # Instagram - одразу ставимо в чергу
+        await schedule_download(update, context, downloader, url, "media", "")
     
     elif isinstance(downloader, FacebookDownloader):
-        # Facebook - одразу завантажуємо відео
-        await download_facebook(update, context, url)
+        # Facebook - одразу ставимо в чергу відео
+        await schedule_download(update, context, downloader, url, VIDEO, "720")
     
     elif isinstance(downloader, TikTokDownloader):
-        # TikTok - одразу завантажуємо відео
-        await download_tiktok(update, context, url)
+        # TikTok - одразу ставимо в чергу відео
+        await schedule_download(update, context, downloader, url, VIDEO, "best")
 
 
 # ---------------------------------------------------------
-# DOWNLOAD INSTAGRAM
+# DOWNLOAD + DELIVERY
 # ---------------------------------------------------------
-async def download_instagram(update: Update, context: ContextTypes.DEFAULT_TYPE, url: str):
-    """Download from Instagram"""
-    chat_id = update.effective_chat.id
-    status_msg = await context.bot.send_message(chat_id, "⏳ Завантажую Instagram...")
+async def download_and_deliver(
+    bot,
+    chat_id: int,
+    downloader,
+    url: str,
+    mode: str,
+    quality: str,
+    status_msg,
+    initial_text: str,
+    progress_callback,
+    fetch,
+    error_text=None,
+    media_type_hint: str = VIDEO,
+    pipelined: bool = False,
+):
+    """
+    Common pipeline for every platform:
+    file_id cache → coalescing → plan (quality under SIZE_TARGET, disk
+    reservation) → download → MediaDelivery → cleanup
+
+    Every job downloads into its own downloads/job-<id>/ directory, which
+    is removed as a whole when the job ends (partial files included).
+    fetch(progress, pipe, workdir, plan) runs the downloader and returns (files, media_type),
+    progress_callback(status_msg) builds the per-platform progress renderer.
+    pipelined=True lets a single-file download be uploaded while it is
+    still being written; otherwise (or if the pipe declines) the finished
+    files are delivered.
+    """
+    if await try_send_from_cache(bot, chat_id, downloader, url, mode, quality):
+        if status_msg:
+            await PROGRESS.delete(status_msg)
+        return
     
-    cleanup_old_files(DOWNLOAD_DIR, max_age_minutes=30, active_downloads=ACTIVE_DOWNLOADS)
+    status_msg = await prepare_status(bot, chat_id, status_msg, initial_text)
     
-    async def progress_callback(status, percent, done, total):
-        """Progress updates"""
-        if status == "downloading" and percent > 0:
-            bar = make_bar(percent)
-            await status_msg.edit_text(f"⬇️ Завантаження...\n{bar} {percent:.1f}%")
-        elif status == "processing":
-            await status_msg.edit_text("🔄 Обробка...")
+    job, leader = IN_FLIGHT.join(flight_key(downloader, url, mode, quality), progress_callback(status_msg))
+    if not leader:
+        # Учасник лише чекає на лідера - слот планувальника віддаємо іншим задачам
+        SCHEDULER.pause()
+        await follow_flight(job, bot, chat_id, status_msg)
+        return
+    job.renderer = progress_callback
+    
+    delivered = []  # file_id's / посилання для кешу та інших запитувачів
+    error = None
+    files = []
+    reservation = None
+    workdir = make_job_dir(DOWNLOAD_DIR)
+    ACTIVE_DOWNLOADS.add(str(workdir))
+    
+    pipe = None
+    streamed = None
     
     try:
-        log.info(f"📥 Instagram download started: {url}")
-        downloader = InstagramDownloader()
-        files, media_type = await downloader.download(
-            url, 
-            DOWNLOAD_DIR,
-            progress_callback=progress_callback
-        )
+        try:
+            plan = await plan_download(downloader, url, mode, quality)
+            if not plan.fits:
+                split = SPLITTER is not None and SPLITTER.available and media_type_hint == VIDEO
+                size = f" (~{plan.output_size / 1024 / 1024:.0f} MB)" if plan.output_size is not None else ""
+                await bot.send_message(
+                    chat_id,
+                    f"📦 Файл завеликий для Telegram{size}, "
+                    f"навіть у найнижчій якості. Після завантаження надішлю "
+                    f"{'його кількома частинами' if split else 'посилання на gofile.io'}."
+                )
+            elif plan.quality != quality:
+                size = f" (~{plan.output_size / 1024 / 1024:.0f} MB)" if plan.output_size is not None else ""
+                await bot.send_message(
+                    chat_id,
+                    f"⚠️ {f'{quality}p' if quality else 'Найкраща якість'} не вміщується в ліміт {SIZE_TARGET / 1024 / 1024:.0f} MB, "
+                    f"надсилаю {plan.quality}p{size}"
+                )
+            
+            paused = False
+            
+            def wait_for_disk(position: int):
+                nonlocal paused
+                # Поки чекаємо на диск, слот планувальника може зайняти інша задача
+                paused = SCHEDULER.pause()
+                PROGRESS.report(status_msg, f"💽 Чекаємо на вільне місце на диску, позиція: {position}")
+            
+            reservation = await ADMISSION.acquire(plan.size, workdir, on_wait=wait_for_disk)
+            if paused:
+                await SCHEDULER.resume()
+            
+            # Файл, який не влізе в Telegram, одразу йде шляхом великих файлів - без стрімінгу в Telegram
+            if pipelined and plan.fits and PIPELINE_ENABLED and DELIVERY.local is None:
+                pipe = DownloadPipe(
+                    max_size=DELIVERY.max_size, video_codecs=MP4_VIDEO_CODECS, audio_codecs=MP4_AUDIO_CODECS
+                )
+                streamed = asyncio.create_task(DELIVERY.deliver_pipelined(bot, chat_id, pipe, media_type_hint))
+            
+            log.info(f"📥 {downloader.PLATFORM} download started: {url}")
+            files, media_type = await fetch(job.progress, pipe, workdir, plan)
+        except Exception as e:
+            if pipe:
+                pipe.close(e)
+                await streamed
+            raise
         
-        log.info(f"✅ Downloaded {len(files)} files, type: {media_type}")
+        if pipe:
+            pipe.close()
+            delivered = await streamed or []
+        
+        if delivered:
+            log.info(f"🚰 Delivered while downloading: {files[0].name if files else pipe.name}")
+            await PROGRESS.delete(status_msg)
+            return
         
         if not files:
-            await status_msg.edit_text("❌ Не вдалося завантажити")
+            await safe_edit_message(status_msg, "❌ Не вдалося завантажити", final=True)
             return
         
-        # Додаємо до активних
-        for fp in files:
-            ACTIVE_DOWNLOADS.add(str(fp))
+        log.info(f"✅ Downloaded {len(files)} file(s), type: {media_type}")
         
-        try:
-            await status_msg.edit_text("📤 Відправка в Telegram...")
-            
-            # Перевіряємо загальний розмір для альбомів
-            total_size = sum(fp.stat().st_size for fp in files if fp.exists())
-            max_size = 2 * 1024 * 1024 * 1024  # 2 GB per file (custom API server)
-            
-            # Відправляємо як media group якщо це альбом і всі файли підходять
-            if media_type in ["photo_album", "video_album", "mixed_album"] and len(files) > 1:
-                # Media group (до 10 елементів в Telegram)
-                small_files = [fp for fp in files if fp.exists() and fp.stat().st_size < max_size]
-                
-                if small_files and len(small_files) <= 10:
-                    media_group = []
-                    
-                    for fp in small_files[:10]:  # Max 10 items
-                        ext = fp.suffix.lower()
-                        
-                        with fp.open("rb") as f:
-                            if ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                                media_group.append(InputMediaPhoto(media=f.read()))
-                            else:
-                                media_group.append(InputMediaVideo(media=f.read()))
-                    
-                    if media_group:
-                        await context.bot.send_media_group(chat_id, media=media_group)
-                        await status_msg.delete()
-                        
-                        # Cleanup
-                        for fp in files:
-                            ACTIVE_DOWNLOADS.discard(str(fp))
-                            try:
-                                if fp.exists():
-                                    fp.unlink()
-                                    log.info(f"🗑️ Removed: {fp.name}")
-                            except Exception as e:
-                                log.warning(f"Failed to remove {fp.name}: {e}")
-                        return
-            
-            # Відправляємо файли окремо
-            for fp in files:
-                if not fp.exists():
-                    continue
-                
-                file_size = fp.stat().st_size
-                
-                # Великі файли на gofile
-                if file_size > max_size:
-                    link = await upload_to_gofile(fp)
-                    await context.bot.send_message(
-                        chat_id,
-                        f"✅ Файл завеликий ({file_size / 1024 / 1024:.1f} MB)\n\n"
-                        f"🔗 Завантажено на gofile.io:\n{link}"
-                    )
-                else:
-                    with fp.open("rb") as f:
-                        ext = fp.suffix.lower()
-                        if ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                            await context.bot.send_photo(chat_id, photo=InputFile(f, filename=fp.name))
-                        else:
-                            await context.bot.send_video(
-                                chat_id,
-                                video=InputFile(f, filename=fp.name),
-                                supports_streaming=True
-                            )
-            
-            # Видаляємо статус
-            try:
-                await status_msg.delete()
-            except:
-                pass
+        async def status(text: str):
+            await safe_edit_message(status_msg, text)
         
-        finally:
-            # Очищення
-            for fp in files:
-                ACTIVE_DOWNLOADS.discard(str(fp))
-                try:
-                    if fp.exists():
-                        fp.unlink()
-                        log.info(f"🗑️ Removed: {fp.name}")
-                except Exception as e:
-                    log.warning(f"Failed to remove {fp.name}: {e}")
+        delivered = await DELIVERY.deliver(bot, chat_id, files, media_type, status=status)
+        
+        if any(item["kind"] == "link" for item in delivered):
+            await safe_edit_message(status_msg, "✅ Готово", final=True)
+        else:
+            await PROGRESS.delete(status_msg)
     
     except Exception as e:
-        log.error(f"Instagram download error: {e}", exc_info=True)
-        await status_msg.edit_text(f"❌ Помилка: {str(e)[:100]}")
+        error = e
+        log.error(f"{downloader.PLATFORM} download error: {e}", exc_info=True)
+        text = error_text(e) if error_text else None
+        await safe_edit_message(status_msg, text or f"❌ Помилка: {str(e)[:150]}", final=True)
+    
+    finally:
+        remove_job_dir(workdir)
+        ACTIVE_DOWNLOADS.discard(str(workdir))
+        if reservation:
+            ADMISSION.release(reservation)
+        await finish_flight(job, downloader, url, mode, quality, delivered, error)
+
+
+async def plan_download(downloader, url: str, mode: str, quality: str) -> DownloadPlan:
+    """Quality that fits SIZE_TARGET + expected sizes, requested quality if unknown"""
+    try:
+        plan = await downloader.plan_download(url, mode, quality, max_bytes=SIZE_TARGET, head=RESOLVER.content_length)
+    except Exception as e:
+        log.warning(f"⚠️ Size estimate failed for {url}: {e}")
+        return DownloadPlan(quality)
+    if plan.output_size:
+        log.info(
+            f"📏 Planned {downloader.PLATFORM} download: {plan.quality or 'best'} "
+            f"~{plan.output_size / 1024 / 1024:.0f} MB{'' if plan.fits else ' (over limit)'}"
+        )
+    return plan
+
+
+def percent_progress(processing_text: str):
+    """Renderer for (status, percent, done, total) progress callbacks"""
+    def build(status_msg):
+        def progress_callback(status, percent, done, total):
+            """Progress updates (called from worker thread)"""
+            if status == "downloading":
+                if percent > 0:
+                    bar = make_bar(percent)
+                    PROGRESS.report(status_msg, f"⬇️ Завантаження...\n{bar} {percent:.1f}%")
+                elif done:
+                    PROGRESS.report(status_msg, f"⬇️ Завантаження...\n{done / 1024 / 1024:.1f} MB")
+            elif status in ("processing", "converting"):
+                PROGRESS.report(status_msg, processing_text)
+        return progress_callback
+    return build
+
+
+def text_progress(status_msg):
+    """Renderer for (text) progress callbacks"""
+    def progress(text: str):
+        PROGRESS.report(status_msg, text)
+    return progress
 
 
 # ---------------------------------------------------------
-# DOWNLOAD FACEBOOK
+# DOWNLOAD INSTAGRAM
 # ---------------------------------------------------------
-async def download_facebook(update: Update, context: ContextTypes.DEFAULT_TYPE, url: str):
-    """Download from Facebook"""
-    from downloaders import FacebookDownloader
+async def download_instagram(bot, chat_id: int, url: str, status_msg=None):
+    """Download from Instagram"""
+    downloader = InstagramDownloader()
     
-    chat_id = update.effective_chat.id
-    status_msg = await context.bot.send_message(chat_id, "⏳ Підготовка...")
+    async def fetch(progress, pipe, workdir, plan):
+        return await downloader.download(url, workdir, progress_callback=progress)
     
-    try:
-        downloader = FacebookDownloader()
-        
-        # Progress callback
-        async def progress(text: str):
-            try:
-                await status_msg.edit_text(text)
-            except:
-                pass
-        
-        # Одразу завантажуємо відео (якість 720p за замовчуванням)
-        files, media_type = await downloader.download(
-            url,
-            download_type=VIDEO,
-            quality="720",
-            progress_callback=progress
-        )
-        
-        if not files:
-            await status_msg.edit_text("❌ Не вдалося завантажити")
-            return
-        
-        # Надсилаємо файл
-        for fp in files:
-            ACTIVE_DOWNLOADS.add(str(fp))
-            
-            file_size = fp.stat().st_size
-            
-            # Якщо файл більше 2GB - завантажуємо на gofile.io
-            if file_size > 2 * 1024 * 1024 * 1024:
-                await safe_edit_message(status_msg, f"📤 Файл завеликий ({file_size / 1024 / 1024:.1f} MB), завантажую на gofile.io...")
-                link = await upload_to_gofile(fp)
-                await context.bot.send_message(
-                    chat_id,
-                    f"✅ Файл завеликий ({file_size / 1024 / 1024:.1f} MB)\n\n"
-                    f"🔗 Завантажено на gofile.io:\n{link}"
-                )
-            else:
-                await safe_edit_message(status_msg, f"📤 Надсилаю відео ({file_size / 1024 / 1024:.1f} MB)...")
-                with fp.open("rb") as f:
-                    await context.bot.send_video(
-                        chat_id,
-                        video=InputFile(f, filename=fp.name),
-                        supports_streaming=True,
-                        read_timeout=120,
-                        write_timeout=120
-                    )
-            
-            # Видаляємо статус
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-            # Очищення
-            ACTIVE_DOWNLOADS.discard(str(fp))
-            try:
-                if fp.exists():
-                    fp.unlink()
-                    log.info(f"🗑️ Removed: {fp.name}")
-            except Exception as e:
-                log.warning(f"Failed to remove {fp.name}: {e}")
-    
-    except Exception as e:
-        log.error(f"Facebook download error: {e}", exc_info=True)
-        error_msg = str(e)
-        
-        # Спеціальне повідомлення для Facebook Reels
-        if 'Cannot parse data' in error_msg or '/reel/' in url:
-            await status_msg.edit_text(
+    await download_and_deliver(
+        bot, chat_id, downloader, url, "media", "", status_msg,
+        "⏳ Завантажую Instagram...", percent_progress("🔄 Обробка..."), fetch,
+    )
+
+
+# ---------------------------------------------------------
+# DOWNLOAD FACEBOOK
+# ---------------------------------------------------------
+def facebook_error_text(url: str):
+    """Спеціальне повідомлення для Facebook Reels"""
+    def error_text(e: Exception):
+        if 'Cannot parse data' in str(e) or '/reel/' in url:
+            return (
                 "⚠️ Facebook Reels зараз не підтримуються через зміни в API Facebook.\n\n"
                 "✅ Працює:\n"
                 "• Звичайні відеопости\n"
@@ -376,225 +735,91 @@ async def download_facebook(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 "• fb.watch посилання\n\n"
                 "🔄 Спробуйте інше відео або зачекайте оновлення yt-dlp."
             )
-        else:
-            await status_msg.edit_text(f"❌ Помилка: {error_msg[:150]}")
+        return None
+    return error_text
+
+
+async def download_facebook(bot, chat_id: int, url: str, status_msg=None):
+    """Download from Facebook"""
+    downloader = FacebookDownloader()
+    
+    async def fetch(progress, pipe, workdir, plan):
+        # Одразу завантажуємо відео (якість 720p за замовчуванням)
+        return await downloader.download(
+            url, download_type=VIDEO, quality="720", progress_callback=progress, pipe=pipe, download_dir=workdir
+        )
+    
+    await download_and_deliver(
+        bot, chat_id, downloader, url, VIDEO, "720", status_msg,
+        "⏳ Підготовка...", text_progress, fetch, facebook_error_text(url),
+        pipelined=True,
+    )
 
 
 # ---------------------------------------------------------
 # DOWNLOAD TIKTOK
 # ---------------------------------------------------------
-async def download_tiktok(update: Update, context: ContextTypes.DEFAULT_TYPE, url: str):
+async def download_tiktok(bot, chat_id: int, url: str, status_msg=None):
     """Download from TikTok"""
-    from downloaders import TikTokDownloader
+    downloader = TikTokDownloader()
     
-    chat_id = update.effective_chat.id
-    status_msg = await context.bot.send_message(chat_id, "⏳ Підготовка...")
-    
-    try:
-        downloader = TikTokDownloader()
-        
-        # Progress callback
-        async def progress(text: str):
-            try:
-                await status_msg.edit_text(text)
-            except:
-                pass
-        
-        # Завантажуємо відео
-        files, media_type = await downloader.download(
-            url,
-            download_type=VIDEO,
-            progress_callback=progress
+    async def fetch(progress, pipe, workdir, plan):
+        return await downloader.download(
+            url, download_type=VIDEO, progress_callback=progress, pipe=pipe, download_dir=workdir
         )
-        
-        if not files:
-            await status_msg.edit_text("❌ Не вдалося завантажити")
-            return
-        
-        # Надсилаємо файл
-        for fp in files:
-            ACTIVE_DOWNLOADS.add(str(fp))
-            
-            file_size = fp.stat().st_size
-            
-            # Якщо файл більше 2GB - завантажуємо на gofile.io
-            if file_size > 2 * 1024 * 1024 * 1024:
-                await safe_edit_message(status_msg, f"📤 Файл завеликий ({file_size / 1024 / 1024:.1f} MB), завантажую на gofile.io...")
-                link = await upload_to_gofile(fp)
-                await context.bot.send_message(
-                    chat_id,
-                    f"✅ Файл завеликий ({file_size / 1024 / 1024:.1f} MB)\n\n"
-                    f"🔗 Завантажено на gofile.io:\n{link}"
-                )
-            else:
-                await safe_edit_message(status_msg, f"📤 Надсилаю відео ({file_size / 1024 / 1024:.1f} MB)...")
-                with fp.open("rb") as f:
-                    await context.bot.send_video(
-                        chat_id,
-                        video=InputFile(f, filename=fp.name),
-                        supports_streaming=True,
-                        read_timeout=120,
-                        write_timeout=120
-                    )
-            
-            # Видаляємо статус
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-            # Очищення
-            ACTIVE_DOWNLOADS.discard(str(fp))
-            try:
-                if fp.exists():
-                    fp.unlink()
-                    log.info(f"🗑️ Removed: {fp.name}")
-            except Exception as e:
-                log.warning(f"Failed to remove {fp.name}: {e}")
     
-    except Exception as e:
-        log.error(f"TikTok download error: {e}", exc_info=True)
-        await safe_edit_message(status_msg, f"❌ Помилка: {str(e)[:150]}")
+    await download_and_deliver(
+        bot, chat_id, downloader, url, VIDEO, "best", status_msg,
+        "⏳ Підготовка...", text_progress, fetch,
+        pipelined=True,
+    )
 
 
 # ---------------------------------------------------------
 # DOWNLOAD YOUTUBE
 # ---------------------------------------------------------
 async def download_youtube(
-    update: Update,
-    context: ContextTypes.DEFAULT_TYPE,
+    bot,
+    chat_id: int,
     url: str,
     mode: str,
-    video_quality: str = None
+    video_quality: str = None,
+    status_msg=None
 ):
     """Download from YouTube"""
-    chat_id = update.effective_chat.id
-    status_msg = await context.bot.send_message(chat_id, "⏳ Починаємо...")
-    
-    cleanup_old_files(DOWNLOAD_DIR, max_age_minutes=30, active_downloads=ACTIVE_DOWNLOADS)
-    
-    async def progress_callback(status, percent, done, total):
-        """Progress updates"""
-        if status == "downloading":
-            if percent > 0:
-                bar = make_bar(percent)
-                await status_msg.edit_text(f"⬇️ Завантаження...\n{bar} {percent:.1f}%")
-            else:
-                mb = done / 1024 / 1024
-                await status_msg.edit_text(f"⬇️ Завантаження...\n{mb:.1f} MB")
-        elif status == "converting":
-            await status_msg.edit_text("🔄 Конвертуємо...")
+    downloader = YouTubeDownloader()
+    quality = (video_quality or "") if mode == VIDEO else ""
     
-    try:
-        downloader = YouTubeDownloader()
+    async def fetch(progress, pipe, workdir, plan):
         fp, media_type = await downloader.download(
             url,
-            DOWNLOAD_DIR,
+            workdir,
             mode=mode,
-            video_quality=video_quality,
-            progress_callback=progress_callback
+            # План міг знизити якість, щоб файл вмістився в ліміт
+            video_quality=plan.quality or video_quality,
+            progress_callback=progress,
+            pipe=pipe
         )
-        
-        ACTIVE_DOWNLOADS.add(str(fp))
-        
-        try:
-            if not fp.exists():
-                await status_msg.edit_text("❌ Файл не знайдено")
-                return
-            
-            file_size = fp.stat().st_size
-            max_size = 2 * 1024 * 1024 * 1024  # 2 GB (custom API server)
-            
-            if file_size > max_size:
-                await status_msg.edit_text(f"📤 Файл завеликий, завантажую на GoFile.io...")
-                link = await upload_to_gofile(fp)
-                file_type = "Відео" if mode == VIDEO else "Аудіо"
-                await status_msg.edit_text(
-                    f"✅ {file_type} завелике ({file_size / 1024 / 1024:.1f} MB)\n\n"
-                    f"🔗 Завантажено на gofile.io:\n{link}"
-                )
-                return
-            
-            await status_msg.edit_text("📤 Завантаження в Telegram...")
-            
-            # Retry mechanism for custom API server
-            max_retries = 3
-            retry_count = 0
-            last_error = None
-            
-            while retry_count < max_retries:
-                try:
-                    with fp.open("rb") as f:
-                        if mode == AUDIO:
-                            await context.bot.send_audio(
-                                chat_id, 
-                                audio=InputFile(f, filename=fp.name),
-                                read_timeout=300,
-                                write_timeout=300,
-                                connect_timeout=60,
-                                pool_timeout=60
-                            )
-                        else:
-                            await context.bot.send_video(
-                                chat_id,
-                                video=InputFile(f, filename=fp.name),
-                                supports_streaming=True,
-                                read_timeout=300,
-                                write_timeout=300,
-                                connect_timeout=60,
-                                pool_timeout=60
-                            )
-                    break  # Success, exit retry loop
-                    
-                except Exception as e:
-                    last_error = e
-                    retry_count += 1
-                    error_msg = str(e)
-                    error_type = type(e).__name__
-                    
-                    log.warning(f"⚠️ Upload attempt {retry_count}/{max_retries} failed: [{error_type}] {error_msg}")
-                    
-                    # Логуємо детальну інформацію для діагностики
-                    if hasattr(e, '__dict__'):
-                        log.debug(f"Error details: {e.__dict__}")
-                    
-                    if retry_count < max_retries:
-                        import asyncio
-                        await asyncio.sleep(2 ** retry_count)  # Exponential backoff: 2s, 4s, 8s
-                    else:
-                        # All retries failed, upload to gofile.io as fallback
-                        log.error(f"❌ All {max_retries} upload attempts failed, using gofile.io fallback")
-                        await status_msg.edit_text(f"📤 Telegram API недоступний, завантажую на GoFile.io...")
-                        link = await upload_to_gofile(fp)
-                        file_type = "Відео" if mode == VIDEO else "Аудіо"
-                        await status_msg.edit_text(
-                            f"✅ {file_type} завантажено ({file_size / 1024 / 1024:.1f} MB)\n\n"
-                            f"🔗 Telegram API тимчасово недоступний, файл на gofile.io:\n{link}"
-                        )
-                        return
-            
-            try:
-                await status_msg.delete()
-            except:
-                pass
-        
-        finally:
-            ACTIVE_DOWNLOADS.discard(str(fp))
-            try:
-                if fp.exists():
-                    fp.unlink()
-                    log.info(f"🗑️ Removed: {fp.name}")
-            except Exception as e:
-                log.warning(f"Failed to remove {fp.name}: {e}")
+        return ([fp] if fp.exists() else []), media_type
     
-    except Exception as e:
-        log.error(f"YouTube download error: {e}")
-        await status_msg.edit_text(f"❌ Помилка: {e}")
+    await download_and_deliver(
+        bot, chat_id, downloader, url, mode, quality, status_msg,
+        "⏳ Починаємо...", percent_progress("🔄 Конвертуємо..."), fetch,
+        media_type_hint=mode,
+        # Аудіо проходить FFmpegExtractAudio (mp3 або remux у m4a) - готовий файл тільки після нього
+        pipelined=mode == VIDEO,
+    )
 
 
 # ---------------------------------------------------------
 # CALLBACK HANDLER
 # ---------------------------------------------------------
+def quality_label(quality: str, size) -> str:
+    if not size:
+        return f"{quality}p"
+    return f"{quality}p · ~{size / 1024 / 1024:.0f} MB"
+
+
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button clicks"""
     query = update.callback_query
@@ -610,11 +835,13 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     if mode == VIDEO:
-        # Вибір якості
+        # Вибір якості, з орієнтовним розміром якщо метадані вже є
+        downloader = YouTubeDownloader()
+        info = await downloader.cached_info(url, timeout=PREFETCH_WAIT)
+        sizes = downloader.estimate_sizes(info, VIDEO_QUALITIES) if info else {}
         keyboard = [
-            [InlineKeyboardButton("360p", callback_data="video_360")],
-            [InlineKeyboardButton("480p", callback_data="video_480")],
-            [InlineKeyboardButton("720p", callback_data="video_720")],
+            [InlineKeyboardButton(quality_label(q, sizes.get(q)), callback_data=f"video_{q}")]
+            for q in VIDEO_QUALITIES
         ]
         await query.edit_message_text(
             "Оберіть якість:\n(нижча якість = менший розмір)",
@@ -627,43 +854,169 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except:
             pass
         quality = mode.split("_")[1]
-        await download_youtube(update, context, url, VIDEO, video_quality=quality)
+        await schedule_download(update, context, YouTubeDownloader(), url, VIDEO, quality)
     
     elif mode == AUDIO:
         try:
             await query.message.delete()
         except:
             pass
-        await download_youtube(update, context, url, AUDIO)
+        await schedule_download(update, context, YouTubeDownloader(), url, AUDIO, "")
 
 
 # ---------------------------------------------------------
 # MAIN
 # ---------------------------------------------------------
+async def post_init(app):
+    await PROGRESS.start()
+    await SCHEDULER.start()
+    await JANITOR.start()
+    await GOFILE.start()
+
+
+async def post_shutdown(app):
+    await JANITOR.stop()
+    await GOFILE.stop()
+    await SCHEDULER.stop()
+    await PROGRESS.stop()
+    await DELIVERY.close()
+    await RESOLVER.close()
+    log.info(f"📊 Progress edits: {PROGRESS.stats()}")
+    log.info(f"📊 Uploads: {DELIVERY.uploader.stats()}")
+    log.info(f"📊 Disk: {JANITOR.stats()}")
+
+
+def store_stats() -> dict:
+    """Stats that query SQLite/Redis (blocking - call from a worker thread)"""
+    return {
+        "file_cache": FILE_CACHE.stats(),
+        "artifacts": ARTIFACTS.stats() if ARTIFACTS else None,
+        "job_queue": JOB_QUEUE.stats() if JOB_QUEUE else None,
+    }
+
+
+async def health_stats() -> dict:
+    """Stats for /healthz"""
+    return {
+        "scheduler": SCHEDULER.stats(),
+        "in_flight": IN_FLIGHT.stats(),
+        "progress": PROGRESS.stats(),
+        "uploads": DELIVERY.uploader.stats(),
+        "gofile": GOFILE.stats(),
+        "local_api": LOCAL_API.stats() if LOCAL_API else None,
+        "resolver": RESOLVER.stats(),
+        "executor": EXECUTOR.stats(),
+        "processes": PROCESSES.stats() if PROCESSES else None,
+        "cookies": COOKIES.stats(),
+        "instaloader": INSTALOADER_POOL.stats() if INSTALOADER_POOL else None,
+        "disk": JANITOR.stats(),
+        "admission": ADMISSION.stats(),
+        "remux": REMUX_STATS.stats(),
+        "split": SPLITTER.stats() if SPLITTER else None,
+        # SQLite COUNT(*) і запити до Redis - не в event loop
+        **await asyncio.to_thread(store_stats),
+    }
+
+
+async def run_webhook(app):
+    """Webhook mode: embedded aiohttp server instead of long polling"""
+    secret = os.getenv("WEBHOOK_SECRET")
+    if not secret:
+        raise RuntimeError("WEBHOOK_SECRET not set")
+    
+    public_url = os.getenv("WEBHOOK_URL")
+    path = os.getenv("WEBHOOK_PATH", "/telegram")
+    server = WebhookServer(
+        app,
+        secret_token=secret,
+        path=path,
+        host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        health=health_stats,
+    )
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    async with app:
+        await post_init(app)
+        await app.start()
+        await server.start()
+        
+        # Кілька реплік за балансувальником реєструють одну й ту ж адресу
+        if public_url:
+            await app.bot.set_webhook(
+                url=public_url.rstrip("/") + path,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            log.info(f"🔗 Webhook set to {public_url.rstrip('/')}{path}")
+        
+        try:
+            await stop.wait()
+        finally:
+            await server.stop()
+            await app.stop()
+            await post_shutdown(app)
+
+
 def main():
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN not set")
     
-    # Custom Telegram Bot API server з підтримкою великих файлів (до 2GB)
     app = (ApplicationBuilder()
            .token(token)
-           .base_url("https://tgbot.agro-post.com/bot")
-           .base_file_url("https://tgbot.agro-post.com/file/bot")
+           .base_url(BOT_API_URL)
+           .base_file_url(BOT_API_FILE_URL)
+           .local_mode(LOCAL_API is not None)
+           .concurrent_updates(True)
+           .post_init(post_init)
+           .post_shutdown(post_shutdown)
            .build())
     
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_url))
     app.add_handler(CallbackQueryHandler(handle_callback))
     
-    cleanup_all_except_active(DOWNLOAD_DIR, active_downloads=ACTIVE_DOWNLOADS)
+    # З durable чергою файли належать воркерам - front-end їх не чіпає
+    if JOB_QUEUE is None:
+        cleanup_all_except_active(DOWNLOAD_DIR, active_downloads=ACTIVE_DOWNLOADS)
+        if LOCAL_API:
+            LOCAL_API.sweep()
     
     log.info("🤖 Bot started")
     log.info("📦 Downloaders: YouTube, Instagram, Facebook, TikTok")
+    log.info(f"🗂️ Job backend: {JOB_BACKEND}")
+    log.info(f"🧵 Executor: {EXECUTOR.max_workers} threads, limits {EXECUTOR.platform_limits}")
+    if PROCESSES:
+        log.info(f"🧩 Process mode: worker recycled after {PROCESSES.max_jobs} jobs, stall timeout {PROCESSES.stall_timeout:.0f}s")
+    if LOCAL_API:
+        log.info(f"📁 Local Bot API mode: {LOCAL_API.shared_dir} → {LOCAL_API.server_dir}")
     
     try:
-        app.run_polling(close_loop=False)
+        if os.getenv("BOT_MODE", "polling") == "webhook":
+            asyncio.run(run_webhook(app))
+        else:
+            app.run_polling(close_loop=False)
     finally:
-        cleanup_all_except_active(DOWNLOAD_DIR, active_downloads=ACTIVE_DOWNLOADS)
+        EXECUTOR.shutdown()
+        log.info(f"📊 Executor: {EXECUTOR.stats()}")
+        if PROCESSES:
+            PROCESSES.shutdown()
+            log.info(f"📊 Worker processes: {PROCESSES.stats()}")
+        if INSTALOADER_POOL:
+            INSTALOADER_POOL.close()
+        if JOB_QUEUE is None:
+            cleanup_all_except_active(DOWNLOAD_DIR, active_downloads=ACTIVE_DOWNLOADS)
+        else:
+            JOB_QUEUE.close()
+        log.info(f"📊 File cache: {FILE_CACHE.stats()}")
+        FILE_CACHE.close()
+        if ARTIFACTS:
+            log.info(f"📊 Artifacts: {ARTIFACTS.stats()}")
+            ARTIFACTS.close()
 
 
 if __name__ == "__main__":
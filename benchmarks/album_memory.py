@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Album upload memory benchmark
+
+Sends albums of N synthetic video files to a local fake Bot API server and
+reports peak RSS of the sending process for two paths:
+
+    memory  - python-telegram-bot with InputMediaVideo(f.read()) (old path)
+    stream  - utils.StreamingUploader (files streamed from disk)
+
+Each run happens in a fresh subprocess, so peak RSS is not shared between runs.
+
+    python benchmarks/album_memory.py --sizes 2,5,10 --file-mb 50
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TOKEN = "123:bench"
+
+
+def peak_rss_mb() -> float:
+    # Linux: ru_maxrss у KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def fake_bot_api(port: int) -> web.AppRunner:
+    """Reads request bodies to the end and answers like the Bot API"""
+    message = {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}}
+
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        async for _ in request.content.iter_chunked(1024 * 1024):
+            pass
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        elif method == "sendMediaGroup":
+            result = [message]
+        else:
+            result = message
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application(client_max_size=0)
+    app.router.add_post("/bot{token}/{method}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def send_memory(files, port: int):
+    from telegram import Bot, InputMediaVideo
+
+    async with Bot(TOKEN, base_url=f"http://127.0.0.1:{port}/bot") as bot:
+        media = []
+        for fp in files:
+            with fp.open("rb") as f:
+                media.append(InputMediaVideo(media=f.read()))
+        await bot.send_media_group(1, media=media, read_timeout=300, write_timeout=300)
+
+
+async def send_stream(files, port: int):
+    from telegram import Bot
+    from utils.multipart import StreamingUploader
+
+    uploader = StreamingUploader()
+    bot = Bot(TOKEN, base_url=f"http://127.0.0.1:{port}/bot")
+    try:
+        await uploader.send_media_group(bot, 1, [{"type": "video", "path": fp} for fp in files])
+    finally:
+        await uploader.close()
+
+
+def child(mode: str, files, port: int):
+    baseline = peak_rss_mb()
+    send = send_memory if mode == "memory" else send_stream
+    asyncio.run(send([Path(f) for f in files], port))
+    print(json.dumps({"baseline": baseline, "peak": peak_rss_mb()}))
+
+
+def run_case(mode: str, files, port: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--port", str(port), *map(str, files)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+async def main_async(args):
+    runner = await fake_bot_api(args.port)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for n in range(max(args.sizes)):
+                fp = Path(tmp) / f"clip{n}.mp4"
+                with fp.open("wb") as f:
+                    for _ in range(args.file_mb):
+                        f.write(b"\0" * 1024 * 1024)
+                files.append(fp)
+
+            print(f"{'items':>5} {'album MB':>9} {'memory peak':>12} {'stream peak':>12}")
+            for size in args.sizes:
+                album = files[:size]
+                row = {}
+                for mode in ("memory", "stream"):
+                    # Сервер живе в цьому процесі - child тільки відправляє
+                    row[mode] = await asyncio.to_thread(run_case, mode, album, args.port)
+                print(
+                    f"{size:>5} {size * args.file_mb:>9} "
+                    f"{row['memory']['peak']:>10.1f}MB {row['stream']['peak']:>10.1f}MB"
+                )
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,2,5,10", help="album sizes, comma separated")
+    parser.add_argument("--file-mb", type=int, default=20, help="size of each file, MB")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--child", choices=("memory", "stream"), help=argparse.SUPPRESS)
+    parser.add_argument("files", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.files, args.port)
+        return
+
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
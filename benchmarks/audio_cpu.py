@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Audio post-processing CPU benchmark
+
+Generates synthetic tracks in the containers YouTube serves audio in and
+runs yt-dlp's FFmpegExtractAudio on each with the bot's own settings
+(downloaders.youtube.audio_options), measuring CPU seconds of the ffmpeg
+children per track:
+
+    mp3          - AUDIO_FORMAT=mp3: decode + MP3 192k encode
+    passthrough  - AUDIO_FORMAT=passthrough: AAC kept as is / remuxed,
+                   encode only for Opus-only videos
+
+Needs ffmpeg and ffprobe in PATH.
+
+    python benchmarks/audio_cpu.py --tracks 5 --seconds 240
+"""
+
+import argparse
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Що віддає YouTube: AAC у m4a (itag 140) та Opus у webm (itag 251)
+SOURCES = {
+    "m4a/aac": ("m4a", ["-c:a", "aac", "-b:a", "128k"]),
+    "webm/opus": ("webm", ["-c:a", "libopus", "-b:a", "160k"]),
+}
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def make_track(path: Path, seconds: int, codec_args):
+    # Шум замість синусоїди - кодек не спрощує собі роботу на тиші
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"anoisesrc=d={seconds}:c=pink:a=0.3",
+         "-ac", "2", "-ar", "48000", *codec_args, str(path)],
+        check=True,
+    )
+
+
+def run_case(codec: str, track: Path, workdir: Path) -> tuple:
+    """(cpu seconds, wall seconds, output ext) of one post-processing run"""
+    import yt_dlp
+    from yt_dlp.postprocessor import FFmpegExtractAudioPP
+    from downloaders.youtube import audio_options
+
+    options = audio_options(codec)["postprocessors"][0]
+    src = workdir / track.name
+    shutil.copy(track, src)
+
+    with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        pp = FFmpegExtractAudioPP(ydl, preferredcodec=options["preferredcodec"], preferredquality=options["preferredquality"])
+        cpu, wall = children_cpu(), time.perf_counter()
+        _, info = pp.run({"filepath": str(src), "ext": src.suffix[1:]})
+        cpu, wall = children_cpu() - cpu, time.perf_counter() - wall
+
+    for leftover in workdir.iterdir():
+        leftover.unlink()
+    return cpu, wall, info["ext"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=3, help="tracks per source format")
+    parser.add_argument("--seconds", type=int, default=180, help="length of each track")
+    args = parser.parse_args()
+
+    if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+        sys.exit("ffmpeg/ffprobe not found in PATH")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        workdir = tmp / "work"
+        workdir.mkdir()
+
+        print(f"{'source':>10} {'path':>12} {'output':>7} {'cpu s/track':>12} {'wall s/track':>13}")
+        for source, (ext, codec_args) in SOURCES.items():
+            tracks = []
+            for n in range(args.tracks):
+                track = tmp / f"track{n}.{ext}"
+                make_track(track, args.seconds, codec_args)
+                tracks.append(track)
+
+            for path, codec in (("mp3", "mp3"), ("passthrough", "m4a")):
+                results = [run_case(codec, track, workdir) for track in tracks]
+                cpu = sum(r[0] for r in results) / len(results)
+                wall = sum(r[1] for r in results) / len(results)
+                print(f"{source:>10} {path:>12} {results[0][2]:>7} {cpu:>12.2f} {wall:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
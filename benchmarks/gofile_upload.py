@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+gofile.io upload benchmark
+
+Uploads N synthetic files to a local gofile stand-in (/servers + per-server
+/contents/uploadfile) and compares two clients:
+
+    legacy  - the old upload_to_gofile: new aiohttp session per file,
+              /servers on every upload, always servers[0], no retry
+    pooled  - utils.GofileUploader: one connection pool, cached server
+              list, least-loaded server, retry on another server
+
+The stand-in can add latency to /servers and fail a share of uploads, to
+show what caching and retries buy.
+
+    python benchmarks/gofile_upload.py --files 20 --file-mb 5 --concurrency 4 --fail-rate 0.1
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SERVERS = ["store1", "store2", "store3"]
+
+
+class StandIn:
+    """Fake gofile API: counts requests, connections and uploads per server"""
+
+    def __init__(self, api_latency: float, fail_rate: float):
+        self.api_latency = api_latency
+        self.fail_rate = fail_rate
+        self.reset()
+
+    def reset(self):
+        self.server_calls = 0
+        self.connections = set()
+        self.uploads = Counter()
+        self.failures = 0
+
+    async def servers(self, request: web.Request) -> web.Response:
+        self.server_calls += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.api_latency)
+        return web.json_response({"status": "ok", "data": {"servers": [{"name": s, "zone": "eu"} for s in SERVERS]}})
+
+    async def upload(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        server = request.match_info["server"]
+        async for _ in request.content.iter_chunked(1024 * 1024):
+            pass
+        if random.random() < self.fail_rate:
+            self.failures += 1
+            return web.Response(status=502)
+        self.uploads[server] += 1
+        return web.json_response({"status": "ok", "data": {"downloadPage": f"https://gofile.io/d/{server}"}})
+
+
+async def start_stand_in(port: int, stand_in: StandIn) -> web.AppRunner:
+    app = web.Application(client_max_size=0)
+    app.router.add_get("/servers", stand_in.servers)
+    app.router.add_post("/{server}/contents/uploadfile", stand_in.upload)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def legacy_upload(filepath: Path, base: str) -> str:
+    """Old upload_to_gofile pointed at the stand-in"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base}/servers") as resp:
+            data = await resp.json()
+            server = data["data"]["servers"][0]["name"]
+        with open(filepath, "rb") as f:
+            form = aiohttp.FormData()
+            form.add_field("file", f, filename=filepath.name)
+            async with session.post(f"{base}/{server}/contents/uploadfile", data=form) as resp:
+                result = await resp.json(content_type=None)
+                if result["status"] != "ok":
+                    raise Exception(f"Upload failed: {result}")
+                return result["data"]["downloadPage"]
+
+
+async def run_case(mode: str, files, base: str, concurrency: int) -> tuple:
+    """(wall seconds, failed uploads)"""
+    from utils.upload import GofileUploader
+
+    uploader = GofileUploader(api_url=base, upload_url=base + "/{server}/contents/uploadfile", base_delay=0.05)
+    if mode == "pooled":
+        await uploader.start()
+    limit = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def one(fp: Path):
+        nonlocal failed
+        async with limit:
+            try:
+                if mode == "legacy":
+                    await legacy_upload(fp, base)
+                else:
+                    await uploader.upload(fp)
+            except Exception:
+                failed += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(fp) for fp in files))
+    finally:
+        await uploader.stop()
+    return time.perf_counter() - started, failed
+
+
+async def main_async(args):
+    stand_in = StandIn(args.api_ms / 1000, args.fail_rate)
+    runner = await start_stand_in(args.port, stand_in)
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for n in range(args.files):
+                fp = Path(tmp) / f"video{n}.mp4"
+                with fp.open("wb") as f:
+                    for _ in range(args.file_mb):
+                        f.write(b"\0" * 1024 * 1024)
+                files.append(fp)
+
+            print(f"{'client':>7} {'wall s':>7} {'failed':>7} {'/servers':>9} {'conns':>6}  uploads per server")
+            for mode in ("legacy", "pooled"):
+                stand_in.reset()
+                random.seed(args.seed)
+                wall, failed = await run_case(mode, files, base, args.concurrency)
+                spread = " ".join(f"{s}={stand_in.uploads[s]}" for s in SERVERS)
+                print(
+                    f"{mode:>7} {wall:>7.2f} {failed:>7} {stand_in.server_calls:>9} "
+                    f"{len(stand_in.connections):>6}  {spread}"
+                )
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    # Попередження про ретраї заглушили б таблицю
+    logging.getLogger("ytbot").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20, help="files to upload")
+    parser.add_argument("--file-mb", type=int, default=5, help="size of each file, MB")
+    parser.add_argument("--concurrency", type=int, default=4, help="uploads in flight")
+    parser.add_argument("--api-ms", type=int, default=150, help="latency of /servers, ms")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of uploads answered with HTTP 502")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8098)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 """Downloaders for various platforms"""
 
+from .base import DownloadPlan, EXECUTOR, PROCESSES, COOKIES, ARTIFACTS
+from .postprocess import REMUX_STATS
 from .youtube import YouTubeDownloader
 from .instagram import InstagramDownloader
 from .facebook import FacebookDownloader
 from .tiktok import TikTokDownloader
 
-__all__ = ['YouTubeDownloader', 'InstagramDownloader', 'FacebookDownloader', 'TikTokDownloader']
+__all__ = ['YouTubeDownloader', 'InstagramDownloader', 'FacebookDownloader', 'TikTokDownloader', 'DownloadPlan', 'EXECUTOR', 'PROCESSES', 'COOKIES', 'ARTIFACTS', 'REMUX_STATS']
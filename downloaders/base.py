@@ -1,17 +1,82 @@
 """Base downloader class"""
 
+import os
 import re
 import logging
+import functools
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, List, Optional, Tuple
+
+from utils.artifacts import ArtifactCache
+from utils.cookies import CookieStore
+from utils.executors import ExecutorManager, default_max_workers, parse_limits
+from utils.multipart import TITLES_FILE
+from utils.processes import ProcessWorkerPool
 
 log = logging.getLogger("ytbot")
 
+# Спільний пул потоків для всіх платформ (yt-dlp, instaloader, gallery-dl)
+EXECUTOR = ExecutorManager(
+    max_workers=int(os.getenv("EXECUTOR_MAX_WORKERS", "0")) or default_max_workers(
+        Path("downloads"), disk_gb_per_task=float(os.getenv("EXECUTOR_DISK_GB_PER_TASK", "2"))
+    ),
+    platform_limits=parse_limits(os.getenv("EXECUTOR_PLATFORM_LIMITS", "youtube=4,instagram=4,facebook=2,tiktok=2")),
+)
+
+# EXECUTOR_MODE=process - sync-код завантажувачів виконується в окремих процесах
+PROCESSES = ProcessWorkerPool(
+    max_jobs=int(os.getenv("PROCESS_MAX_JOBS", "20")),
+    stall_timeout=float(os.getenv("PROCESS_STALL_TIMEOUT", "600")),
+    job_timeout=float(os.getenv("PROCESS_JOB_TIMEOUT", "3600")),
+) if os.getenv("EXECUTOR_MODE", "thread") == "process" else None
+
+# Один розбір cookies.txt на процес, перечитується при зміні файлу
+COOKIES = CookieStore(
+    os.getenv("COOKIES_FILE", "/var/www/ytdl-cookies.txt"),
+    check_interval=float(os.getenv("COOKIES_CHECK_INTERVAL", "5")),
+)
+
+# Готові файли на диску (повтор без file_id, аудіо з уже завантаженого відео); 0 - вимкнено
+ARTIFACT_CACHE_GB = float(os.getenv("ARTIFACT_CACHE_GB", "5"))
+ARTIFACTS = ArtifactCache(
+    Path(os.getenv("ARTIFACT_CACHE_DIR", "cache/artifacts")),
+    max_bytes=int(ARTIFACT_CACHE_GB * 1024 ** 3),
+) if ARTIFACT_CACHE_GB > 0 else None
+
+
+def output_options(download_dir: Path) -> dict:
+    """
+    yt-dlp naming for a job dir: deterministic <id>.<ext> on disk, titles
+    recorded in TITLES_FILE - uploads take the display name from there
+    """
+    return {
+        "outtmpl": str(download_dir / "%(id)s.%(ext)s"),
+        "print_to_file": {"after_move": [("%(filepath)j\t%(title)j", str(download_dir / TITLES_FILE))]},
+    }
+
+
+class DownloadPlan:
+    """What a job will download, decided from metadata before any media bytes are fetched"""
+    
+    def __init__(self, quality: str, size: Optional[int] = None, output_size: Optional[int] = None, fits: bool = True):
+        self.quality = quality          # якість, яку реально качаємо (може бути нижчою за запитану)
+        self.size = size                # скільки місця на диску потрібно (None - невідомо)
+        self.output_size = output_size  # очікуваний розмір готового файлу
+        self.fits = fits                # False - навіть найнижча якість більша за ліміт
+
 
 class BaseDownloader(ABC):
     """Base class for all downloaders"""
     
+    PLATFORM = ""
+    
+    # Regex-и з однією групою - ID медіа на платформі
+    MEDIA_ID_PATTERNS = []
+    
+    # Канонічна адреса медіа за ID ("" - URL лишається як є)
+    CANONICAL_URL = ""
+    
     @staticmethod
     @abstractmethod
     def can_handle(url: str) -> bool:
@@ -34,6 +99,58 @@ class BaseDownloader(ABC):
         """
         pass
     
+    async def plan_download(self, url: str, mode: str, quality: str, max_bytes: int = 0, head=None) -> DownloadPlan:
+        """
+        Quality and expected sizes before downloading. Platforms that learn
+        sizes only during the download keep the requested quality with
+        unknown size. head(url, headers) returns Content-Length of a media URL.
+        """
+        return DownloadPlan(quality)
+    
+    async def run_sync(self, fn: Callable, *args, **kwargs):
+        """
+        Run blocking download code in the shared executor. In process mode
+        fn must be picklable (a method, not a closure); a ``progress_hook``
+        kwarg stays in this process and receives relayed events.
+        """
+        if PROCESSES is not None:
+            return await EXECUTOR.run(self.PLATFORM, functools.partial(PROCESSES.call, fn, *args, **kwargs))
+        return await EXECUTOR.run(self.PLATFORM, functools.partial(fn, *args, **kwargs))
+    
+    @classmethod
+    def media_id(cls, url: str) -> Optional[str]:
+        """Extract platform media id from URL (None for short/unknown links)"""
+        for pattern in cls.MEDIA_ID_PATTERNS:
+            match = re.search(pattern, url, re.I)
+            if match:
+                return match.group(1)
+        return None
+    
+    @classmethod
+    def canonical_url(cls, url: str) -> str:
+        """Single URL form for all variants of the same media"""
+        media_id = cls.media_id(url)
+        if not cls.CANONICAL_URL or not media_id:
+            return url
+        return cls.CANONICAL_URL.format(id=media_id)
+    
+    @staticmethod
+    def downloaded_paths(info: dict) -> List[Path]:
+        """
+        Final files reported by yt-dlp (requested_downloads[].filepath is
+        updated by postprocessors: merge, convert, extract audio), playlist
+        entries included - no guessing by glob.
+        """
+        paths = []
+        for entry in info.get("entries") or [info]:
+            if not entry:
+                continue
+            for download in entry.get("requested_downloads") or []:
+                filepath = download.get("filepath")
+                if filepath and Path(filepath).exists():
+                    paths.append(Path(filepath))
+        return paths
+    
     @staticmethod
     def clean_filename(filename: str) -> str:
         """Clean filename from special characters"""
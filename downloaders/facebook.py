@@ -1,21 +1,28 @@
 """Facebook/Meta video downloader using yt-dlp with cookies"""
 
 import re
-import os
 import logging
 from pathlib import Path
 from typing import List, Tuple
 import yt_dlp
 
-from .base import BaseDownloader
+from .base import BaseDownloader, COOKIES, output_options
+from .postprocess import REMUX_STATS, add_remux_pp, record_reports
 
 log = logging.getLogger("ytbot")
 
-COOKIES_FILE = "/var/www/ytdl-cookies.txt"
-
 class FacebookDownloader(BaseDownloader):
     """Download videos from Facebook, Instagram stories, and other Meta platforms"""
     
+    PLATFORM = "facebook"
+    
+    MEDIA_ID_PATTERNS = [
+        r'facebook\.com/.*?[?&]v=(\d+)',
+        r'facebook\.com/(?:[\w.]+/)?videos/(?:[\w.-]+/)?(\d+)',
+        r'facebook\.com/reel/(\d+)',
+        r'fb\.watch/([\w-]+)',
+    ]
+    
     PATTERNS = [
         r'(?:https?://)?(?:www\.|m\.|web\.)?facebook\.com/',
         r'(?:https?://)?(?:www\.)?fb\.watch/',
@@ -32,7 +39,9 @@ class FacebookDownloader(BaseDownloader):
         url: str,
         download_type: str = "video",
         quality: str = "720",
-        progress_callback=None
+        progress_callback=None,
+        pipe=None,
+        download_dir: Path = Path("downloads")
     ) -> Tuple[List[Path], str]:
         """
         Download Facebook video
@@ -41,134 +50,93 @@ class FacebookDownloader(BaseDownloader):
             url: Facebook video URL (posts, reels, stories, watch)
             download_type: Only "video" supported
             quality: Video quality (360, 480, 720)
-            progress_callback: Async callback for progress updates
+            progress_callback: Sync callback (text), called from worker thread
+            pipe: Optional DownloadPipe, gets progress hooks for streaming upload
+            download_dir: Job working directory (files are taken from yt-dlp's reported paths)
             
         Returns:
             Tuple of (list of file paths, media type)
         """
-        from concurrent.futures import ThreadPoolExecutor
-        import asyncio
-        
-        POOL = ThreadPoolExecutor(max_workers=1)
-        loop = asyncio.get_running_loop()
-        
         # Clean URL - remove tracking parameters
         url = re.sub(r'[?&](mibextid|sfnsn|story_fbid|substory_index)=[^&]*', '', url)
         url = re.sub(r'\?$', '', url)
         
-        # Expand short share links
-        if '/share/r/' in url or '/share/v/' in url:
-            log.info(f"🔄 Expanding short link...")
-            try:
-                import urllib.request
-                req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-                response = urllib.request.urlopen(req, timeout=10)
-                url = response.url
-                log.info(f"📍 Expanded to: {url}")
-            except Exception as e:
-                log.warning(f"Could not expand link: {e}, trying original URL")
+        # Короткі /share/ посилання розгортає LinkResolver ще до черги
         
         log.info(f"📥 Facebook download started: {url}")
         
-        def sync_download():
-            """Synchronous download in thread pool"""
-            download_dir = Path("downloads")
-            download_dir.mkdir(exist_ok=True)
-            
-            # Check if cookies file exists
-            cookies_available = os.path.exists(COOKIES_FILE)
-            if not cookies_available:
-                log.warning("⚠️ Cookies file not found, Facebook downloads may fail")
-            
-            # yt-dlp options for Facebook
-            ydl_opts = {
-                'format': self._get_format_string(quality),
-                'outtmpl': str(download_dir / '%(title).50s-%(id)s.%(ext)s'),
-                'quiet': False,
-                'no_warnings': False,
-                'extract_flat': False,
-                'merge_output_format': 'mp4',
-                'postprocessors': [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4',
-                }],
-            }
-            
-            # Add cookies if available
-            if cookies_available:
-                ydl_opts['cookiefile'] = COOKIES_FILE
-                log.info("🍪 Using cookies for authentication")
-            
-            # Add progress hook
-            if progress_callback:
-                def progress_hook(d):
-                    if d['status'] == 'downloading':
-                        try:
-                            percent = d.get('_percent_str', '0%').strip()
-                            speed = d.get('_speed_str', 'N/A').strip()
-                            eta = d.get('_eta_str', 'N/A').strip()
-                            
-                            message = f"⬇️ Downloading: {percent}"
-                            if speed != 'N/A':
-                                message += f" | {speed}"
-                            if eta != 'N/A':
-                                message += f" | ETA: {eta}"
-                            
-                            # Call async callback from thread
-                            from asyncio import run_coroutine_threadsafe
-                            run_coroutine_threadsafe(
-                                progress_callback(message),
-                                loop
-                            )
-                        except Exception as e:
-                            log.error(f"Progress hook error: {e}")
-                
-                ydl_opts['progress_hooks'] = [progress_hook]
-            
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    log.info(f"🎬 Downloading Facebook video (quality: {quality}p)...")
-                    info = ydl.extract_info(url, download=True)
-                    
-                    if not info:
-                        raise Exception("Failed to extract video info")
-                    
-                    # Find downloaded file
-                    title = info.get('title', 'video')
-                    video_id = info.get('id', '')
-                    
-                    # Try multiple patterns to find the file
-                    patterns = [
-                        f"*{video_id}*.mp4",
-                        f"*{video_id}*.mkv",
-                        f"{self.clean_filename(title)[:30]}*.mp4",
-                    ]
-                    
-                    files = []
-                    for pattern in patterns:
-                        found = list(download_dir.glob(pattern))
-                        if found:
-                            files = [found[0]]
-                            break
-                    
-                    if not files:
-                        # Last resort: get newest video file
-                        video_files = list(download_dir.glob("*.mp4")) + list(download_dir.glob("*.mkv"))
-                        if video_files:
-                            files = [max(video_files, key=lambda p: p.stat().st_mtime)]
-                    
-                    if not files:
-                        raise Exception("Downloaded file not found")
-                    
-                    log.info(f"✅ Downloaded: {files[0].name}")
-                    return files, "video"
-                    
-            except Exception as e:
-                log.error(f"Facebook download error: {e}")
-                raise
+        progress_hook = None
+        if progress_callback or pipe:
+            def progress_hook(d):
+                if pipe:
+                    pipe.feed(d)
+                if progress_callback and d['status'] == 'downloading':
+                    try:
+                        percent = d.get('_percent_str', '0%').strip()
+                        speed = d.get('_speed_str', 'N/A').strip()
+                        eta = d.get('_eta_str', 'N/A').strip()
+                        
+                        message = f"⬇️ Downloading: {percent}"
+                        if speed != 'N/A':
+                            message += f" | {speed}"
+                        if eta != 'N/A':
+                            message += f" | ETA: {eta}"
+                        
+                        # Callback is thread-safe and non-blocking
+                        progress_callback(message)
+                    except Exception as e:
+                        log.error(f"Progress hook error: {e}")
+        
+        files, media_type, reports = await self.run_sync(
+            self._download_sync, url, quality, download_dir, REMUX_STATS.transcode_cost, progress_hook=progress_hook
+        )
+        record_reports(self.PLATFORM, reports)
+        return files, media_type
+    
+    def _download_sync(self, url, quality, download_dir, transcode_cost, progress_hook=None):
+        """Blocking part of download(): runs in an executor thread or a worker process"""
+        download_dir.mkdir(parents=True, exist_ok=True)
+        
+        # yt-dlp options for Facebook
+        ydl_opts = {
+            'format': self._get_format_string(quality),
+            **output_options(download_dir),
+            'quiet': False,
+            'no_warnings': False,
+            'extract_flat': False,
+            'merge_output_format': 'mp4',
+        }
+        
+        if progress_hook:
+            ydl_opts['progress_hooks'] = [progress_hook]
         
-        # Run in thread pool
-        return await loop.run_in_executor(POOL, sync_download)
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                # Замість FFmpegVideoConvertor: mp4 лишається як є, інше - remux, перекодування тільки несумісних потоків
+                remux = add_remux_pp(ydl, transcode_cost)
+                # Cookies зі спільного COOKIES замість cookiefile (без розбору файлу на кожне завантаження)
+                if COOKIES.apply(ydl.cookiejar, "facebook.com"):
+                    log.info("🍪 Using cookies for authentication")
+                else:
+                    log.warning("⚠️ No Facebook cookies, Facebook downloads may fail")
+                log.info(f"🎬 Downloading Facebook video (quality: {quality}p)...")
+                info = ydl.extract_info(url, download=True)
+                
+                if not info:
+                    raise Exception("Failed to extract video info")
+                
+                # Final path from yt-dlp (after merge/convert), not a glob
+                files = self.downloaded_paths(info)[-1:]
+                
+                if not files:
+                    raise Exception("Downloaded file not found")
+                
+                log.info(f"✅ Downloaded: {files[0].name}")
+                return files, "video", remux.reports
+                
+        except Exception as e:
+            log.error(f"Facebook download error: {e}")
+            raise
     
     def _get_format_string(self, quality: str) -> str:
         """
@@ -1,15 +1,15 @@
 """Instagram downloader using yt-dlp and instaloader"""
 
+import os
 import re
 import time
-import asyncio
 from pathlib import Path
 from typing import Optional, Tuple, List
-from concurrent.futures import ThreadPoolExecutor
 
 import yt_dlp
 
-from .base import BaseDownloader, log
+from utils.session_pool import SessionPool
+from .base import BaseDownloader, COOKIES, log, output_options
 
 try:
     import instaloader
@@ -19,12 +19,66 @@ except ImportError:
     log.warning("⚠️ instaloader not available, photo posts may fail")
 
 
-POOL = ThreadPoolExecutor(max_workers=4)
+if INSTALOADER_AVAILABLE:
+    class RotatingRateController(instaloader.RateController):
+        """429 → exception instead of sleeping for minutes: the pool rotates the session"""
+        
+        def handle_429(self, query_type: str) -> None:
+            raise instaloader.exceptions.TooManyRequestsException("429 Too Many Requests")
+
+
+def new_instaloader():
+    """Instaloader with Instagram cookies; its requests session is reused by the pool"""
+    L = instaloader.Instaloader(
+        download_videos=False,
+        download_video_thumbnails=False,
+        download_geotags=False,
+        download_comments=False,
+        save_metadata=False,
+        compress_json=False,
+        filename_pattern="{shortcode}_{mediacount}",
+        rate_controller=RotatingRateController,
+    )
+    
+    # Instagram cookies зі спільного COOKIES (файл вже розібраний)
+    if not COOKIES.apply(L.context._session.cookies, "instagram.com"):
+        log.warning("⚠️ No Instagram cookies, Instagram photo downloads may fail")
+    return L
+
+
+def instaloader_healthy(L) -> bool:
+    """Instagram clears sessionid when it logs the session out - then rebuild it"""
+    if "sessionid" not in COOKIES.names("instagram.com"):
+        return True
+    return any(c.name == "sessionid" and c.value for c in L.context._session.cookies)
+
+
+# Теплі instaloader-сесії; перестворюються при оновленні cookies
+INSTALOADER_POOL = SessionPool(
+    factory=new_instaloader,
+    close=lambda L: L.close(),
+    size=int(os.getenv("INSTALOADER_POOL_SIZE", "2")),
+    max_age=float(os.getenv("INSTALOADER_SESSION_MAX_AGE", "3600")),
+    cooldown=float(os.getenv("INSTALOADER_RATE_LIMIT_COOLDOWN", "300")),
+    version=lambda: COOKIES.version,
+    health_check=instaloader_healthy,
+    name="instaloader",
+) if INSTALOADER_AVAILABLE else None
 
 
 class InstagramDownloader(BaseDownloader):
     """Download from Instagram (posts, reels, stories, IGTV)"""
     
+    PLATFORM = "instagram"
+    
+    MEDIA_ID_PATTERNS = [
+        r'instagram\.com/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)',
+        r'instagr\.am/(?:p|reels?|tv)/([\w-]+)',
+    ]
+    
+    # Пости, reels та IGTV мають спільний простір shortcode
+    CANONICAL_URL = "https://www.instagram.com/p/{id}/"
+    
     PATTERNS = [
         r'instagram\.com/p/',      # posts
         r'instagram\.com/reel/',   # reels
@@ -50,7 +104,7 @@ class InstagramDownloader(BaseDownloader):
         Args:
             url: Instagram URL
             download_dir: Directory to save files
-            progress_callback: Callback for progress updates
+            progress_callback: Sync callback (status, percent, done, total), called from worker thread
         
         Returns:
             Tuple[List[Path], str]: (filepaths, media_type)
@@ -61,11 +115,37 @@ class InstagramDownloader(BaseDownloader):
         url = re.sub(r'\?.*$', '', url)
         log.info(f"🔗 Clean URL: {url}")
         
-        last_update = [0]
-        
         def progress_hook(d):
-            # Progress hook runs in thread, skip for now
-            pass
+            if not progress_callback:
+                return
+            
+            if d["status"] == "downloading":
+                total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+                done = d.get("downloaded_bytes", 0)
+                if total > 0:
+                    progress_callback("downloading", done / total * 100, done, total)
+            
+            elif d["status"] == "finished":
+                progress_callback("processing", 100, 0, 0)
+        
+        files, media_type = await self.run_sync(self._download_sync, url, download_dir, progress_hook=progress_hook)
+        
+        # Clean filenames
+        cleaned_files = []
+        for fp in files:
+            if fp.exists():
+                clean_name = self.clean_filename(fp.name)
+                if clean_name != fp.name:
+                    new_fp = fp.parent / clean_name
+                    fp.rename(new_fp)
+                    fp = new_fp
+                    log.info(f"📝 Renamed to: {clean_name}")
+                cleaned_files.append(fp)
+        
+        return cleaned_files, media_type
+    
+    def _download_sync(self, url, download_dir, progress_hook):
+        """Blocking part of download(): runs in an executor thread or a worker process"""
         
         def sync_download():
             """Download using yt-dlp → instaloader → gallery-dl"""
@@ -102,8 +182,7 @@ class InstagramDownloader(BaseDownloader):
             """Download using yt-dlp"""
             log.info("🔄 Trying yt-dlp...")
             opts = {
-                "cookiefile": "/var/www/ytdl-cookies.txt",
-                "outtmpl": str(download_dir / "%(title)s_%(autonumber)s.%(ext)s"),
+                **output_options(download_dir),
                 "quiet": False,  # Show more info
                 "no_warnings": False,
                 "progress_hooks": [progress_hook],
@@ -118,6 +197,7 @@ class InstagramDownloader(BaseDownloader):
             media_type = "video"
             
             with yt_dlp.YoutubeDL(opts) as ydl:
+                COOKIES.apply(ydl.cookiejar, "instagram.com")
                 info = ydl.extract_info(url, download=True)
                 
                 # Check if it's a carousel (multiple items)
@@ -129,10 +209,8 @@ class InstagramDownloader(BaseDownloader):
                     for entry in info["entries"]:
                         if not entry:
                             continue
-                        filepath = ydl.prepare_filename(entry)
-                        fp = Path(filepath)
-                        
-                        if fp.exists():
+                        # Шляхи, які повідомив yt-dlp, а не вгадані
+                        for fp in self.downloaded_paths(entry):
                             files.append(fp)
                             
                             # Classify by extension and format info
@@ -157,10 +235,7 @@ class InstagramDownloader(BaseDownloader):
                 
                 else:
                     # Single item
-                    filepath = ydl.prepare_filename(info)
-                    fp = Path(filepath)
-                    
-                    if fp.exists():
+                    for fp in self.downloaded_paths(info)[-1:]:
                         files.append(fp)
                         
                         # Detect if photo or video
@@ -188,108 +263,97 @@ class InstagramDownloader(BaseDownloader):
             
             shortcode = match.group(1)
             
-            # Setup instaloader with cookies support
-            L = instaloader.Instaloader(
-                download_videos=False,
-                download_video_thumbnails=False,
-                download_geotags=False,
-                download_comments=False,
-                save_metadata=False,
-                compress_json=False,
-                dirname_pattern=str(download_dir),
-                filename_pattern="{shortcode}_{mediacount}"
-            )
-            
-            # Try to load cookies if available
-            cookies_file = Path("/var/www/ytdl-cookies.txt")
-            if cookies_file.exists():
+            # Тепла сесія з пулу: keep-alive з'єднання та cookies вже налаштовані
+            with INSTALOADER_POOL.lease() as lease:
+                L = lease.session
+                L.dirname_pattern = str(download_dir)
+                
                 try:
-                    # Load cookies from Netscape format
-                    import http.cookiejar
-                    cj = http.cookiejar.MozillaCookieJar(str(cookies_file))
-                    cj.load(ignore_discard=True, ignore_expires=True)
+                    # Download post
+                    post = instaloader.Post.from_shortcode(L.context, shortcode)
                     
-                    # Extract Instagram cookies
-                    for cookie in cj:
-                        if 'instagram.com' in cookie.domain:
-                            L.context._session.cookies.set_cookie(cookie)
+                    files = []
+                    media_type = "photo"
                     
-                    log.info("🍪 Loaded Instagram cookies")
-                except Exception as e:
-                    log.warning(f"Failed to load cookies: {e}")
-            else:
-                log.warning("⚠️ No cookies file found, Instagram photo downloads may fail")
-            
-            try:
-                # Download post
-                post = instaloader.Post.from_shortcode(L.context, shortcode)
-                
-                files = []
-                media_type = "photo"
-                
-                # Download all items in post
-                if post.typename == 'GraphSidecar':  # Carousel
-                    media_type = "photo_album"
-                    count = post.mediacount
-                    log.info(f"📦 Downloading carousel with {count} items...")
-                    
-                    L.download_post(post, target=str(download_dir))
+                    # Download all items in post
+                    if post.typename == 'GraphSidecar':  # Carousel
+                        media_type = "photo_album"
+                        count = post.mediacount
+                        log.info(f"📦 Downloading carousel with {count} items...")
+                        
+                        L.download_post(post, target=str(download_dir))
+                        
+                        # Find downloaded files - instaloader uses pattern: shortcode_count_index.ext
+                        for i in range(1, count + 1):
+                            pattern = f"{shortcode}_{count}_{i}.*"
+                            found = list(download_dir.glob(pattern))
+                            for fp in found:
+                                if fp.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
+                                    files.append(fp)
+                                    break
+                        
+                        log.info(f"📦 Photo album: {len(files)} photos downloaded")
                     
-                    # Find downloaded files - instaloader uses pattern: shortcode_count_index.ext
-                    for i in range(1, count + 1):
-                        pattern = f"{shortcode}_{count}_{i}.*"
-                        found = list(download_dir.glob(pattern))
-                        for fp in found:
-                            if fp.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
-                                files.append(fp)
+                    else:  # Single photo
+                        L.download_post(post, target=str(download_dir))
+                        
+                        # Find downloaded file - instaloader uses pattern: shortcode_1_1.ext or shortcode.ext
+                        patterns = [f"{shortcode}_1_1.*", f"{shortcode}.*"]
+                        for pattern in patterns:
+                            found = list(download_dir.glob(pattern))
+                            for fp in found:
+                                if fp.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp'] and '_' not in fp.stem[len(shortcode):]:
+                                    files.append(fp)
+                                    break
+                            if files:
                                 break
+                        
+                        log.info(f"📸 Single photo downloaded")
                     
-                    log.info(f"📦 Photo album: {len(files)} photos downloaded")
-                
-                else:  # Single photo
-                    L.download_post(post, target=str(download_dir))
+                    if not files:
+                        raise Exception("No files downloaded")
                     
-                    # Find downloaded file - instaloader uses pattern: shortcode_1_1.ext or shortcode.ext
-                    patterns = [f"{shortcode}_1_1.*", f"{shortcode}.*"]
-                    for pattern in patterns:
-                        found = list(download_dir.glob(pattern))
-                        for fp in found:
-                            if fp.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp'] and '_' not in fp.stem[len(shortcode):]:
-                                files.append(fp)
-                                break
-                        if files:
-                            break
-                    
-                    log.info(f"📸 Single photo downloaded")
-                
-                if not files:
-                    raise Exception("No files downloaded")
+                    return files, media_type
                 
-                return files, media_type
-            
-            except Exception as e:
-                log.error(f"Instaloader error: {e}")
-                raise
+                except instaloader.exceptions.TooManyRequestsException as e:
+                    log.error(f"Instaloader rate limited: {e}")
+                    lease.rate_limited()
+                    raise
+                except (instaloader.exceptions.QueryReturnedNotFoundException,
+                        instaloader.exceptions.QueryReturnedBadRequestException) as e:
+                    # Проблема поста, не сесії
+                    log.error(f"Instaloader error: {e}")
+                    raise
+                except (instaloader.exceptions.ConnectionException,
+                        instaloader.exceptions.LoginRequiredException,
+                        instaloader.exceptions.AbortDownloadException) as e:
+                    log.error(f"Instaloader session error: {e}")
+                    lease.failed()
+                    raise
+                except Exception as e:
+                    log.error(f"Instaloader error: {e}")
+                    raise
         
         def download_with_gallery_dl():
             """Download using gallery-dl"""
             import subprocess
-            import json
             
             log.info("🎨 Using gallery-dl...")
             
             # Prepare command
+            # Без --quiet: в режимі pipe gallery-dl друкує шлях кожного файлу
+            # ("# шлях" - файл вже був), з цього й беремо результат
             cmd = [
                 "gallery-dl",
-                "--quiet",
                 "--no-check-certificate",
+                "-o", "output.mode=pipe",
                 "-D", str(download_dir),
             ]
             
-            # Add cookies if available
-            cookies_file = Path("/var/www/ytdl-cookies.txt")
-            if cookies_file.exists():
-                cmd.extend(["--cookies", str(cookies_file)])
+            # Add cookies if available (файл тільки з instagram.com)
+            cookies_file = COOKIES.domain_file("instagram.com")
+            if cookies_file:
+                cmd.extend(["--cookies", cookies_file])
             
             cmd.append(url)
             
@@ -299,36 +363,21 @@ class InstagramDownloader(BaseDownloader):
             if result.returncode != 0:
                 raise Exception(f"gallery-dl failed: {result.stderr}")
             
-            # Find downloaded files
+            # Downloaded files in post order, only inside this job's dir
             files = []
-            for ext in ['jpg', 'jpeg', 'png', 'mp4', 'webm']:
-                files.extend(download_dir.glob(f"*.{ext}"))
+            job_dir = download_dir.resolve()
+            for line in result.stdout.splitlines():
+                fp = Path(line.lstrip("# ").strip())
+                if fp.resolve().parent == job_dir and fp.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp', '.mp4', '.webm'] and fp.exists():
+                    files.append(fp)
             
             if not files:
                 raise Exception("No files downloaded by gallery-dl")
             
-            # Sort by modification time (newest first)
-            files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-            
             # Determine media type
             media_type = "video" if any(f.suffix.lower() in ['.mp4', '.webm'] for f in files) else "photo"
             
             log.info(f"✅ gallery-dl downloaded {len(files)} file(s)")
             return files, media_type
         
-        loop = asyncio.get_running_loop()
-        files, media_type = await loop.run_in_executor(POOL, sync_download)
-        
-        # Clean filenames
-        cleaned_files = []
-        for fp in files:
-            if fp.exists():
-                clean_name = self.clean_filename(fp.name)
-                if clean_name != fp.name:
-                    new_fp = fp.parent / clean_name
-                    fp.rename(new_fp)
-                    fp = new_fp
-                    log.info(f"📝 Renamed to: {clean_name}")
-                cleaned_files.append(fp)
-        
-        return cleaned_files, media_type
+        return sync_download()
@@ -0,0 +1,175 @@
+"""Codec-aware post-processing: keep, remux or (only if needed) transcode to mp4"""
+
+import os
+import subprocess
+import threading
+from typing import Dict, List
+
+from yt_dlp.postprocessor import FFmpegPostProcessor
+from yt_dlp.utils import PostProcessingError
+
+from .base import log
+
+# Що Telegram програє як відео без перекодування
+MP4_VIDEO_CODECS = {"h264", "hevc"}
+MP4_AUDIO_CODECS = {"aac", "mp3"}
+
+# CPU-секунд на секунду відео для libx264 veryfast, поки немає власних вимірів
+DEFAULT_TRANSCODE_COST = 1.5
+
+
+class RemuxStats:
+    """
+    Counters of what post-processing did, shared by all downloaders.
+
+    cpu_avoided is the ffmpeg CPU time the old pipeline (a full
+    FFmpegVideoConvertor transcode of every non-mp4 file) would have
+    spent: duration × measured transcode cost per second of video.
+    """
+
+    def __init__(self):
+        self.kept = 0
+        self.remuxed = 0
+        self.transcoded = 0
+        self.cpu_spent = 0.0
+        self.cpu_avoided = 0.0
+        self._cost_cpu = 0.0
+        self._cost_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def transcode_cost(self) -> float:
+        """CPU seconds per second of video, from our own transcodes"""
+        if self._cost_seconds < 60:
+            return DEFAULT_TRANSCODE_COST
+        return self._cost_cpu / self._cost_seconds
+
+    def record(self, report: Dict):
+        with self._lock:
+            if report["action"] == "keep":
+                self.kept += 1
+            elif report["action"] == "remux":
+                self.remuxed += 1
+            else:
+                self.transcoded += 1
+                if report["duration"]:
+                    self._cost_cpu += report["cpu"]
+                    self._cost_seconds += report["duration"]
+            self.cpu_spent += report["cpu"]
+            self.cpu_avoided += report["avoided"]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "kept": self.kept,
+                "remuxed": self.remuxed,
+                "transcoded": self.transcoded,
+                "cpu_spent": round(self.cpu_spent, 1),
+                "cpu_avoided": round(self.cpu_avoided, 1),
+                "transcode_cost": round(self.transcode_cost, 2),
+            }
+
+
+REMUX_STATS = RemuxStats()
+
+
+def record_reports(platform: str, reports: List[Dict]):
+    """Count reports returned by _download_sync (it may have run in a worker process)"""
+    for report in reports:
+        REMUX_STATS.record(report)
+        log.info(
+            f"🎞️ {platform} {report['action']} {report['video']}/{report['audio']}: "
+            f"ffmpeg {report['cpu']:.1f}s CPU, ~{report['avoided']:.1f}s avoided"
+        )
+
+
+class RemuxFirstPP(FFmpegPostProcessor):
+    """
+    Replaces FFmpegVideoConvertor(mp4). Probes the streams and:
+
+    - keep      - mp4 with Telegram-playable codecs, nothing to do
+    - remux     - playable codecs in another container: stream copy to mp4
+    - transcode - only the streams that are not playable, the rest is copied
+
+    ``transcode_cost`` estimates what a full re-encode would have cost.
+    ``baseline_converts`` tells if the replaced pipeline re-encoded non-mp4
+    files (FFmpegVideoConvertor) - only then remux/keep counts as avoided.
+    Reports are collected in ``reports`` for the caller.
+    """
+
+    def __init__(self, downloader=None, transcode_cost: float = DEFAULT_TRANSCODE_COST, baseline_converts: bool = True):
+        super().__init__(downloader)
+        self.transcode_cost = transcode_cost
+        self.baseline_converts = baseline_converts
+        self.reports: List[Dict] = []
+
+    def _run_ffmpeg(self, args: List[str]) -> float:
+        """Run ffmpeg, return CPU seconds of exactly this child"""
+        proc = subprocess.Popen(
+            [self.executable, "-y", "-loglevel", "error", *args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        stderr = proc.stderr.read()
+        # wait4 - rusage саме цього процесу (RUSAGE_CHILDREN спільний на всі потоки)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.stderr.close()
+        if proc.returncode != 0:
+            raise PostProcessingError(stderr.decode(errors="replace").strip()[-300:] or "ffmpeg failed")
+        return usage.ru_utime + usage.ru_stime
+
+    def run(self, info):
+        path = info["filepath"]
+        if not self.probe_available:
+            log.warning("⚠️ ffprobe not found, video left as downloaded")
+            return [], info
+
+        meta = self.get_metadata_object(path)
+        streams = meta.get("streams") or []
+        video = next((s["codec_name"] for s in streams if s.get("codec_type") == "video"), None)
+        audio = next((s["codec_name"] for s in streams if s.get("codec_type") == "audio"), None)
+        duration = float((meta.get("format") or {}).get("duration") or info.get("duration") or 0)
+        ext = info.get("ext") or os.path.splitext(path)[1][1:]
+
+        copy_video = video is None or video in MP4_VIDEO_CODECS
+        copy_audio = audio is None or audio in MP4_AUDIO_CODECS
+        report = {"video": video, "audio": audio, "duration": duration, "cpu": 0.0, "avoided": 0.0}
+        # Старий конвертер перекодовував усе, що не mp4
+        would_convert = self.baseline_converts and ext != "mp4"
+
+        if copy_video and copy_audio and ext == "mp4":
+            report["action"] = "keep"
+            self.reports.append(report)
+            return [], info
+
+        target = os.path.splitext(path)[0] + ".mp4"
+        temp = os.path.splitext(path)[0] + ".temp.mp4"
+        args = ["-i", self._ffmpeg_filename_argument(path), "-map", "0:v:0?", "-map", "0:a:0?"]
+        args += ["-c:v", "copy"] if copy_video else ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p"]
+        args += ["-c:a", "copy"] if copy_audio else ["-c:a", "aac", "-b:a", "192k"]
+        args += ["-movflags", "+faststart", self._ffmpeg_filename_argument(temp)]
+
+        report["action"] = "remux" if copy_video and copy_audio else "transcode"
+        self.to_screen(f"{report['action'].capitalize()} {video}/{audio} → mp4: {path}")
+        report["cpu"] = self._run_ffmpeg(args)
+        if would_convert and copy_video:
+            # Відео скопійоване, а не перекодоване - основна економія
+            report["avoided"] = max(0.0, duration * self.transcode_cost - report["cpu"])
+
+        os.replace(temp, target)
+        deleted = [path] if target != path else []
+        info["filepath"] = target
+        info["ext"] = "mp4"
+        self.reports.append(report)
+        return deleted, info
+
+
+def add_remux_pp(ydl, transcode_cost: float = DEFAULT_TRANSCODE_COST, baseline_converts: bool = True) -> RemuxFirstPP:
+    """
+    Attach RemuxFirstPP after merge; read .reports after the download.
+    transcode_cost comes from the parent's REMUX_STATS (in process mode
+    this code runs in a worker that never records anything).
+    """
+    pp = RemuxFirstPP(ydl, transcode_cost=transcode_cost, baseline_converts=baseline_converts)
+    ydl.add_post_processor(pp, when="post_process")
+    return pp
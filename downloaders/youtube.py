@@ -1,24 +1,170 @@
 """YouTube downloader using yt-dlp"""
 
 import asyncio
+import copy
 import os
 import re
-import time
+import shutil
+import subprocess
 from pathlib import Path
-from typing import Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 import yt_dlp
 
-from .base import BaseDownloader, log
+from utils.ttl_cache import TTLCache
+from .base import BaseDownloader, DownloadPlan, ARTIFACTS, COOKIES, log, output_options
+from .postprocess import REMUX_STATS, add_remux_pp, record_reports
 
 
-POOL = ThreadPoolExecutor(max_workers=4)
+YOUTUBE_COOKIE_DOMAINS = ("youtube.com", "google.com")
+CRITICAL_COOKIES = ["__Secure-3PSID", "__Secure-1PSID", "SAPISID", "SSID"]
+
+# video id → info dict (extract_info без download), поки користувач обирає формат
+# AUDIO_FORMAT=passthrough - рідний AAC (m4a) без перекодування, Telegram грає його як аудіо;
+# mp3 - перекодування в MP3 192k для кожного треку (як раніше)
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "passthrough")
+AUDIO_CODEC = "mp3" if AUDIO_FORMAT == "mp3" else "m4a"
+
+# Однакова висота - H.264/AAC (злиття в mp4 без перекодування для Telegram)
+VIDEO_FORMAT_SORT = ["res", "vcodec:h264", "acodec:aac"]
+
+INFO_CACHE = TTLCache(ttl=int(os.getenv("YOUTUBE_INFO_TTL", "300")), max_entries=256)
+PREFETCHES: Dict[str, asyncio.Task] = {}
+
+
+def setup_node() -> Optional[str]:
+    """Make Node.js visible to yt-dlp (JS challenges); runs once at import"""
+    node_path = shutil.which("node")
+    if not node_path:
+        log.warning("⚠️ Node.js not found - YouTube signature solving may fail")
+        return None
+    
+    log.info(f"🟢 Node.js found at: {node_path}")
+    # КРИТИЧНО: Додаємо Node.js директорію в PATH
+    node_dir = os.path.dirname(node_path)
+    if node_dir not in os.environ.get("PATH", "").split(os.pathsep):
+        os.environ["PATH"] = f"{node_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        log.info(f"➕ Added Node.js to PATH: {node_dir}")
+    return node_path
+
+
+NODE_PATH = setup_node()
+
+
+def apply_cookies(ydl: yt_dlp.YoutubeDL):
+    """YouTube cookies from the shared store into ydl's jar (no cookies.txt parsing per download)"""
+    # Стратегія: cookies > різні player clients (OAuth deprecated!)
+    if not COOKIES.apply(ydl.cookiejar, *YOUTUBE_COOKIE_DOMAINS):
+        raise Exception("YouTube downloads require cookies. Please provide valid cookies file.")
+    
+    missing = [c for c in CRITICAL_COOKIES if c not in COOKIES.names("youtube.com")]
+    if missing:
+        log.warning(f"⚠️ Critical YouTube cookies missing: {', '.join(missing)}")
+
+
+def audio_options(codec: str = AUDIO_CODEC) -> dict:
+    """
+    yt-dlp format + postprocessor for audio mode. m4a: the native AAC stream
+    is taken as is (FFmpegExtractAudio sees aac → m4a and skips, or only
+    remuxes from another container); ffmpeg encodes only when YouTube has
+    no AAC stream at all. mp3: full decode + encode of every track.
+    """
+    if codec == "mp3":
+        fmt = "bestaudio/bestaudio*/best/best*"
+    else:
+        fmt = "bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/bestaudio*/best/best*"
+    return {
+        "format": fmt,
+        "postprocessors": [{
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": codec,
+            "preferredquality": "192",
+        }],
+    }
+
+
+def format_size(f: dict, duration: float) -> Optional[int]:
+    """filesize/filesize_approx, or bitrate × duration"""
+    if f.get("filesize") or f.get("filesize_approx"):
+        return f.get("filesize") or f.get("filesize_approx")
+    return int((f.get("tbr") or 0) * 1000 / 8 * duration) or None
+
+
+def pick_formats(info: dict, quality: Optional[str], audio_codec: str = AUDIO_CODEC) -> list:
+    """
+    Formats the download is expected to fetch. Mirrors the format specs:
+    audio (quality None) - best audio-only stream (m4a first in
+    passthrough mode); video - a progressive stream if one is as tall as
+    the best video-only stream up to the height (no ffmpeg merge), else
+    that video + best audio (H.264/AAC first at equal height, like
+    VIDEO_FORMAT_SORT).
+    """
+    height = int(quality) if quality and quality.isdigit() else float("inf")
+    formats = info.get("formats") or []
+    
+    def has(f, codec):
+        return f.get(codec) not in (None, "none")
+    
+    def video_rank(f):
+        return (f.get("height") or 0, (f.get("vcodec") or "").startswith("avc1"), f.get("tbr") or 0)
+    
+    def audio_rank(f):
+        return ((f.get("acodec") or "").startswith("mp4a"), f.get("abr") or f.get("tbr") or 0)
+    
+    audios = [f for f in formats if has(f, "acodec") and not has(f, "vcodec")]
+    if quality is None and audios:
+        native = [f for f in audios if f.get("ext") == "m4a"] if audio_codec == "m4a" else []
+        return [max(native or audios, key=lambda f: f.get("abr") or f.get("tbr") or 0)]
+    
+    progressive = [f for f in formats if has(f, "vcodec") and has(f, "acodec") and (f.get("height") or 0) <= height]
+    videos = [f for f in formats if has(f, "vcodec") and not has(f, "acodec") and (f.get("height") or 0) <= height]
+    if quality is not None and videos and audios:
+        video = max(videos, key=video_rank)
+        as_good = [f for f in progressive if (f.get("height") or 0) >= (video.get("height") or 0)]
+        if as_good:
+            return [max(as_good, key=video_rank)]
+        return [video, max(audios, key=audio_rank)]
+    
+    if not progressive:
+        return []
+    return [max(progressive, key=video_rank)]
+
+
+def progressive_format(info: dict, quality: Optional[str]) -> Optional[str]:
+    """format_id of a merge-free stream as good as the best pair, if there is one"""
+    formats = pick_formats(info, quality or "best")
+    if len(formats) == 1 and formats[0].get("format_id") and formats[0].get("acodec") not in (None, "none"):
+        return formats[0]["format_id"]
+    return None
+
+
+def estimate_size(info: dict, quality: str) -> Optional[int]:
+    """Expected download size for video quality (360/480/720...), bytes"""
+    duration = info.get("duration") or 0
+    formats = pick_formats(info, quality)
+    if not formats:
+        return None
+    return sum(format_size(f, duration) or 0 for f in formats) or None
+
+
+def artifact_variant(mode: str, quality: Optional[str]) -> str:
+    """Artifact cache variant: 'audio-<codec>' or 'video-<quality>'"""
+    return f"audio-{AUDIO_CODEC}" if mode == "audio" else f"video-{quality or 'best'}"
 
 
 class YouTubeDownloader(BaseDownloader):
     """Download from YouTube, YouTube Music, etc."""
     
+    PLATFORM = "youtube"
+    
+    MEDIA_ID_PATTERNS = [
+        r'[?&]v=([\w-]{11})',
+        r'youtu\.be/([\w-]{11})',
+        r'youtube\.com/(?:shorts|embed|live)/([\w-]{11})',
+    ]
+    
+    CANONICAL_URL = "https://www.youtube.com/watch?v={id}"
+    
     PATTERNS = [
         r'(?:youtube\.com|youtu\.be)',
         r'youtube\.com/watch',
@@ -31,13 +177,146 @@ class YouTubeDownloader(BaseDownloader):
         """Check if URL is YouTube"""
         return any(re.search(pattern, url, re.I) for pattern in YouTubeDownloader.PATTERNS)
     
+    def _extract_info(self, url: str) -> dict:
+        """Metadata only: extraction, signature solving, format list"""
+        opts = {
+            "quiet": True,
+            "nocheckcertificate": True,
+            "noplaylist": True,
+        }
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            apply_cookies(ydl)
+            # process=False - формат ще не обрано, це зробить download()
+            info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            raise Exception("Failed to extract video info")
+        return info
+    
+    async def prefetch(self, url: str):
+        """
+        Start metadata extraction in background (user is still choosing
+        Audio/Video), result goes to INFO_CACHE
+        """
+        media_id = self.media_id(url)
+        if not media_id or media_id in PREFETCHES or INFO_CACHE.get(media_id) is not None:
+            return
+        
+        async def run():
+            try:
+                info = await self.run_sync(self._extract_info, url)
+                INFO_CACHE.put(media_id, info)
+                log.info(f"🔮 Prefetched YouTube info: {media_id}")
+            except Exception as e:
+                log.warning(f"⚠️ Prefetch failed for {media_id}: {e}")
+            finally:
+                PREFETCHES.pop(media_id, None)
+        
+        PREFETCHES[media_id] = asyncio.create_task(run())
+    
+    async def cached_info(self, url: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """Info dict from prefetch; waits for a running prefetch (up to timeout)"""
+        media_id = self.media_id(url)
+        if not media_id:
+            return None
+        
+        task = PREFETCHES.get(media_id)
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return None
+        
+        return INFO_CACHE.get(media_id)
+    
+    @staticmethod
+    def estimate_sizes(info: dict, qualities: Iterable[str]) -> Dict[str, Optional[int]]:
+        return {quality: estimate_size(info, quality) for quality in qualities}
+    
+    async def plan_download(self, url: str, mode: str, quality: str, max_bytes: int = 0, head=None) -> DownloadPlan:
+        """
+        Pick the best quality (up to the requested one) whose expected file
+        fits max_bytes, from the prefetched info (or extracts it now -
+        download() then reuses it). Sizes: filesize/filesize_approx, bitrate
+        × duration, HEAD for formats without either. If nothing fits, the
+        requested quality is kept with fits=False (goes to gofile.io).
+        The artifact cache needs no new bytes: size 0.
+        """
+        media_id = self.media_id(url)
+        if ARTIFACTS and media_id and await asyncio.to_thread(
+            ARTIFACTS.contains, self.PLATFORM, media_id, artifact_variant(mode, quality)
+        ):
+            return DownloadPlan(quality, size=0)
+        
+        info = await self.cached_info(url)
+        if info is None:
+            info = await self.run_sync(self._extract_info, url)
+            if media_id:
+                INFO_CACHE.put(media_id, info)
+        
+        duration = info.get("duration") or 0
+        
+        async def output_size(formats):
+            total = 0
+            for f in formats:
+                size = format_size(f, duration)
+                if not size and head and f.get("url"):
+                    size = await head(f["url"], f.get("http_headers"))
+                if not size:
+                    return None
+                total += size
+            return total
+        
+        if mode == "audio":
+            formats = pick_formats(info, None)
+            output = await output_size(formats) if formats else None
+            if output is None:
+                return DownloadPlan(quality)
+            # mp3 192k лежить поруч з оригіналом; m4a з іншого контейнера - копія потоку
+            if AUDIO_CODEC == "mp3":
+                size = output + int(duration * 192000 / 8)
+            else:
+                size = output * (1 if formats[0].get("ext") == "m4a" else 2)
+            return DownloadPlan(quality, size, output, fits=not max_bytes or output <= max_bytes)
+        
+        # Запитана якість, потім нижчі висоти, які є серед форматів
+        requested = quality or "best"
+        first = pick_formats(info, requested)
+        top = max((f.get("height") or 0 for f in first), default=0)
+        heights = sorted(
+            {f.get("height") for f in info.get("formats") or [] if f.get("vcodec") not in (None, "none") and f.get("height")},
+            reverse=True,
+        )
+        candidates = [requested] + [str(h) for h in heights if h < top]
+        
+        for candidate in candidates:
+            formats = pick_formats(info, candidate)
+            if not formats:
+                continue
+            output = await output_size(formats)
+            if output is None:
+                # Розмір невідомий - нижчу якість навмання не обираємо
+                return DownloadPlan(quality if candidate == requested else candidate)
+            if not max_bytes or output <= max_bytes:
+                # Окремі потоки + злитий mp4
+                size = output * 2 if len(formats) > 1 else output
+                return DownloadPlan(quality if candidate == requested else candidate, size, output)
+        
+        formats = pick_formats(info, requested)
+        output = await output_size(formats) if formats else None
+        if output is None:
+            # Немає форматів з розміром (стрім, нетиповий екстрактор) - вирішить перевірка після завантаження
+            return DownloadPlan(quality)
+        size = output * 2 if len(formats) > 1 else output
+        return DownloadPlan(quality, size, output, fits=False)
+    
     async def download(
         self,
         url: str,
         download_dir: Path,
         mode: str = "audio",  # audio or video
         video_quality: Optional[str] = None,
-        progress_callback=None
+        progress_callback=None,
+        pipe=None
     ) -> Tuple[Path, str]:
         """
         Download from YouTube
@@ -47,16 +326,46 @@ class YouTubeDownloader(BaseDownloader):
             download_dir: Directory to save file
             mode: 'audio' or 'video'
             video_quality: '360', '480', '720', '1080', etc.
-            progress_callback: Callback for progress updates
+            progress_callback: Sync callback (status, percent, done, total), called from worker thread
+            pipe: Optional DownloadPipe, gets progress hooks for streaming upload
         
         Returns:
             Tuple[Path, str]: (filepath, media_type)
         """
+        media_id = self.media_id(url)
+        variant = artifact_variant(mode, video_quality)
         
-        last_update = [0]
-        main_loop = asyncio.get_running_loop()
+        if ARTIFACTS and media_id:
+            # Той самий файл вже є на диску (file_id недоступний або протух)
+            # SQLite + hardlink (або копія на іншу ФС) - не в event loop
+            cached = await asyncio.to_thread(ARTIFACTS.fetch, self.PLATFORM, media_id, variant, download_dir)
+            if cached:
+                return cached, mode
+            
+            if mode == "audio":
+                # Аудіо з уже завантаженого відео - без повторного завантаження
+                source = await asyncio.to_thread(
+                    ARTIFACTS.fetch, self.PLATFORM, media_id, "video-*", download_dir, derive=True
+                )
+                if source:
+                    if progress_callback:
+                        progress_callback("converting", 100, 0, 0)
+                    try:
+                        fp = Path(await self.run_sync(self._extract_audio_sync, source))
+                    except Exception as e:
+                        log.warning(f"⚠️ Audio from cached video failed ({e}), downloading")
+                        fp = None
+                    source.unlink()
+                    if fp:
+                        await asyncio.to_thread(ARTIFACTS.put, self.PLATFORM, media_id, variant, fp)
+                        return fp, mode
         
         def progress_hook(d):
+            if pipe:
+                pipe.feed(d)
+            
+            # progress_callback - звичайна thread-safe функція (ProgressEditor
+            # сам коалесціює та тротлить редагування), тому викликаємо напряму
             if not progress_callback:
                 return
                 
@@ -65,69 +374,67 @@ class YouTubeDownloader(BaseDownloader):
                 done = d.get("downloaded_bytes", 0)
                 
                 if total > 0:
-                    percent = done / total * 100
-                    if time.time() - last_update[0] > 0.5:
-                        last_update[0] = time.time()
-                        asyncio.run_coroutine_threadsafe(
-                            progress_callback("downloading", percent, done, total),
-                            main_loop
-                        )
+                    progress_callback("downloading", done / total * 100, done, total)
                 else:
-                    if time.time() - last_update[0] > 0.5:
-                        last_update[0] = time.time()
-                        asyncio.run_coroutine_threadsafe(
-                            progress_callback("downloading", 0, done, 0),
-                            main_loop
-                        )
+                    progress_callback("downloading", 0, done, 0)
             
             elif d["status"] == "finished":
-                asyncio.run_coroutine_threadsafe(
-                    progress_callback("converting", 100, 0, 0),
-                    main_loop
-                )
+                progress_callback("converting", 100, 0, 0)
         
-        def sync_download():
-            # Переконуємося що Node.js доступний для yt-dlp subprocess
-            import subprocess
-            node_path = None
+        prefetched = await self.cached_info(url)
+        if prefetched is not None:
+            log.info(f"⚡ Using prefetched info for {self.media_id(url)}")
+        
+        filepath, media_type, reports = await self.run_sync(
+            self._download_sync, url, download_dir, mode, video_quality, prefetched, REMUX_STATS.transcode_cost,
+            progress_hook=progress_hook
+        )
+        record_reports(self.PLATFORM, reports)
+        
+        fp = Path(filepath)
+        
+        # Clean filename
+        clean_name = self.clean_filename(fp.name)
+        if clean_name != fp.name:
+            new_fp = fp.parent / clean_name
+            fp.rename(new_fp)
+            fp = new_fp
+            log.info(f"📝 Renamed to: {clean_name}")
+        
+        if ARTIFACTS and media_id:
+            await asyncio.to_thread(ARTIFACTS.put, self.PLATFORM, media_id, variant, fp)
+        
+        return fp, media_type
+    
+    def _extract_audio_sync(self, source: Path) -> str:
+        """Audio from a cached video, same codec settings as the audio download"""
+        target = source.with_suffix(f".{AUDIO_CODEC}")
+        
+        def ffmpeg(*codec_args):
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", str(source), "-vn", *codec_args, str(target)],
+                check=True, capture_output=True,
+            )
+        
+        if AUDIO_CODEC == "mp3":
+            ffmpeg("-c:a", "libmp3lame", "-b:a", "192k")
+        else:
             try:
-                node_result = subprocess.run(['which', 'node'], capture_output=True, text=True, timeout=2)
-                if node_result.returncode == 0:
-                    node_path = node_result.stdout.strip()
-                    log.info(f"🟢 Node.js found at: {node_path}")
-                    
-                    # КРИТИЧНО: Додаємо Node.js директорію в PATH
-                    node_dir = os.path.dirname(node_path)
-                    if node_dir not in os.environ.get("PATH", ""):
-                        os.environ["PATH"] = f"{node_dir}:{os.environ.get('PATH', '')}"
-                        log.info(f"➕ Added Node.js to PATH: {node_dir}")
-            except Exception as e:
-                log.warning(f"⚠️ Node.js check failed: {e}")
-            
-            # Стратегія: cookies > різні player clients (OAuth deprecated!)
-            cookies_path = "/var/www/ytdl-cookies.txt"
-            use_cookies = os.path.exists(cookies_path)
-            
-            if use_cookies:
-                cookie_size = os.path.getsize(cookies_path)
-                log.info(f"🍪 YouTube cookies available: {cookie_size} bytes")
-                
-                # Перевіряємо критичні cookies
-                try:
-                    with open(cookies_path, 'r') as f:
-                        cookie_content = f.read()
-                        critical = ['__Secure-3PSID', '__Secure-1PSID', 'SAPISID', 'SSID']
-                        found_critical = [c for c in critical if c in cookie_content]
-                        log.info(f"🔑 Critical cookies found: {', '.join(found_critical)}")
-                except Exception as e:
-                    log.warning(f"⚠️ Could not verify cookies: {e}")
-            else:
-                log.warning("⚠️ No cookies - YouTube downloads may fail!")
-
-            
+                # AAC з mp4 - тільки копія потоку
+                ffmpeg("-c:a", "copy")
+            except subprocess.CalledProcessError:
+                # Opus у mp4 в m4a не скопіювати - кодуємо
+                ffmpeg("-c:a", "aac", "-b:a", "192k")
+        log.info(f"🎵 Extracted audio from cached {source.name}")
+        return str(target)
+    
+    def _download_sync(self, url, download_dir, mode, video_quality, prefetched, transcode_cost, progress_hook):
+        """Blocking part of download(): runs in an executor thread or a worker process"""
+        
+        def sync_download():
             # Базова конфігурація (як в CLI, мінімум обмежень)
             opts = {
-                "outtmpl": str(download_dir / "%(title)s.%(ext)s"),
+                **output_options(download_dir),
                 "quiet": False,
                 "nocheckcertificate": True,
                 "progress_hooks": [progress_hook],
@@ -135,21 +442,9 @@ class YouTubeDownloader(BaseDownloader):
                 "noplaylist": True,
             }
             
-            # Node.js вже в PATH, yt-dlp автоматично знайде його
-            if node_path:
-                log.info(f"✅ Node.js configured for yt-dlp (in PATH)")
-
-
-
-            
             if mode == "audio":
                 # Максимально м'який fallback для audio
-                opts["format"] = "bestaudio/bestaudio*/best/best*"
-                opts["postprocessors"] = [{
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }]
+                opts.update(audio_options())
                 opts["writethumbnail"] = False
                 opts["writesubtitles"] = False
             else:
@@ -168,6 +463,12 @@ class YouTubeDownloader(BaseDownloader):
                         "bestvideo+bestaudio/"
                         "best*/best"
                     )
+                # Прогресивний потік тієї ж висоти - без злиття (відомо з prefetch)
+                progressive = progressive_format(prefetched, video_quality) if prefetched else None
+                if progressive:
+                    log.info(f"🎯 Progressive format {progressive}, no merge needed")
+                    opts["format"] = f"{progressive}/{opts['format']}"
+                opts["format_sort"] = VIDEO_FORMAT_SORT
                 opts["merge_output_format"] = "mp4"
             
             # Спроба завантаження з retry механізмом
@@ -177,46 +478,40 @@ class YouTubeDownloader(BaseDownloader):
             strategies = []
             
             # ПРІОРИТЕТ 1: Просто cookies БЕЗ extractor_args (як в CLI!)
-            if use_cookies:
-                opts_simple = opts.copy()
-                opts_simple["cookiefile"] = cookies_path
-                # НЕ додаємо extractor_args - нехай yt-dlp сам вибере клієнт
-                strategies.append(("with cookies (default)", opts_simple))
-            else:
-                raise Exception("YouTube downloads require cookies. Please provide valid cookies file.")
+            # (cookies кладе apply_cookies зі спільного COOKIES)
+            opts_simple = opts.copy()
+            # НЕ додаємо extractor_args - нехай yt-dlp сам вибере клієнт
+            strategies.append(("with cookies (default)", opts_simple))
             
             for strategy_name, strategy_opts in strategies:
                 try:
                     log.info(f"🔄 Attempting download {strategy_name}...")
                     
                     with yt_dlp.YoutubeDL(strategy_opts) as ydl:
-                        info = ydl.extract_info(url, download=True)
+                        apply_cookies(ydl)
+                        # Відео: несумісні з Telegram кодеки перекодовуються, решта як є
+                        remux = add_remux_pp(ydl, transcode_cost, baseline_converts=False) if mode != "audio" else None
+                        info = None
+                        if prefetched is not None:
+                            # Екстракція вже зроблена поки користувач обирав формат
+                            try:
+                                info = ydl.process_ie_result(copy.deepcopy(prefetched), download=True)
+                            except Exception as e:
+                                log.warning(f"⚠️ Prefetched info unusable ({e}), extracting again")
+                                INFO_CACHE.pop(self.media_id(url))
+                        if info is None:
+                            info = ydl.extract_info(url, download=True)
                         
                         if not info:
                             raise Exception("Failed to extract video info")
                         
-                        # Для audio режиму файл вже конвертований в mp3
-                        if mode == "audio":
-                            # prepare_filename поверне .mp4, але ffmpeg вже конвертував в .mp3
-                            base_path = ydl.prepare_filename(info)
-                            mp3_path = str(Path(base_path).with_suffix(".mp3"))
-                            
-                            # Перевіряємо чи файл існує
-                            if not Path(mp3_path).exists():
-                                # Якщо mp3 не знайдено, шукаємо будь-який аудіо файл
-                                audio_files = list(download_dir.glob("*.mp3"))
-                                if audio_files:
-                                    mp3_path = str(audio_files[-1])  # Найновіший файл
-                                else:
-                                    raise Exception(f"Audio file not found: {mp3_path}")
-                            
-                            log.info(f"✅ Downloaded successfully {strategy_name}")
-                            return mp3_path, mode
-                        else:
-                            # Для відео
-                            original_path = ydl.prepare_filename(info)
-                            log.info(f"✅ Downloaded successfully {strategy_name}")
-                            return original_path, mode
+                        # Шлях після постпроцесорів (mp3 для audio, злитий mp4 для відео)
+                        paths = self.downloaded_paths(info)
+                        if not paths:
+                            raise Exception(f"Downloaded file not found for {info.get('id')}")
+                        
+                        log.info(f"✅ Downloaded successfully {strategy_name}")
+                        return str(paths[-1]), mode, (remux.reports if remux else [])
                 
                 except Exception as e:
                     last_error = e
@@ -235,17 +530,4 @@ class YouTubeDownloader(BaseDownloader):
             # Якщо дійшли сюди - щось пішло не так
             raise Exception("All download strategies exhausted")
         
-        loop = asyncio.get_running_loop()
-        filepath, media_type = await loop.run_in_executor(POOL, sync_download)
-        
-        fp = Path(filepath)
-        
-        # Clean filename
-        clean_name = self.clean_filename(fp.name)
-        if clean_name != fp.name:
-            new_fp = fp.parent / clean_name
-            fp.rename(new_fp)
-            fp = new_fp
-            log.info(f"📝 Renamed to: {clean_name}")
-        
-        return fp, media_type
+        return sync_download()
@@ -1,6 +1,62 @@
 """Utility functions"""
 
-from .cleanup import cleanup_old_files, cleanup_all_except_active
-from .upload import upload_to_gofile
+from .cleanup import cleanup_old_files, cleanup_all_except_active, make_job_dir, remove_job_dir
+from .upload import upload_to_gofile, GofileUploader, GofileError
+from .file_cache import FileIdCache
+from .singleflight import SingleFlight
+from .scheduler import JobScheduler, QueueFullError
+from .progress import ProgressEditor, make_bar
+from .webhook import WebhookServer
+from .job_queue import SQLiteJobQueue, RedisJobQueue, create_job_queue
+from .delivery import MediaDelivery
+from .multipart import StreamingUploader
+from .local_api import LocalBotApiFiles
+from .ttl_cache import TTLCache
+from .pipeline import DownloadPipe
+from .resolver import LinkResolver
+from .executors import ExecutorManager, parse_limits
+from .processes import ProcessWorkerPool, WorkerKilled
+from .cookies import CookieStore
+from .session_pool import SessionPool, PoolCoolingDown
+from .janitor import DiskJanitor
+from .admission import DiskAdmission
+from .artifacts import ArtifactCache
+from .splitter import VideoSplitter, SplitError
 
-__all__ = ['cleanup_old_files', 'cleanup_all_except_active', 'upload_to_gofile']
+__all__ = [
+    'cleanup_old_files',
+    'cleanup_all_except_active',
+    'make_job_dir',
+    'remove_job_dir',
+    'upload_to_gofile',
+    'GofileUploader',
+    'GofileError',
+    'FileIdCache',
+    'SingleFlight',
+    'JobScheduler',
+    'QueueFullError',
+    'ProgressEditor',
+    'make_bar',
+    'WebhookServer',
+    'SQLiteJobQueue',
+    'RedisJobQueue',
+    'create_job_queue',
+    'MediaDelivery',
+    'StreamingUploader',
+    'LocalBotApiFiles',
+    'TTLCache',
+    'DownloadPipe',
+    'LinkResolver',
+    'ExecutorManager',
+    'parse_limits',
+    'ProcessWorkerPool',
+    'WorkerKilled',
+    'CookieStore',
+    'SessionPool',
+    'PoolCoolingDown',
+    'DiskJanitor',
+    'DiskAdmission',
+    'ArtifactCache',
+    'VideoSplitter',
+    'SplitError',
+]
@@ -0,0 +1,169 @@
+"""Disk admission control: reserve scratch space before a download starts"""
+
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional
+
+log = logging.getLogger("ytbot")
+
+
+def dir_size(path: Path) -> int:
+    """Bytes already written into a job dir"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, name), follow_symlinks=False).st_size
+            except OSError:
+                continue
+    return total
+
+
+class Reservation:
+    """Bytes promised to one job, optionally tied to its working directory"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, size: int, path: Optional[Path]):
+        self.id = next(self._ids)
+        self.size = size
+        self.path = path
+        self.created = time.monotonic()
+
+
+class DiskAdmission:
+    """
+    Lets a download start only when its estimated size fits on disk.
+
+    A job asks for ``size`` bytes (from filesize/filesize_approx or a HEAD
+    request; ``default_size`` when nothing is known). It is admitted when
+    both hold:
+
+    - reserved bytes + size <= ``budget_bytes`` (scratch budget of downloads/)
+    - size <= free disk - ``min_free_bytes`` - bytes other reservations
+      have not written yet (written bytes are measured in their job dirs,
+      so a half-finished download is not counted twice)
+
+    Waiters are admitted strictly in arrival order, so a big video is not
+    starved by a stream of small ones. A job that does not fit even on an
+    empty node still runs once nothing else holds a reservation - it goes
+    the large-file route later instead of hanging forever.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        budget_bytes: int,
+        min_free_bytes: int = 0,
+        default_size: int = 200 * 1024 * 1024,
+        recheck_interval: float = 5.0,
+    ):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.default_size = default_size
+        self.recheck_interval = recheck_interval
+
+        self._active: Dict[int, Reservation] = {}
+        self._waiters: Deque[Reservation] = deque()
+        self._changed: Optional[asyncio.Event] = None
+
+        self.admitted = 0
+        self.waited = 0
+        self.estimated = 0
+        self.max_wait = 0.0
+        self.disk_free = 0
+
+    @property
+    def reserved_bytes(self) -> int:
+        return sum(r.size for r in self._active.values())
+
+    # -----------------------------------------------------
+    # ADMISSION
+    # -----------------------------------------------------
+    def _unwritten(self) -> int:
+        """Bytes promised to running jobs but not on disk yet (worker thread)"""
+        total = 0
+        for reservation in list(self._active.values()):
+            written = dir_size(reservation.path) if reservation.path else 0
+            total += max(0, reservation.size - written)
+        return total
+
+    def _disk_room(self) -> int:
+        self.disk_free = shutil.disk_usage(self.root).free
+        return self.disk_free - self.min_free_bytes - self._unwritten()
+
+    async def _fits(self, reservation: Reservation) -> bool:
+        if not self._active:
+            return True
+        if self.reserved_bytes + reservation.size > self.budget_bytes:
+            return False
+        return reservation.size <= await asyncio.to_thread(self._disk_room)
+
+    async def acquire(
+        self, size: Optional[int], path: Optional[Path] = None, on_wait: Optional[Callable[[int], None]] = None
+    ) -> Reservation:
+        """
+        Wait until ``size`` bytes can be reserved. on_wait(position) is
+        called once when the job has to queue for disk space.
+        """
+        if self._changed is None:
+            self._changed = asyncio.Event()
+
+        if size is not None:
+            self.estimated += 1
+        reservation = Reservation(self.default_size if size is None else int(size), path)
+        self._waiters.append(reservation)
+        started = time.monotonic()
+        notified = False
+        try:
+            while True:
+                if self._waiters[0] is reservation and await self._fits(reservation):
+                    break
+                if not notified:
+                    notified = True
+                    self.waited += 1
+                    log.info(
+                        f"💽 Waiting for disk: need {reservation.size / 1024 / 1024:.0f} MB, "
+                        f"reserved {self.reserved_bytes / 1024 / 1024:.0f} MB"
+                    )
+                    if on_wait:
+                        on_wait(self._waiters.index(reservation) + 1)
+                # Місце звільняє release() або janitor - тому перевіряємо й по таймеру
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.recheck_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.remove(reservation)
+            self._changed.set()
+
+        self._active[reservation.id] = reservation
+        self.admitted += 1
+        self.max_wait = max(self.max_wait, time.monotonic() - started)
+        return reservation
+
+    def release(self, reservation: Reservation):
+        if self._active.pop(reservation.id, None) is not None and self._changed is not None:
+            self._changed.set()
+
+    def stats(self) -> Dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "reserved_bytes": self.reserved_bytes,
+            "free_bytes": max(0, self.budget_bytes - self.reserved_bytes),
+            "disk_free": self.disk_free,
+            "running": len(self._active),
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "estimated": self.estimated,
+            "max_wait": round(self.max_wait, 1),
+        }
@@ -0,0 +1,244 @@
+"""Local content-addressed cache of downloaded media files"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .multipart import file_title, remember_title
+
+log = logging.getLogger("ytbot")
+
+HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of file contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src: Path, dst: Path):
+    """Hard link (free, survives eviction of src) or copy across filesystems; replaces dst"""
+    if dst.exists() and os.path.samefile(src, dst):
+        return  # rename() між двома посиланнями на один inode нічого не робить
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    try:
+        os.link(src, tmp)
+    except FileExistsError:
+        tmp.unlink()
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ArtifactCache:
+    """
+    On-disk cache of finished media files: (platform, media_id, variant) →
+    file, variant being e.g. "video-720" or "audio".
+
+    Files are stored once by sha256 of their contents (objects/ab/abcd….mp4),
+    so variants that end up with the same bytes share one object. Jobs get
+    a hard link in their own job dir, so eviction never pulls a file from
+    under a running upload. Objects are evicted least recently used first
+    once the store grows past ``max_bytes``.
+
+    Used when a Telegram file_id is missing or rejected, and as a source
+    for derived outputs (audio from an already downloaded video).
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 5 * 1024 ** 3):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.derived = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                digest  TEXT PRIMARY KEY,
+                ext     TEXT NOT NULL,
+                size    INTEGER NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                platform TEXT NOT NULL,
+                media_id TEXT NOT NULL,
+                variant  TEXT NOT NULL,
+                digest   TEXT NOT NULL,
+                name     TEXT NOT NULL,
+                title    TEXT,
+                PRIMARY KEY (platform, media_id, variant)
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(artifacts)")}
+        if "title" not in columns:
+            # Індекс зі старої версії - назви для користувача ще не зберігались
+            self._db.execute("ALTER TABLE artifacts ADD COLUMN title TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS objects_used_at ON objects (used_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_digest ON artifacts (digest)")
+        self._db.commit()
+
+    def _object_path(self, digest: str, ext: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}{ext}"
+
+    # -----------------------------------------------------
+    # LOOKUP
+    # -----------------------------------------------------
+    def _lookup(self, platform: str, media_id: str, variant: str) -> Optional[Tuple[Path, str, Optional[str], int]]:
+        """(object path, original name, title, size) for exact variant or 'prefix*' pattern, under lock"""
+        if variant.endswith("*"):
+            where, arg = "a.variant LIKE ?", variant[:-1] + "%"
+        else:
+            where, arg = "a.variant = ?", variant
+        row = self._db.execute(
+            "SELECT o.digest, o.ext, o.size, a.name, a.title FROM artifacts a JOIN objects o ON o.digest = a.digest "
+            f"WHERE a.platform=? AND a.media_id=? AND {where} ORDER BY o.used_at DESC LIMIT 1",
+            (platform, media_id, arg),
+        ).fetchone()
+        if not row:
+            return None
+
+        digest, ext, size, name, title = row
+        path = self._object_path(digest, ext)
+        if not path.exists():
+            # Об'єкт зник з диска (видалили вручну) - індекс більше не правий
+            self._drop_object(digest)
+            self._db.commit()
+            return None
+
+        self._db.execute("UPDATE objects SET used_at=? WHERE digest=?", (time.time(), digest))
+        self._db.commit()
+        return path, name, title, size
+
+    def contains(self, platform: str, media_id: str, variant: str) -> bool:
+        with self._lock:
+            return self._lookup(platform, media_id, variant) is not None
+
+    def fetch(self, platform: str, media_id: str, variant: str, dest_dir: Path, derive: bool = False) -> Optional[Path]:
+        """
+        Link cached file into dest_dir, None on miss. variant may end with
+        '*' (any "video-*"). derive=True marks a source for a derived output:
+        counted separately, a miss here is not a cache miss. The title goes
+        to TITLES_FILE of dest_dir, so the file (and outputs derived from
+        it) is uploaded under its title, not the media id.
+        """
+        with self._lock:
+            found = self._lookup(platform, media_id, variant)
+            if found is None:
+                if not derive:
+                    self.misses += 1
+                return None
+
+            path, name, title, size = found
+            dest = dest_dir / name
+            link_or_copy(path, dest)
+            if title:
+                remember_title(dest, title)
+            if derive:
+                self.derived += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += size
+        log.info(f"💾 Artifact {'source' if derive else 'hit'} {platform}/{media_id} {variant}: {name}")
+        return dest
+
+    # -----------------------------------------------------
+    # STORE
+    # -----------------------------------------------------
+    def put(self, platform: str, media_id: str, variant: str, path: Path, title: Optional[str] = None):
+        """
+        Store a finished file (hashing is blocking - call from a worker thread);
+        title defaults to the one yt-dlp recorded next to the file
+        """
+        title = title or file_title(path)
+        digest = file_digest(path)
+        ext = path.suffix.lower()
+        obj = self._object_path(digest, ext)
+        size = path.stat().st_size
+        now = time.time()
+
+        with self._lock:
+            if not obj.exists():
+                obj.parent.mkdir(exist_ok=True)
+                link_or_copy(path, obj)
+            self._db.execute(
+                "INSERT OR REPLACE INTO objects (digest, ext, size, used_at) VALUES (?, ?, ?, ?)",
+                (digest, ext, size, now),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (platform, media_id, variant, digest, name, title) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (platform, media_id, variant, digest, path.name, title),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _drop_object(self, digest: str):
+        """Remove object file and every artifact pointing to it, under lock"""
+        row = self._db.execute("SELECT ext FROM objects WHERE digest=?", (digest,)).fetchone()
+        if row:
+            try:
+                self._object_path(digest, row[0]).unlink()
+            except FileNotFoundError:
+                pass
+        self._db.execute("DELETE FROM objects WHERE digest=?", (digest,))
+        self._db.execute("DELETE FROM artifacts WHERE digest=?", (digest,))
+
+    def _evict(self):
+        """LRU eviction down to max_bytes, under lock"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for digest, size in self._db.execute("SELECT digest, size FROM objects ORDER BY used_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop_object(digest)
+            total -= size
+            evicted += 1
+
+        self.evictions += evicted
+        log.info(f"🧹 Evicted {evicted} cached artifact(s)")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            objects, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        total = self.hits + self.misses
+        return {
+            "objects": objects,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "derived": self.derived,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
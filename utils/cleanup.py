@@ -1,11 +1,40 @@
 """File cleanup utilities"""
 
 import logging
+import shutil
+import uuid
 from pathlib import Path
 from datetime import datetime, timedelta
 
 log = logging.getLogger("ytbot")
 
+JOB_DIR_PREFIX = "job-"
+
+
+def make_job_dir(download_dir: Path) -> Path:
+    """Окрема робоча директорія для однієї задачі (downloads/job-<id>/)"""
+    job_dir = download_dir / f"{JOB_DIR_PREFIX}{uuid.uuid4().hex[:12]}"
+    job_dir.mkdir(parents=True)
+    return job_dir
+
+
+def remove_job_dir(job_dir: Path):
+    """Видаляє директорію задачі разом з усіма файлами (.part, проміжні формати)"""
+    try:
+        shutil.rmtree(job_dir)
+        log.info(f"🗑️ Removed job dir: {job_dir.name}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning(f"Failed to remove {job_dir.name}: {e}")
+
+
+def _remove(entry: Path):
+    if entry.is_dir():
+        shutil.rmtree(entry)
+    else:
+        entry.unlink()
+
 
 def cleanup_old_files(download_dir: Path, max_age_minutes: int = 30, active_downloads: set = None):
     """Видаляє файли старіші за max_age_minutes, крім активних завантажень"""
@@ -20,7 +49,8 @@ def cleanup_old_files(download_dir: Path, max_age_minutes: int = 30, active_down
     
     cleaned = 0
     for file in download_dir.iterdir():
-        if not file.is_file():
+        # Файли та залишені директорії задач (після падіння)
+        if not (file.is_file() or file.name.startswith(JOB_DIR_PREFIX)):
             continue
             
         # Не чіпаємо активні завантаження
@@ -31,7 +61,7 @@ def cleanup_old_files(download_dir: Path, max_age_minutes: int = 30, active_down
         mtime = datetime.fromtimestamp(file.stat().st_mtime)
         if mtime < cutoff:
             try:
-                file.unlink()
+                _remove(file)
                 cleaned += 1
                 log.info(f"🧹 Cleaned old file: {file.name}")
             except Exception as e:
@@ -51,7 +81,7 @@ def cleanup_all_except_active(download_dir: Path, active_downloads: set = None):
     
     cleaned = 0
     for file in download_dir.iterdir():
-        if not file.is_file():
+        if not (file.is_file() or file.name.startswith(JOB_DIR_PREFIX)):
             continue
             
         # Не чіпаємо активні завантаження
@@ -59,7 +89,7 @@ def cleanup_all_except_active(download_dir: Path, active_downloads: set = None):
             continue
         
         try:
-            file.unlink()
+            _remove(file)
             cleaned += 1
             log.info(f"🧹 Cleaned: {file.name}")
         except Exception as e:
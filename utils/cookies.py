@@ -0,0 +1,166 @@
+"""Shared in-memory cookie store backed by a Netscape cookies.txt file"""
+
+import http.cookiejar
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+log = logging.getLogger("ytbot")
+
+
+class _Snapshot:
+    """Parsed file contents; never mutated after load except the per-domain caches"""
+
+    def __init__(self, key: Optional[Tuple[int, int]], cookies: List[http.cookiejar.Cookie]):
+        self.key = key
+        self.cookies = cookies
+        self.by_domain: Dict[str, List[http.cookiejar.Cookie]] = {}
+        self.files: Dict[str, str] = {}
+
+
+class CookieStore:
+    """
+    Parses the cookies file once and keeps it in memory for yt-dlp,
+    instaloader and gallery-dl.
+
+    The file is stat()-ed at most every ``check_interval`` seconds on access;
+    when mtime or size changes it is parsed again and swapped in as a whole,
+    so a download never sees a half-written file. Consumers get cookies per
+    domain: apply() copies them into an existing jar (YoutubeDL.cookiejar,
+    requests session), domain_file() gives a small cookies.txt for CLI tools.
+    """
+
+    # Файл, змінений щойно, може бути дописаний не до кінця
+    SETTLE_TIME = 1.0
+
+    def __init__(self, path: str, check_interval: float = 5.0, cache_dir: Optional[Path] = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.cache_dir = cache_dir or Path(tempfile.gettempdir()) / "ytbot-cookies"
+        self._snapshot = _Snapshot(None, [])
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        self.reloads = 0
+        self.errors = 0
+
+    # -----------------------------------------------------
+    # LOADING
+    # -----------------------------------------------------
+    def _current(self) -> _Snapshot:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._snapshot
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+                key = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                key = None
+
+            if key != self._snapshot.key:
+                if key is not None and time.time() - st.st_mtime < self.SETTLE_TIME:
+                    # cookie_refresher ще пише файл (write_text не атомарний) - наступного разу
+                    self._checked_at = 0.0
+                    return self._snapshot
+                self._snapshot = self._load(key)
+            return self._snapshot
+
+    def _load(self, key: Optional[Tuple[int, int]]) -> _Snapshot:
+        if key is None:
+            if self._snapshot.key is not None:
+                log.warning(f"⚠️ Cookies file disappeared: {self.path}")
+            return _Snapshot(None, [])
+
+        # Парсер yt-dlp: як і раніше з cookiefile, розуміє #HttpOnly_ рядки
+        jar = YoutubeDLCookieJar(self.path)
+        try:
+            jar.load(ignore_discard=True, ignore_expires=True)
+        except (OSError, http.cookiejar.LoadError) as e:
+            # Файл міг бути дописаний не до кінця - лишаємо попередню версію
+            self.errors += 1
+            log.warning(f"⚠️ Could not parse cookies ({e}), keeping previous")
+            return self._snapshot
+
+        self.reloads += 1
+        cookies = list(jar)
+        domains = {c.domain.lstrip(".") for c in cookies}
+        log.info(f"🍪 Cookies loaded: {len(cookies)} cookies, {len(domains)} domains")
+        return _Snapshot(key, cookies)
+
+    # -----------------------------------------------------
+    # CONSUMERS
+    # -----------------------------------------------------
+    @property
+    def version(self):
+        """Changes on every reload (mtime_ns, size)"""
+        return self._current().key
+
+    @property
+    def available(self) -> bool:
+        return bool(self._current().cookies)
+
+    def cookies(self, domain: str) -> List[http.cookiejar.Cookie]:
+        """Cookies of domain and its subdomains ("instagram.com" → .instagram.com, www.instagram.com)"""
+        snapshot = self._current()
+        found = snapshot.by_domain.get(domain)
+        if found is None:
+            found = [
+                c for c in snapshot.cookies
+                if c.domain.lstrip(".") == domain or c.domain.endswith("." + domain)
+            ]
+            snapshot.by_domain[domain] = found
+        return found
+
+    def names(self, domain: str) -> set:
+        return {c.name for c in self.cookies(domain)}
+
+    def apply(self, jar, *domains: str) -> int:
+        """Copy cookies of domains into jar (http.cookiejar API), returns count"""
+        count = 0
+        for domain in domains:
+            for cookie in self.cookies(domain):
+                jar.set_cookie(cookie)
+                count += 1
+        return count
+
+    def domain_file(self, domain: str) -> Optional[str]:
+        """cookies.txt with only this domain, rewritten after each reload (None if no cookies)"""
+        snapshot = self._current()
+        path = snapshot.files.get(domain)
+        cookies = self.cookies(domain)
+        if path is not None or not cookies:
+            return path
+
+        jar = YoutubeDLCookieJar()
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+
+        with self._lock:
+            self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            target = self.cache_dir / f"{domain}.txt"
+            tmp = target.with_suffix(f".{threading.get_ident()}.tmp")
+            jar.save(str(tmp), ignore_discard=True, ignore_expires=True)
+            os.chmod(tmp, 0o600)
+            # Атомарна заміна - gallery-dl, що вже читає старий файл, не зламається
+            os.replace(tmp, target)
+            snapshot.files[domain] = str(target)
+        return str(target)
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "cookies": len(snapshot.cookies),
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
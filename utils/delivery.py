@@ -0,0 +1,351 @@
+"""Unified delivery of downloaded files to Telegram"""
+
+import asyncio
+import logging
+import random
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telegram import InputMediaPhoto, InputMediaVideo
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter, TimedOut
+
+from .local_api import LocalBotApiFiles
+from .multipart import StreamingUploader
+from .pipeline import DownloadPipe
+from .progress import retry_seconds
+from .splitter import VideoSplitter
+from .upload import GofileUploader
+
+log = logging.getLogger("ytbot")
+
+PHOTO_EXTS = {'.jpg', '.jpeg', '.png', '.webp'}
+AUDIO_EXTS = {'.mp3', '.m4a', '.ogg', '.opus', '.aac', '.flac', '.wav'}
+
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB (custom API server)
+ALBUM_LIMIT = 10  # Telegram: max items in media group
+
+# Local-mode сервер відповідає тільки після завантаження файлу в Telegram
+LOCAL_TIMEOUTS = dict(read_timeout=900, write_timeout=60, connect_timeout=60, pool_timeout=60)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Can the same request succeed if we simply try again?"""
+    if isinstance(error, (RetryAfter, TimedOut)):
+        return True
+    if isinstance(error, (BadRequest, Forbidden, InvalidToken)):
+        # Невалідний запит / бот заблокований - повтор не допоможе
+        return False
+    if isinstance(error, NetworkError):
+        return True
+    return isinstance(error, (OSError, asyncio.TimeoutError, ConnectionError))
+
+
+def media_kind(fp: Path, media_type: str) -> str:
+    """'photo', 'audio' or 'video' for a downloaded file"""
+    ext = fp.suffix.lower()
+    if ext in PHOTO_EXTS:
+        return "photo"
+    if media_type == "audio" or ext in AUDIO_EXTS:
+        return "audio"
+    return "video"
+
+
+def file_ids_from_messages(messages) -> List[Dict[str, str]]:
+    """Collect file_id's from sent Telegram messages"""
+    items = []
+    for m in messages:
+        if m.video:
+            items.append({"kind": "video", "file_id": m.video.file_id})
+        elif m.audio:
+            items.append({"kind": "audio", "file_id": m.audio.file_id})
+        elif m.photo:
+            items.append({"kind": "photo", "file_id": m.photo[-1].file_id})
+        elif m.document:
+            items.append({"kind": "document", "file_id": m.document.file_id})
+    return items
+
+
+def gofile_item(file_size: int, link: str, reason: str = "") -> Dict[str, str]:
+    """Delivered item for a file uploaded to gofile.io (not cacheable)"""
+    header = reason or f"✅ Файл завеликий ({file_size / 1024 / 1024:.1f} MB)"
+    return {
+        "kind": "link",
+        "text": f"{header}\n\n🔗 Завантажено на gofile.io:\n{link}",
+    }
+
+
+class MediaDelivery:
+    """
+    Single delivery stage for every downloader.
+
+    Takes (files, media_type), decides photo / video / audio / album,
+    retries transient errors with exponential backoff + jitter and falls back
+    to gofile.io when Telegram upload is impossible, so a finished download
+    is never lost.
+
+    Files are streamed from disk by StreamingUploader, so a job never holds
+    more than one upload chunk in memory, even for a 10-video album.
+    With ``local`` set (Bot API server in --local mode on a shared volume)
+    only file:// paths are sent and nothing goes over HTTP. With
+    ``splitter`` set, an oversized mp4 is sent as numbered parts cut at
+    keyframes instead of a gofile.io link. gofile.io uploads go through
+    ``gofile`` (pooled, retried on another server).
+    """
+
+    def __init__(
+        self,
+        max_size: int = MAX_UPLOAD_SIZE,
+        attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 30.0,
+        uploader: Optional[StreamingUploader] = None,
+        local: Optional[LocalBotApiFiles] = None,
+        splitter: Optional[VideoSplitter] = None,
+        gofile: Optional[GofileUploader] = None,
+    ):
+        self.max_size = max_size
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.uploader = uploader or StreamingUploader()
+        self.local = local
+        self.splitter = splitter
+        self.gofile = gofile or GofileUploader()
+
+    async def close(self):
+        await self.uploader.close()
+        await self.gofile.close()
+
+    async def deliver(
+        self,
+        bot,
+        chat_id: int,
+        files: List[Path],
+        media_type: str,
+        status: Optional[Callable[[str], Awaitable]] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Send files to chat
+
+        Returns:
+            List of delivered items: file_id's ({"kind", "file_id"}) and
+            gofile links ({"kind": "link", "text"}), in send order.
+        """
+        files = [fp for fp in files if fp.exists()]
+        sendable = [fp for fp in files if fp.stat().st_size <= self.max_size]
+        oversized = [fp for fp in files if fp.stat().st_size > self.max_size]
+
+        delivered = []
+
+        if sendable:
+            if status:
+                total = sum(fp.stat().st_size for fp in sendable)
+                await status(f"📤 Відправка в Telegram ({total / 1024 / 1024:.1f} MB)...")
+
+            kinds = [media_kind(fp, media_type) for fp in sendable]
+            if len(sendable) > 1 and "audio" not in kinds:
+                batches = [sendable[i:i + ALBUM_LIMIT] for i in range(0, len(sendable), ALBUM_LIMIT)]
+            else:
+                batches = [[fp] for fp in sendable]
+
+            for batch in batches:
+                try:
+                    delivered.extend(await self._send_batch(bot, chat_id, batch, media_type))
+                except Forbidden:
+                    # Чат недоступний (бот заблокований) - fallback нікому не потрібен
+                    raise
+                except Exception as e:
+                    log.error(f"❌ Telegram upload failed: [{type(e).__name__}] {e}, using gofile.io fallback")
+                    if status:
+                        await status("📤 Telegram API недоступний, завантажую на GoFile.io...")
+                    for fp in batch:
+                        delivered.append(await self._fallback(
+                            bot, chat_id, fp, "✅ Telegram API тимчасово недоступний"
+                        ))
+
+        for fp in oversized:
+            reason = ""
+            if self.splitter and media_kind(fp, media_type) == "video" and self.splitter.can_split(fp):
+                try:
+                    await self._deliver_split(bot, chat_id, fp, delivered, status)
+                    continue
+                except Forbidden:
+                    raise
+                except Exception as e:
+                    log.error(f"❌ Splitting {fp.name} failed: [{type(e).__name__}] {e}, using gofile.io fallback")
+                    reason = "✅ Не вдалося розділити відео на частини"
+            if status:
+                await status(f"📤 Файл завеликий ({fp.stat().st_size / 1024 / 1024:.1f} MB), завантажую на gofile.io...")
+            delivered.append(await self._fallback(bot, chat_id, fp, reason))
+
+        return delivered
+
+    async def _deliver_split(
+        self,
+        bot,
+        chat_id: int,
+        fp: Path,
+        delivered: List[Dict[str, str]],
+        status: Optional[Callable[[str], Awaitable]] = None,
+    ):
+        """
+        Send an oversized video as numbered parts, uploading each part while
+        the next one is cut. Sent parts are appended to ``delivered`` as they
+        go, so a split that breaks halfway still reports what reached the
+        chat. A part Telegram refuses goes to gofile.io on its own.
+        """
+        if status:
+            await status(f"✂️ Файл завеликий ({fp.stat().st_size / 1024 / 1024:.1f} MB), ділю на частини...")
+
+        async for number, total, part in self.splitter.split(fp):
+            caption = f"🎞️ Частина {number}/{total}"
+            try:
+                if status:
+                    await status(f"📤 Відправка частини {number}/{total} ({part.stat().st_size / 1024 / 1024:.1f} MB)...")
+                try:
+                    items = await self._send_batch(bot, chat_id, [part], "video", caption=caption)
+                except Forbidden:
+                    raise
+                except Exception as e:
+                    log.error(f"❌ Telegram upload of {part.name} failed: [{type(e).__name__}] {e}, using gofile.io fallback")
+                    delivered.append(await self._fallback(bot, chat_id, part, f"✅ {caption}"))
+                    continue
+                for item in items:
+                    item["caption"] = caption
+                delivered.extend(items)
+            finally:
+                # Частина вже в Telegram - місце на диску потрібне наступній
+                part.unlink(missing_ok=True)
+
+    async def deliver_pipelined(
+        self,
+        bot,
+        chat_id: int,
+        pipe: DownloadPipe,
+        media_type: str,
+        status: Optional[Callable[[str], Awaitable]] = None,
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Upload a file while it is still being downloaded
+
+        Returns delivered items, or None if the pipe was declined or the
+        upload failed - the caller then delivers the finished file with
+        deliver(). A stream can't be replayed, so there are no retries here.
+        """
+        try:
+            if not await pipe.wait_accepted():
+                log.info(f"↪️ Streaming upload skipped: {pipe.reason}")
+                return None
+
+            if status:
+                await status(f"📤 Завантаження і відправка в Telegram ({pipe.size / 1024 / 1024:.1f} MB)...")
+
+            kind = media_kind(Path(pipe.name), media_type)
+            if kind == "video":
+                message = await self.uploader.send_file(bot, chat_id, "video", pipe, supports_streaming=True)
+            else:
+                message = await self.uploader.send_file(bot, chat_id, kind, pipe)
+            return file_ids_from_messages([message])
+
+        except Exception as e:
+            log.warning(f"↪️ Streaming upload failed, falling back to file upload: [{type(e).__name__}] {e}")
+            return None
+        finally:
+            pipe.discard()
+
+    # -----------------------------------------------------
+    # SENDING
+    # -----------------------------------------------------
+    async def _send_batch(
+        self, bot, chat_id: int, batch: List[Path], media_type: str, caption: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        if self.local:
+            return await self._send_local(bot, chat_id, batch, media_type, caption)
+
+        if len(batch) > 1:
+            messages = await self._retry(lambda: self._send_album(bot, chat_id, batch), "album")
+        else:
+            message = await self._retry(lambda: self._send_single(bot, chat_id, batch[0], media_type, caption), batch[0].name)
+            messages = [message]
+        return file_ids_from_messages(messages)
+
+    async def _send_single(self, bot, chat_id: int, fp: Path, media_type: str, caption: Optional[str] = None):
+        kind = media_kind(fp, media_type)
+        extra = {"caption": caption} if caption else {}
+        # Тіло запиту будується заново на кожну спробу - файл читається з початку
+        if kind == "video":
+            return await self.uploader.send_file(bot, chat_id, "video", fp, supports_streaming=True, **extra)
+        return await self.uploader.send_file(bot, chat_id, kind, fp, **extra)
+
+    async def _send_album(self, bot, chat_id: int, batch: List[Path]):
+        items = [
+            {"type": "photo" if fp.suffix.lower() in PHOTO_EXTS else "video", "path": fp}
+            for fp in batch
+        ]
+        return await self.uploader.send_media_group(bot, chat_id, items)
+
+    async def _send_local(
+        self, bot, chat_id: int, batch: List[Path], media_type: str, caption: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Send by file:// path, staged links live until the server had a chance to read them"""
+        # Між файловими системами stage() копіює файл - не в event loop
+        staged = [await asyncio.to_thread(self.local.stage, fp) for fp in batch]
+        server_may_read = False
+        try:
+            if len(batch) > 1:
+                media = [
+                    InputMediaPhoto(media=uri) if fp.suffix.lower() in PHOTO_EXTS
+                    else InputMediaVideo(media=uri, supports_streaming=True)
+                    for fp, (_, uri) in zip(batch, staged)
+                ]
+                messages = await self._retry(
+                    lambda: bot.send_media_group(chat_id, media=media, **LOCAL_TIMEOUTS), "album (local)"
+                )
+            else:
+                kind = media_kind(batch[0], media_type)
+                uri = staged[0][1]
+                if kind == "photo":
+                    send = lambda: bot.send_photo(chat_id, photo=uri, **LOCAL_TIMEOUTS)
+                elif kind == "audio":
+                    send = lambda: bot.send_audio(chat_id, audio=uri, **LOCAL_TIMEOUTS)
+                else:
+                    send = lambda: bot.send_video(
+                        chat_id, video=uri, supports_streaming=True, caption=caption, **LOCAL_TIMEOUTS
+                    )
+                messages = [await self._retry(send, f"{batch[0].name} (local)")]
+            return file_ids_from_messages(messages)
+        except (TimedOut, NetworkError) as e:
+            # Відповіді не було - сервер може ще читати файл
+            server_may_read = not isinstance(e, BadRequest)
+            raise
+        finally:
+            for path, _ in staged:
+                self.local.release(path, server_may_read)
+
+    async def _fallback(self, bot, chat_id: int, fp: Path, reason: str = "") -> Dict[str, str]:
+        size = fp.stat().st_size
+        # Ретраї (на іншому сервері) - всередині GofileUploader
+        link = await self.gofile.upload(fp)
+        item = gofile_item(size, link, reason)
+        await self._retry(lambda: bot.send_message(chat_id, item["text"]), "link message")
+        return item
+
+    async def _retry(self, call: Callable[[], Awaitable], what: str):
+        """Retry transient errors: exponential backoff with full jitter"""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.attempts or not is_transient(e):
+                    raise
+
+                if isinstance(e, RetryAfter):
+                    delay = retry_seconds(e)
+                else:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+                log.warning(
+                    f"⚠️ {what}: attempt {attempt}/{self.attempts} failed "
+                    f"[{type(e).__name__}] {e}, retry in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
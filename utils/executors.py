@@ -0,0 +1,130 @@
+"""Shared bounded thread pool for blocking downloader work"""
+
+import asyncio
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger("ytbot")
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    """'youtube=2,instagram=3' → {'youtube': 2, 'instagram': 3}"""
+    limits = {}
+    for part in value.split(","):
+        if "=" in part:
+            name, limit = part.split("=", 1)
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+def default_max_workers(download_dir: Path, disk_gb_per_task: float = 2.0, ceiling: int = 32) -> int:
+    """
+    Global cap: 2 threads per CPU (yt-dlp mostly waits on network, ffmpeg
+    runs in its own process), but no more tasks than free disk can hold
+    at ``disk_gb_per_task`` each.
+    """
+    by_cpu = (os.cpu_count() or 1) * 2
+    try:
+        free_gb = shutil.disk_usage(download_dir if download_dir.exists() else ".").free / 1024 ** 3
+        by_disk = int(free_gb / disk_gb_per_task)
+    except OSError:
+        by_disk = by_cpu
+    return max(2, min(by_cpu, by_disk, ceiling))
+
+
+class ExecutorManager:
+    """
+    One thread pool for all downloaders instead of a pool per module or
+    per call.
+
+    run(platform, fn) waits for a slot in the per-platform limit and the
+    global cap on the event loop side, so the pool itself never queues
+    work and the gauges show exactly what is running and what is waiting.
+    """
+
+    def __init__(self, max_workers: int, platform_limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers
+        self.platform_limits = platform_limits or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="downloader")
+        self._global: Optional[asyncio.Semaphore] = None
+        self._platforms: Dict[str, asyncio.Semaphore] = {}
+
+        self.active: Dict[str, int] = {}
+        self.queued: Dict[str, int] = {}
+        self.completed: Dict[str, int] = {}
+
+    def _semaphores(self, platform: str):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_workers)
+        if platform not in self._platforms:
+            limit = min(self.platform_limits.get(platform, self.max_workers), self.max_workers)
+            self._platforms[platform] = asyncio.Semaphore(limit)
+        return self._platforms[platform], self._global
+
+    async def run(self, platform: str, fn: Callable, *args):
+        """Run blocking fn(*args) in the shared pool"""
+        platform_slot, global_slot = self._semaphores(platform)
+
+        self.queued[platform] = self.queued.get(platform, 0) + 1
+        try:
+            # Спершу ліміт платформи, потім глобальний - черга однієї
+            # платформи не займає слоти інших
+            await platform_slot.acquire()
+            try:
+                await global_slot.acquire()
+            except BaseException:
+                platform_slot.release()
+                raise
+        finally:
+            self.queued[platform] -= 1
+
+        self.active[platform] = self.active.get(platform, 0) + 1
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            # Слот звільняється, коли потік справді закінчив - навіть якщо
+            # корутину, що чекала, скасували
+            self.active[platform] -= 1
+            self.completed[platform] = self.completed.get(platform, 0) + 1
+            global_slot.release()
+            platform_slot.release()
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            release(None)
+            raise
+        def done(f):
+            try:
+                loop.call_soon_threadsafe(release, f)
+            except RuntimeError:
+                pass  # event loop вже закритий (shutdown)
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work; running downloads finish in background unless wait=True"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        log.info("🧵 Downloader executor shut down")
+
+    def stats(self) -> Dict:
+        platforms = set(self.active) | set(self.queued) | set(self.platform_limits)
+        return {
+            "max_workers": self.max_workers,
+            "active": sum(self.active.values()),
+            "queued": sum(self.queued.values()),
+            "platforms": {
+                name: {
+                    "active": self.active.get(name, 0),
+                    "queued": self.queued.get(name, 0),
+                    "completed": self.completed.get(name, 0),
+                    "limit": min(self.platform_limits.get(name, self.max_workers), self.max_workers),
+                }
+                for name in sorted(platforms)
+            },
+        }
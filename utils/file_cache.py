@@ -0,0 +1,154 @@
+"""Persistent cache of Telegram file_id's for already delivered media"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+log = logging.getLogger("ytbot")
+
+
+class FileIdCache:
+    """
+    SQLite-backed map (platform, media_id, mode, quality) → Telegram file_id's.
+
+    Telegram keeps uploaded files forever, so a hit lets us re-send the same
+    media by file_id without downloading or uploading a single byte.
+    Entries expire after ``ttl_seconds`` and the least recently used ones are
+    evicted once the table grows past ``max_entries``.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: int = 30 * 24 * 3600, max_entries: int = 50_000):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_ids (
+                platform   TEXT NOT NULL,
+                media_id   TEXT NOT NULL,
+                mode       TEXT NOT NULL,
+                quality    TEXT NOT NULL,
+                items      TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at    REAL NOT NULL,
+                PRIMARY KEY (platform, media_id, mode, quality)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS file_ids_used_at ON file_ids (used_at)")
+        self._db.commit()
+
+    def get(
+        self, platform: str, media_id: str, mode: str, quality: str = "", record_miss: bool = True
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Return cached items or None
+
+        Items are dicts like {"kind": "video", "file_id": "..."},
+        kind is one of 'video', 'audio', 'photo', 'document'.
+        record_miss=False is for cheap pre-checks that will be repeated later.
+        """
+        key = (platform, media_id, mode, quality or "")
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT items, created_at FROM file_ids "
+                "WHERE platform=? AND media_id=? AND mode=? AND quality=?",
+                key,
+            ).fetchone()
+
+            if row and now - row[1] <= self.ttl_seconds:
+                self._db.execute(
+                    "UPDATE file_ids SET used_at=? "
+                    "WHERE platform=? AND media_id=? AND mode=? AND quality=?",
+                    (now, *key),
+                )
+                self._db.commit()
+                self.hits += 1
+                return json.loads(row[0])
+
+            if row:
+                # Протермінований запис
+                self._delete(key)
+                self.evictions += 1
+            if record_miss:
+                self.misses += 1
+            return None
+
+    def put(self, platform: str, media_id: str, mode: str, quality: str, items: List[Dict[str, str]]):
+        """Store file_id's for a delivered media"""
+        if not items:
+            return
+
+        key = (platform, media_id, mode, quality or "")
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO file_ids "
+                "(platform, media_id, mode, quality, items, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(items), now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def invalidate(self, platform: str, media_id: str, mode: str, quality: str = ""):
+        """Drop entry (e.g. Telegram rejected a stale file_id)"""
+        with self._lock:
+            self._delete((platform, media_id, mode, quality or ""))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM file_ids").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _delete(self, key):
+        self._db.execute(
+            "DELETE FROM file_ids WHERE platform=? AND media_id=? AND mode=? AND quality=?",
+            key,
+        )
+
+    def _evict(self, now: float):
+        """TTL + LRU eviction, called under lock"""
+        cur = self._db.execute("DELETE FROM file_ids WHERE created_at < ?", (now - self.ttl_seconds,))
+        evicted = cur.rowcount
+
+        size = self._db.execute("SELECT COUNT(*) FROM file_ids").fetchone()[0]
+        if size > self.max_entries:
+            cur = self._db.execute(
+                "DELETE FROM file_ids WHERE rowid IN "
+                "(SELECT rowid FROM file_ids ORDER BY used_at ASC LIMIT ?)",
+                (size - self.max_entries,),
+            )
+            evicted += cur.rowcount
+
+        if evicted > 0:
+            self.evictions += evicted
+            log.info(f"🧹 Evicted {evicted} cached file_id entries")
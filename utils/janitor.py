@@ -0,0 +1,225 @@
+"""Background disk janitor for the downloads directory"""
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+log = logging.getLogger("ytbot")
+
+# Файли, які yt-dlp/ffmpeg ще пишуть: x.mp4.part, x.mp4.part-Frag12, x.mp4.ytdl,
+# x.temp.mp4 (ffmpeg postprocessor), .x.mp4.tmp (копія в кеш артефактів)
+IN_PROGRESS_RE = re.compile(r"\.(part(-Frag\d+)?|ytdl|temp(\.\w+)?|tmp)$")
+
+
+def is_in_progress(name: str) -> bool:
+    return IN_PROGRESS_RE.search(name) is not None
+
+
+class _Usage:
+    """
+    Measured size of one top-level entry (file or job dir); for a dir also
+    the files seen in it: path → (size, last used, mtime)
+    """
+
+    __slots__ = ("key", "size", "last_used", "in_progress", "files")
+
+    def __init__(
+        self,
+        key: Tuple[int, int],
+        size: int,
+        last_used: float,
+        in_progress: bool,
+        files: Optional[Dict[str, Tuple[int, float, float]]] = None,
+    ):
+        self.key = key
+        self.size = size
+        self.last_used = last_used
+        self.in_progress = in_progress
+        self.files = files
+
+
+class DiskJanitor:
+    """
+    Keeps downloads/ under a byte budget and above a free-space floor.
+
+    Runs as a background task; every sweep happens in a worker thread, the
+    event loop never stats files. The file list of a job dir is cached and
+    the dir is only walked again when its mtime changes (a file added,
+    renamed or removed); otherwise just the known files are stat'ed again,
+    so files still growing are counted at their current size.
+
+    When over budget, entries are evicted least recently used first.
+    Protected: paths from ``protected()`` (ACTIVE_DOWNLOADS), entries with
+    a temp file (.part, .ytdl, .temp.<ext>, ...) touched within
+    ``part_grace`` seconds, and anything
+    younger than ``min_age`` (jobs of other worker processes on the node).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        budget_bytes: int,
+        min_free_bytes: int = 0,
+        interval: float = 60.0,
+        min_age: float = 600.0,
+        part_grace: float = 600.0,
+        protected: Callable[[], Iterable[str]] = set,
+    ):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.interval = interval
+        self.min_age = min_age
+        self.part_grace = part_grace
+        self.protected = protected
+
+        self._usage: Dict[str, _Usage] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.sweeps = 0
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.used_bytes = 0
+        self.disk_free = 0
+        self.disk_total = 0
+        self.last_sweep_seconds = 0.0
+
+    # -----------------------------------------------------
+    # LIFECYCLE
+    # -----------------------------------------------------
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                # Знімок захищених шляхів береться в потоці loop - set не змінюється під час копіювання
+                await asyncio.to_thread(self.sweep, set(self.protected()))
+            except Exception as e:
+                log.warning(f"⚠️ Disk janitor sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    # -----------------------------------------------------
+    # SWEEP (worker thread)
+    # -----------------------------------------------------
+    @staticmethod
+    def _stat_files(paths: Iterable[str]) -> Dict[str, Tuple[int, float, float]]:
+        files = {}
+        for path in paths:
+            try:
+                fst = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue  # видалений - mtime директорії теж змінився
+            files[path] = (fst.st_size, max(fst.st_mtime, fst.st_atime), fst.st_mtime)
+        return files
+
+    def _measure(self, entry: os.DirEntry, now: float) -> _Usage:
+        st = entry.stat(follow_symlinks=False)
+        key = (st.st_mtime_ns, st.st_size)
+
+        if not entry.is_dir(follow_symlinks=False):
+            in_progress = is_in_progress(entry.name) and now - st.st_mtime < self.part_grace
+            return _Usage(key, st.st_size, max(st.st_mtime, st.st_atime), in_progress)
+
+        cached = self._usage.get(entry.path)
+        if cached is not None and cached.key == key and cached.files is not None:
+            # Склад директорії той самий - але файли в ній можуть рости
+            files = self._stat_files(cached.files)
+        else:
+            files = self._stat_files(
+                os.path.join(dirpath, name) for dirpath, _, filenames in os.walk(entry.path) for name in filenames
+            )
+
+        size = sum(f[0] for f in files.values())
+        last_used = max([st.st_mtime, *(f[1] for f in files.values())])
+        in_progress = any(
+            is_in_progress(os.path.basename(path)) and now - f[2] < self.part_grace for path, f in files.items()
+        )
+        return _Usage(key, size, last_used, in_progress, files)
+
+    def sweep(self, protected: Optional[set] = None) -> int:
+        """One pass: measure, evict LRU if over budget; returns bytes freed"""
+        started = time.monotonic()
+        now = time.time()
+        protected = protected or set()
+
+        usage: Dict[str, _Usage] = {}
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            try:
+                usage[entry.path] = self._measure(entry, now)
+            except OSError:
+                continue  # видалили між scandir і stat
+        self._usage = usage
+        self.used_bytes = sum(u.size for u in usage.values())
+
+        disk = shutil.disk_usage(self.root if self.root.exists() else ".")
+        self.disk_free, self.disk_total = disk.free, disk.total
+
+        over = max(self.used_bytes - self.budget_bytes, self.min_free_bytes - disk.free)
+        freed = 0
+        if over > 0:
+            candidates = sorted(
+                (
+                    (u.last_used, path, u) for path, u in usage.items()
+                    if path not in protected
+                    and not u.in_progress
+                    and now - u.last_used >= self.min_age
+                ),
+            )
+            for _, path, u in candidates:
+                if freed >= over:
+                    break
+                try:
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    log.warning(f"⚠️ Janitor could not remove {path}: {e}")
+                    continue
+                freed += u.size
+                self.evicted += 1
+                self.evicted_bytes += u.size
+                self._usage.pop(path, None)
+                log.info(f"🧹 Evicted {Path(path).name} ({u.size / 1024 / 1024:.1f} MB, idle {(now - u.last_used) / 60:.0f} min)")
+
+            self.used_bytes -= freed
+            if freed < over:
+                log.warning(f"⚠️ Disk still over budget by {(over - freed) / 1024 / 1024:.0f} MB (rest is active)")
+
+        self.sweeps += 1
+        self.last_sweep_seconds = time.monotonic() - started
+        return freed
+
+    def stats(self) -> Dict:
+        return {
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "entries": len(self._usage),
+            "disk_free": self.disk_free,
+            "disk_total": self.disk_total,
+            "sweeps": self.sweeps,
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+            "last_sweep_ms": round(self.last_sweep_seconds * 1000, 1),
+        }
@@ -0,0 +1,314 @@
+"""Durable job queue between the Telegram front-end and download workers"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+log = logging.getLogger("ytbot")
+
+try:
+    import redis
+    from redis import WatchError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+    class WatchError(Exception):
+        """Stand-in for redis.WatchError when the redis package is missing"""
+
+
+class QueuedJob:
+    """Job reserved by a worker"""
+
+    def __init__(self, id: str, payload: Dict, attempts: int):
+        self.id = id
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"QueuedJob({self.id}, attempts={self.attempts})"
+
+
+class SQLiteJobQueue:
+    """
+    Job queue in a SQLite file (WAL), shared by processes on one node.
+
+    At-least-once delivery: reserve() hides a job for ``visibility_timeout``
+    seconds; if the worker neither acks nor extends it in time (crash, kill),
+    the job becomes visible again. nack() retries with backoff until
+    ``max_attempts`` is reached, then the job is marked dead.
+    """
+
+    def __init__(self, db_path: Path, visibility_timeout: int = 900, max_attempts: int = 3, retry_delay: int = 10):
+        self.db_path = Path(db_path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload    TEXT NOT NULL,
+                status     TEXT NOT NULL DEFAULT 'ready',
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, visible_at)")
+
+    def put(self, payload: Dict) -> str:
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO jobs (payload, visible_at) VALUES (?, ?)",
+                (json.dumps(payload), time.time()),
+            )
+            return str(cur.lastrowid)
+
+    def reserve(self) -> Optional[QueuedJob]:
+        """Take next visible job (ready, or reserved with expired timeout)"""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE - атомарно між процесами
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, payload, attempts FROM jobs "
+                    "WHERE status IN ('ready', 'reserved') AND visible_at <= ? "
+                    "ORDER BY visible_at, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+
+                job_id, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    # Воркер помер на останній спробі
+                    self._db.execute(
+                        "UPDATE jobs SET status='dead', last_error=? WHERE id=?",
+                        ("visibility timeout", job_id),
+                    )
+                    self._db.execute("COMMIT")
+                    log.error(f"💀 Job {job_id} is dead after {attempts} attempts")
+                    return None
+
+                self._db.execute(
+                    "UPDATE jobs SET status='reserved', attempts=attempts+1, visible_at=? WHERE id=?",
+                    (now + self.visibility_timeout, job_id),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return QueuedJob(str(job_id), json.loads(payload), attempts + 1)
+
+    def extend(self, job: QueuedJob):
+        """Heartbeat: keep job hidden while it's still running"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET visible_at=? WHERE id=? AND status='reserved'",
+                (time.time() + self.visibility_timeout, int(job.id)),
+            )
+
+    def ack(self, job: QueuedJob):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id=?", (int(job.id),))
+
+    def nack(self, job: QueuedJob, error: str = "") -> bool:
+        """
+        Return job to the queue with backoff
+
+        Returns:
+            bool: True if job will be retried, False if it's dead
+        """
+        with self._lock:
+            if job.attempts >= self.max_attempts:
+                self._db.execute(
+                    "UPDATE jobs SET status='dead', last_error=? WHERE id=?",
+                    (error[:500], int(job.id)),
+                )
+                return False
+
+            delay = self.retry_delay * 2 ** (job.attempts - 1)
+            self._db.execute(
+                "UPDATE jobs SET status='ready', visible_at=?, last_error=? WHERE id=?",
+                (time.time() + delay, error[:500], int(job.id)),
+            )
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        stats = {"ready": 0, "reserved": 0, "dead": 0}
+        stats.update(dict(rows))
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisJobQueue:
+    """
+    Job queue on any Redis-compatible server (Redis, KeyDB, Valkey...).
+
+    Works across nodes. The client is injectable, so a local stand-in with
+    the redis-py API can be used in tests. reserve() moves a job from ready
+    to reserved in one MULTI/EXEC transaction (optimistic, WATCH on the
+    queue keys), so at any moment a job is in ready, delayed or reserved -
+    a worker crash can't lose it.
+
+    Keys:
+        <name>:jobs      hash   id → payload json
+        <name>:attempts  hash   id → attempts
+        <name>:ready     list   ids waiting for a worker
+        <name>:delayed   zset   ids waiting for retry (score = visible_at)
+        <name>:reserved  zset   ids taken by workers (score = deadline)
+        <name>:dead      list   ids that ran out of attempts
+    """
+
+    def __init__(self, client, name: str = "ytbot", visibility_timeout: int = 900, max_attempts: int = 3, retry_delay: int = 10):
+        self.r = client
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisJobQueue":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package not installed")
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _key(self, suffix: str) -> str:
+        return f"{self.name}:{suffix}"
+
+    def put(self, payload: Dict) -> str:
+        job_id = str(self.r.incr(self._key("seq")))
+        pipe = self.r.pipeline()
+        pipe.hset(self._key("jobs"), job_id, json.dumps(payload))
+        pipe.lpush(self._key("ready"), job_id)
+        pipe.execute()
+        return job_id
+
+    def _claim(self):
+        """
+        Atomically return due retries / expired reservations to ready and
+        move the oldest ready job to reserved: (job_id, attempts, payload)
+        """
+        ready, reserved = self._key("ready"), self._key("reserved")
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(ready, self._key("delayed"), reserved)
+                    now = time.time()
+                    due = [
+                        (source, job_id)
+                        for source in (self._key("delayed"), reserved)
+                        for job_id in pipe.zrangebyscore(source, 0, now)
+                    ]
+                    # Після LPUSH повернутих задач праворуч буде старий хвіст або перша повернута
+                    job_id = pipe.lindex(ready, -1)
+                    if job_id is None and due:
+                        job_id = due[0][1]
+
+                    pipe.multi()
+                    for source, due_id in due:
+                        pipe.zrem(source, due_id)
+                        pipe.lpush(ready, due_id)
+                    if job_id is not None:
+                        pipe.rpop(ready)
+                        pipe.zadd(reserved, {job_id: now + self.visibility_timeout})
+                        pipe.hincrby(self._key("attempts"), job_id, 1)
+                        pipe.hget(self._key("jobs"), job_id)
+                    results = pipe.execute()
+                except WatchError:
+                    # Інший воркер встиг змінити чергу - пробуємо знову
+                    continue
+                if job_id is None:
+                    return None
+                return job_id, int(results[-2]), results[-1]
+
+    def reserve(self) -> Optional[QueuedJob]:
+        claimed = self._claim()
+        if claimed is None:
+            return None
+
+        job_id, attempts, payload = claimed
+        if payload is None:
+            self.r.zrem(self._key("reserved"), job_id)
+            return None
+
+        if attempts > self.max_attempts:
+            self._bury(job_id)
+            log.error(f"💀 Job {job_id} is dead after {attempts - 1} attempts")
+            return None
+
+        return QueuedJob(job_id, json.loads(payload), attempts)
+
+    def extend(self, job: QueuedJob):
+        self.r.zadd(self._key("reserved"), {job.id: time.time() + self.visibility_timeout}, xx=True)
+
+    def ack(self, job: QueuedJob):
+        pipe = self.r.pipeline()
+        pipe.zrem(self._key("reserved"), job.id)
+        pipe.hdel(self._key("jobs"), job.id)
+        pipe.hdel(self._key("attempts"), job.id)
+        pipe.execute()
+
+    def nack(self, job: QueuedJob, error: str = "") -> bool:
+        if job.attempts >= self.max_attempts:
+            self._bury(job.id)
+            return False
+
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        pipe = self.r.pipeline()
+        pipe.zrem(self._key("reserved"), job.id)
+        pipe.zadd(self._key("delayed"), {job.id: time.time() + delay})
+        pipe.execute()
+        return True
+
+    def _bury(self, job_id: str):
+        pipe = self.r.pipeline()
+        pipe.zrem(self._key("reserved"), job_id)
+        pipe.lpush(self._key("dead"), job_id)
+        pipe.execute()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "ready": self.r.llen(self._key("ready")) + self.r.zcard(self._key("delayed")),
+            "reserved": self.r.zcard(self._key("reserved")),
+            "dead": self.r.llen(self._key("dead")),
+        }
+
+    def close(self):
+        self.r.close()
+
+
+def create_job_queue(backend: str):
+    """Build queue from JOB_BACKEND ('sqlite' or 'redis'), settings from env"""
+    options = dict(
+        visibility_timeout=int(os.getenv("JOB_VISIBILITY_TIMEOUT", "900")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+    )
+
+    if backend == "sqlite":
+        return SQLiteJobQueue(Path(os.getenv("JOB_QUEUE_PATH", "cache/jobs.sqlite3")), **options)
+    if backend == "redis":
+        return RedisJobQueue.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), **options)
+
+    raise ValueError(f"Unknown job backend: {backend}")
@@ -0,0 +1,121 @@
+"""Hand files to a local-mode Bot API server by path (shared volume)"""
+
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional, Tuple
+
+log = logging.getLogger("ytbot")
+
+
+class LocalBotApiFiles:
+    """
+    Stages downloaded files on a volume shared with a Bot API server
+    started with ``--local`` and builds file:// URIs for them.
+
+    A file is hard-linked into ``shared_dir`` (same filesystem - no data is
+    copied, falls back to a copy across devices), so the original in
+    downloads/ keeps its normal lifecycle and the staged link has its own.
+
+    ``shared_dir`` is the path as the bot sees it, ``server_dir`` the same
+    directory as the Bot API server sees it (different container mounts).
+
+    The server reads a local file while it handles the request, so after a
+    response the staged link can go right away. If the request timed out or
+    the connection broke, the server may still be about to read it - such
+    links are kept for ``grace`` seconds.
+    """
+
+    def __init__(self, shared_dir: Path, server_dir: Optional[str] = None, grace: float = 600.0):
+        self.shared_dir = Path(shared_dir)
+        self.server_dir = PurePosixPath(server_dir or str(self.shared_dir))
+        self.grace = grace
+
+        self.shared_dir.mkdir(parents=True, exist_ok=True)
+
+        self.staged = 0
+        self.linked = 0
+        self.copied = 0
+        self.deferred = 0
+        self._lock = threading.Lock()
+
+    def stage(self, fp: Path) -> Tuple[Path, str]:
+        """
+        Put file on the shared volume, returns (staged path, file:// URI for
+        the server). Blocking (may copy a 2 GB file) - call from a worker thread
+        """
+        name = f"{uuid.uuid4().hex[:12]}_{fp.name}"
+        staged = self.shared_dir / name
+
+        try:
+            os.link(fp, staged)
+            linked = True
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            # Інша файлова система - без копії не обійтись
+            log.warning(f"⚠️ Can't hard-link {fp.name} into {self.shared_dir} ({e.strerror}), copying")
+            shutil.copyfile(fp, staged)
+            linked = False
+
+        # mtime hard link'а - від оригіналу; sweep() рахує вік від моменту staging
+        os.utime(staged)
+        with self._lock:
+            self.staged += 1
+            if linked:
+                self.linked += 1
+            else:
+                self.copied += 1
+        return staged, f"file://{self.server_dir / name}"
+
+    def release(self, staged: Path, server_may_read: bool = False):
+        """
+        Remove staged link after the request
+
+        server_may_read=True - request ended without a response, the server
+        can still open the file later, so removal is deferred.
+        """
+        if server_may_read:
+            self.deferred += 1
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # без event loop - прибере sweep() при наступному старті
+            loop.call_later(self.grace, self._unlink, staged)
+            return
+        self._unlink(staged)
+
+    def sweep(self) -> int:
+        """Remove staged links older than grace (left over after restart)"""
+        removed = 0
+        cutoff = time.time() - self.grace
+        for fp in self.shared_dir.iterdir():
+            try:
+                if fp.is_file() and fp.stat().st_mtime < cutoff:
+                    fp.unlink()
+                    removed += 1
+            except OSError as e:
+                log.warning(f"Failed to remove staged {fp.name}: {e}")
+        if removed:
+            log.info(f"🧹 Removed {removed} stale staged file(s) from {self.shared_dir}")
+        return removed
+
+    def _unlink(self, staged: Path):
+        try:
+            staged.unlink(missing_ok=True)
+        except OSError as e:
+            log.warning(f"Failed to remove staged {staged.name}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "staged": self.staged,
+            "linked": self.linked,
+            "copied": self.copied,
+            "deferred": self.deferred,
+        }
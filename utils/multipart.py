@@ -0,0 +1,240 @@
+"""Streaming multipart uploads to the Telegram Bot API"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import re
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+from telegram import Message
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter, TimedOut
+
+log = logging.getLogger("ytbot")
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Файли на диску названі за id; назви для користувача yt-dlp пише поруч: "шлях"\t"назва" (JSON)
+TITLES_FILE = ".titles"
+# Те, що не можна пускати в заголовок filename="..." (лапки, переноси рядків, шляхи)
+UNSAFE_FILENAME = re.compile(r'[\x00-\x1f\x7f"\\/]')
+
+
+def display_filename(title: str, suffix: str) -> str:
+    """Safe file name from a title, "" if nothing is left"""
+    clean = UNSAFE_FILENAME.sub("_", title or "").strip(" ._")[:80].rstrip()
+    return f"{clean}{suffix}" if clean else ""
+
+
+def file_title(path: Path) -> Optional[str]:
+    """Title from TITLES_FILE for an id-named file, or one derived from it (same id, another extension)"""
+    try:
+        lines = (path.parent / TITLES_FILE).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        try:
+            filepath, title = (json.loads(value) for value in line.split("\t", 1))
+        except ValueError:
+            continue
+        if Path(filepath).stem == path.stem:
+            return title
+    return None
+
+
+def remember_title(path: Path, title: str):
+    """Add the title of a file that did not come from yt-dlp (linked from a cache) to TITLES_FILE"""
+    line = f"{json.dumps(str(path), ensure_ascii=False)}\t{json.dumps(title, ensure_ascii=False)}\n"
+    with open(path.parent / TITLES_FILE, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def display_name(path: Path) -> str:
+    """
+    Name shown to the user for an id-named file: its title from TITLES_FILE
+    (also for derived files and split parts), else the file name itself
+    """
+    stem = re.sub(r"_part\d+$", "", path.stem)
+    title = file_title(path.with_name(stem + path.suffix))
+    if title is not None:
+        return display_filename(title + path.stem[len(stem):], path.suffix) or display_filename(path.name, "")
+    return display_filename(path.name, "") or f"file{path.suffix}"
+
+
+class _Part:
+    """
+    One multipart section: headers + a small value, a file on disk or a
+    stream source (object with ``name``, ``size`` and ``chunks(chunk_size)``)
+    """
+
+    def __init__(self, boundary: str, name: str, value: bytes = b"", source=None):
+        disposition = f'form-data; name="{name}"'
+        headers = ""
+        if source is not None:
+            filename = display_name(source) if isinstance(source, Path) else display_filename(source.name, "")
+            mime = mimetypes.guess_type(filename, strict=False)[0] or "application/octet-stream"
+            disposition += f'; filename="{filename or "file"}"'
+            headers = f"Content-Type: {mime}\r\n"
+
+        self.head = f"--{boundary}\r\nContent-Disposition: {disposition}\r\n{headers}\r\n".encode()
+        self.value = value
+        self.source = source
+        if isinstance(source, Path):
+            content_size = source.stat().st_size
+        elif source is not None:
+            content_size = source.size
+        else:
+            content_size = len(value)
+        self.size = len(self.head) + content_size + 2
+
+
+async def _read_file(path: Path, chunk_size: int) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while True:
+            # Читання з диска не блокує event loop
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class MultipartBody:
+    """
+    multipart/form-data body read from disk chunk by chunk.
+
+    Memory per upload stays at ``chunk_size`` no matter how many files
+    or how large they are; Content-Length is known up front, so the
+    Bot API server gets a plain (non-chunked) request.
+    """
+
+    def __init__(self, fields: Dict[str, str], files: Dict[str, Union[Path, object]], chunk_size: int = CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.parts = [_Part(self.boundary, name, str(value).encode()) for name, value in fields.items()]
+        self.parts += [_Part(self.boundary, name, source=source) for name, source in files.items()]
+        self.tail = f"--{self.boundary}--\r\n".encode()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return sum(part.size for part in self.parts) + len(self.tail)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for part in self.parts:
+            yield part.head
+            if part.source is None:
+                yield part.value
+            else:
+                if isinstance(part.source, Path):
+                    chunks = _read_file(part.source, self.chunk_size)
+                else:
+                    chunks = part.source.chunks(self.chunk_size)
+                async for chunk in chunks:
+                    yield chunk
+            yield b"\r\n"
+        yield self.tail
+
+
+class StreamingUploader:
+    """
+    Calls Bot API upload methods with a streamed request body.
+
+    python-telegram-bot reads every InputFile fully into memory before
+    sending; for albums of videos that is hundreds of MB per request. Here
+    files go from disk to the socket in ``chunk_size`` pieces. Errors are
+    raised as telegram.error exceptions, so retry logic treats them the
+    same way as errors from the Bot object.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, timeout: float = 300.0, connect_timeout: float = 60.0):
+        self.chunk_size = chunk_size
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.uploads = 0
+        self.bytes_sent = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self._timeout)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send_media_group(self, bot, chat_id: int, items: List[Dict]) -> List[Message]:
+        """
+        items: [{"type": "photo"|"video"|"audio"|"document", "path": Path}, ...]
+        """
+        media, files = [], {}
+        for n, item in enumerate(items):
+            name = f"file{n}"
+            entry = {"type": item["type"], "media": f"attach://{name}"}
+            if item["type"] == "video":
+                entry["supports_streaming"] = True
+            media.append(entry)
+            files[name] = item["path"]
+
+        result = await self.call(bot, "sendMediaGroup", {"chat_id": chat_id, "media": json.dumps(media)}, files)
+        return Message.de_list(result, bot)
+
+    async def send_file(self, bot, chat_id: int, kind: str, path, **fields) -> Message:
+        """sendPhoto / sendVideo / sendAudio / sendDocument with a file from disk (or a stream source)"""
+        method = "send" + kind.capitalize()
+        data = {"chat_id": chat_id}
+        data.update({key: json.dumps(value) if isinstance(value, bool) else value for key, value in fields.items()})
+        result = await self.call(bot, method, data, {kind: path})
+        return Message.de_json(result, bot)
+
+    async def call(self, bot, method: str, fields: Dict, files: Dict):
+        body = MultipartBody(fields, files, self.chunk_size)
+        size = len(body)
+        url = f"{bot.base_url}/{method}"
+
+        try:
+            response = await self._get_client().post(
+                url,
+                content=body,
+                headers={"Content-Type": body.content_type, "Content-Length": str(size)},
+            )
+        except httpx.TimeoutException as e:
+            raise TimedOut(f"{method}: {e}") from e
+        except httpx.HTTPError as e:
+            raise NetworkError(f"{method}: [{type(e).__name__}] {e}") from e
+
+        try:
+            data = response.json()
+        except ValueError:
+            raise NetworkError(f"{method}: invalid response ({response.status_code})")
+
+        if not data.get("ok"):
+            self._raise_error(response.status_code, data)
+
+        self.uploads += 1
+        self.bytes_sent += size
+        return data["result"]
+
+    @staticmethod
+    def _raise_error(status: int, data: Dict):
+        description = data.get("description", "Unknown error")
+        parameters = data.get("parameters") or {}
+
+        if "retry_after" in parameters:
+            raise RetryAfter(parameters["retry_after"])
+        if status in (401, 404):
+            raise InvalidToken(description)
+        if status == 403:
+            raise Forbidden(description)
+        if status == 400:
+            raise BadRequest(description)
+        raise NetworkError(f"{description} ({status})")
+
+    def stats(self) -> Dict[str, int]:
+        return {"uploads": self.uploads, "bytes_sent": self.bytes_sent}
@@ -0,0 +1,198 @@
+"""Download → upload pipelining: stream a file to Telegram while yt-dlp writes it"""
+
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+from .multipart import display_filename
+
+log = logging.getLogger("ytbot")
+
+# Назви кодеків yt-dlp (avc1.64001F, mp4a.40.2, ...) → назви ffprobe
+CODEC_FAMILIES = {
+    "avc1": "h264", "avc3": "h264", "h264": "h264",
+    "hev1": "hevc", "hvc1": "hevc", "hevc": "hevc", "h265": "hevc",
+    "mp4a": "aac", "aac": "aac",
+    "mp3": "mp3", "mp4a.40.34": "mp3", "mp4a.6b": "mp3",
+}
+
+
+def codec_family(codec: Optional[str]) -> Optional[str]:
+    """ffprobe codec name for a yt-dlp codec string, "none" for a missing stream, None if unknown"""
+    if not codec:
+        return None
+    codec = codec.lower()
+    if codec == "none":
+        return "none"
+    return CODEC_FAMILIES.get(codec) or CODEC_FAMILIES.get(codec.split(".")[0])
+
+
+class PipeDeclined(Exception):
+    """Download is not suitable for streaming, use the file-based path"""
+
+
+class DownloadPipe:
+    """
+    Follows a yt-dlp download through its progress hooks and exposes the
+    growing ``.part`` file as an upload source for StreamingUploader.
+
+    The pipe accepts only a single-file download with an exact size
+    (progressive MP4, audio-only stream): no merge, no HLS/DASH fragments,
+    and only codecs the post-processor keeps as is (``video_codecs`` /
+    ``audio_codecs``) - otherwise the uploaded bytes would differ from the
+    remuxed or transcoded file.
+    Anything else is declined and the caller falls back to uploading the
+    finished file. The file on disk is the buffer between download and
+    upload, so memory stays at one chunk; the last chunk is held back until
+    yt-dlp reports the download finished, so a broken download never turns
+    into a complete upload.
+    """
+
+    def __init__(
+        self,
+        extensions: Iterable[str] = (".mp4",),
+        max_size: int = 0,
+        video_codecs: Iterable[str] = ("h264", "hevc"),
+        audio_codecs: Iterable[str] = ("aac", "mp3"),
+        stall_timeout: float = 60.0,
+        poll_interval: float = 0.2,
+    ):
+        self.extensions = {ext.lower() for ext in extensions}
+        self.max_size = max_size
+        self.video_codecs = set(video_codecs) | {"none"}
+        self.audio_codecs = set(audio_codecs) | {"none"}
+        self.stall_timeout = stall_timeout
+        self.poll_interval = poll_interval
+
+        self.name = ""
+        self.size = 0
+        self.written = 0
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._accepted: Optional[bool] = None
+        self._finished = False
+        self._error: Optional[BaseException] = None
+        self._reason = ""
+
+    # -----------------------------------------------------
+    # DOWNLOAD SIDE (yt-dlp worker thread)
+    # -----------------------------------------------------
+    def feed(self, d: dict):
+        """yt-dlp progress hook"""
+        with self._lock:
+            if d["status"] == "downloading":
+                if self._accepted is None:
+                    self._decide(d)
+                if self._accepted:
+                    self.written = d.get("downloaded_bytes", self.written)
+
+            elif d["status"] == "finished":
+                if self._accepted is None:
+                    self._decline("finished before streaming started")
+                self._finished = True
+
+            elif d["status"] == "error":
+                self._error = self._error or Exception("download failed")
+
+    def _decide(self, d: dict):
+        info = d.get("info_dict") or {}
+        total = d.get("total_bytes")
+        filename = Path(d.get("filename") or "")
+        tmpfilename = d.get("tmpfilename")
+
+        if info.get("requested_formats"):
+            return self._decline("needs merge")
+        if d.get("fragment_count") or d.get("fragment_index"):
+            return self._decline("fragmented stream")
+        if not total or not tmpfilename:
+            return self._decline("unknown size")
+        if filename.suffix.lower() not in self.extensions:
+            return self._decline(f"{filename.suffix} output")
+        if self.max_size and total > self.max_size:
+            return self._decline("too large")
+        vcodec, acodec = codec_family(info.get("vcodec")), codec_family(info.get("acodec"))
+        if vcodec not in self.video_codecs or acodec not in self.audio_codecs:
+            # Post-processor перепакує/перекодує - стрімити сирий файл не можна
+            return self._decline(f"codecs {info.get('vcodec')}/{info.get('acodec')} need remux")
+
+        try:
+            # Дескриптор переживе rename .part → фінальне ім'я
+            self._file = open(tmpfilename, "rb")
+        except OSError as e:
+            return self._decline(f"can't open part file: {e}")
+
+        # На диску <id>.mp4 - користувач бачить назву відео
+        self.name = display_filename(info.get("title"), filename.suffix) or filename.name
+        self.size = total
+        self._accepted = True
+        log.info(f"🚰 Streaming {self.name} ({total / 1024 / 1024:.1f} MB) while downloading")
+
+    def _decline(self, reason: str):
+        self._accepted = False
+        self._reason = reason
+
+    def close(self, error: Optional[BaseException] = None):
+        """Download call returned (error=None) or raised"""
+        with self._lock:
+            if self._accepted is None:
+                self._decline(str(error) if error else "no progress reported")
+            if error is not None:
+                self._error = error
+            else:
+                self._finished = True
+
+    # -----------------------------------------------------
+    # UPLOAD SIDE (event loop)
+    # -----------------------------------------------------
+    @property
+    def reason(self) -> str:
+        return self._reason
+
+    async def wait_accepted(self) -> bool:
+        while self._accepted is None:
+            await asyncio.sleep(self.poll_interval)
+        return self._accepted
+
+    async def chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        if not await self.wait_accepted():
+            raise PipeDeclined(self._reason)
+
+        sent = 0
+        last_progress = time.monotonic()
+        try:
+            while sent < self.size:
+                chunk = await asyncio.to_thread(self._file.read, min(chunk_size, self.size - sent))
+
+                if not chunk:
+                    if self._error is not None:
+                        raise PipeDeclined(f"download failed: {self._error}")
+                    if self._finished:
+                        raise PipeDeclined(f"download ended at {sent} of {self.size} bytes")
+                    if time.monotonic() - last_progress > self.stall_timeout:
+                        raise PipeDeclined("download stalled")
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                last_progress = time.monotonic()
+                if sent + len(chunk) == self.size:
+                    # Останній чанк - тільки після підтвердження від yt-dlp
+                    while not self._finished and self._error is None:
+                        await asyncio.sleep(self.poll_interval)
+                    if self._error is not None:
+                        raise PipeDeclined(f"download failed: {self._error}")
+
+                sent += len(chunk)
+                yield chunk
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Release the part file handle (upload finished or never started)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,255 @@
+"""Worker-process pool for blocking downloader code (opt-in, EXECUTOR_MODE=process)"""
+
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+from typing import Callable, Dict, List
+
+log = logging.getLogger("ytbot")
+
+# Поля yt-dlp progress hook, які потрібні батьківському процесу
+HOOK_FIELDS = (
+    "status", "filename", "tmpfilename", "total_bytes", "total_bytes_estimate",
+    "downloaded_bytes", "fragment_index", "fragment_count", "speed", "eta", "elapsed",
+    "_percent_str", "_speed_str", "_eta_str",
+)
+
+
+class WorkerKilled(Exception):
+    """Worker process was killed (hung or stopped by admin)"""
+
+
+class _HookRelay:
+    """progress_hook stand-in inside the worker: sends events to the parent"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __call__(self, d: dict):
+        event = {key: d[key] for key in HOOK_FIELDS if key in d}
+        info = d.get("info_dict") or {}
+        # info_dict великий і не завжди серіалізується - тільки те, що треба DownloadPipe
+        event["info_dict"] = {
+            "requested_formats": bool(info.get("requested_formats")),
+            "vcodec": info.get("vcodec"),
+            "acodec": info.get("acodec"),
+            "title": info.get("title"),
+        }
+        self.conn.send(("hook", event))
+
+
+def _worker_main(conn):
+    """Worker loop: (fn, args, kwargs, has_hook) → ("result", value) | ("error", exc)"""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        fn, args, kwargs, has_hook = job
+        if has_hook:
+            kwargs["progress_hook"] = _HookRelay(conn)
+        try:
+            conn.send(("result", fn(*args, **kwargs)))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                # Виняток не серіалізується - передаємо текст
+                conn.send(("error", Exception(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.started_job_at = 0.0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class ProcessWorkerPool:
+    """
+    Runs downloader sync code in separate processes: yt-dlp extraction and
+    postprocessor orchestration stop competing for the GIL with the event
+    loop, and a crash or hang only costs one worker.
+
+    call() is blocking and is meant to run in an ExecutorManager thread,
+    which keeps per-platform limits and gauges. progress_hook events come
+    back over the worker pipe and are replayed in that thread.
+
+    Workers are reused and replaced after ``max_jobs`` jobs; a worker that
+    sends nothing for ``stall_timeout`` seconds (or runs longer than
+    ``job_timeout``) is killed and the job fails, the bot keeps running.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = 20,
+        stall_timeout: float = 600.0,
+        job_timeout: float = 3600.0,
+        start_method: str = "spawn",
+    ):
+        self.max_jobs = max_jobs
+        self.stall_timeout = stall_timeout
+        self.job_timeout = job_timeout
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: List[_Worker] = []
+        self._busy: Dict[int, _Worker] = {}
+        self._kill_requested: set = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.started = 0
+        self.recycled = 0
+        self.killed = 0
+        self.jobs = 0
+
+    # -----------------------------------------------------
+    # WORKERS
+    # -----------------------------------------------------
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("process pool is shut down")
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    break
+                worker.conn.close()
+            else:
+                worker = _Worker(self._ctx)
+                self.started += 1
+                log.info(f"🧩 Started download worker process {worker.pid}")
+            self._busy[worker.pid] = worker
+            self.jobs += 1
+            worker.started_job_at = time.monotonic()
+            return worker
+
+    def _checkin(self, worker: _Worker):
+        with self._lock:
+            self._busy.pop(worker.pid, None)
+            worker.jobs += 1
+            if self._closed or worker.jobs >= self.max_jobs:
+                self.recycled += 1
+                recycle = True
+            else:
+                self._idle.append(worker)
+                recycle = False
+        if recycle:
+            # Пам'ять yt-dlp/instaloader росте між задачами - процес перезапускається
+            worker.stop()
+
+    def _discard(self, worker: _Worker, reason: str):
+        with self._lock:
+            self._busy.pop(worker.pid, None)
+            self._kill_requested.discard(worker.pid)
+            self.killed += 1
+        log.error(f"💀 Killing download worker {worker.pid}: {reason}")
+        worker.kill()
+
+    def kill(self, pid: int) -> bool:
+        """Kill a busy worker (hung job); its call() raises WorkerKilled"""
+        with self._lock:
+            if pid not in self._busy:
+                return False
+            self._kill_requested.add(pid)
+        return True
+
+    # -----------------------------------------------------
+    # JOBS
+    # -----------------------------------------------------
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) in a worker process (blocking)"""
+        hook = kwargs.pop("progress_hook", None)
+        try:
+            job = pickle.dumps((fn, args, kwargs, hook is not None))
+        except Exception as e:
+            # Наприклад, info dict з лямбдами - виконуємо в поточному потоці
+            log.warning(f"⚠️ Job can't be sent to a worker process ({e}), running in thread")
+            if hook is not None:
+                kwargs["progress_hook"] = hook
+            return fn(*args, **kwargs)
+
+        worker = self._checkout()
+        try:
+            worker.conn.send_bytes(job)
+            last_message = time.monotonic()
+            while True:
+                if worker.conn.poll(1.0):
+                    kind, payload = worker.conn.recv()
+                    last_message = time.monotonic()
+                    if kind == "hook":
+                        if hook is not None:
+                            hook(payload)
+                        continue
+                    self._checkin(worker)
+                    if kind == "error":
+                        raise payload
+                    return payload
+
+                now = time.monotonic()
+                if worker.pid in self._kill_requested:
+                    reason = "killed on request"
+                elif not worker.process.is_alive():
+                    reason = f"worker exited with code {worker.process.exitcode}"
+                elif now - last_message > self.stall_timeout:
+                    reason = f"no progress for {self.stall_timeout:.0f}s"
+                elif now - worker.started_job_at > self.job_timeout:
+                    reason = f"job exceeded {self.job_timeout:.0f}s"
+                else:
+                    continue
+                self._discard(worker, reason)
+                raise WorkerKilled(reason)
+
+        except (EOFError, OSError) as e:
+            self._discard(worker, f"pipe broken: {e}")
+            raise WorkerKilled(f"worker {worker.pid} died: {e}")
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            busy = list(self._busy.values())
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            worker.kill()
+        log.info("🧩 Download worker processes stopped")
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "busy": len(self._busy),
+                "busy_pids": {pid: round(now - w.started_job_at) for pid, w in self._busy.items()},
+                "started": self.started,
+                "recycled": self.recycled,
+                "killed": self.killed,
+                "jobs": self.jobs,
+            }
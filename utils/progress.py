@@ -0,0 +1,236 @@
+"""Progress bar and coalescing status-message editor"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from telegram.error import BadRequest, RetryAfter
+
+log = logging.getLogger("ytbot")
+
+# Скільки забутих повідомлень пам'ятати, щоб пізній report() їх не воскрешав
+FORGOTTEN_LIMIT = 10000
+# Спроб показати фінальний текст при мережевих помилках
+FINAL_ATTEMPTS = 3
+
+
+def retry_seconds(e: RetryAfter) -> float:
+    """Flood-control wait of a RetryAfter (int or timedelta, depending on PTB version)"""
+    if isinstance(e.retry_after, timedelta):
+        return e.retry_after.total_seconds()
+    return float(e.retry_after)
+
+
+def make_bar(percent: float):
+    filled = int(percent / 5)
+    return "█" * filled + "░" * (20 - filled)
+
+
+class _Entry:
+    __slots__ = ("message", "text", "sent_text", "sent_at", "final", "failures", "lock")
+
+    def __init__(self, message):
+        self.message = message
+        self.text: Optional[str] = None
+        self.sent_text: Optional[str] = None
+        self.sent_at = 0.0
+        self.final = False
+        self.failures = 0
+        # Одне редагування повідомлення за раз - старий текст не обжене новий
+        self.lock = asyncio.Lock()
+
+
+class ProgressEditor:
+    """
+    Single place that edits status messages.
+
+    Downloaders (from any thread) only report the latest text with report(),
+    the flush loop keeps the newest state per message, drops identical texts
+    and sends edits within a global edit budget. The per-message interval
+    grows with the number of active messages, and on RetryAfter all edits
+    pause for the time Telegram asked for.
+
+    Edits of one message are serialized and always send the newest text,
+    so a progress edit in flight can't land after the final one. A final
+    text that hits flood control stays queued and is sent after the pause;
+    the message is forgotten only once it is shown, and late report()
+    calls for forgotten messages are ignored.
+    """
+
+    def __init__(self, edits_per_second: float = 20.0, min_interval: float = 1.0, tick: float = 0.25):
+        self.edits_per_second = edits_per_second
+        self.min_interval = min_interval
+        self.tick = tick
+
+        self._entries: Dict[Tuple[int, int], _Entry] = {}
+        self._forgotten: "OrderedDict[Tuple[int, int], None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._tokens = edits_per_second
+        self._task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.flood_waits = 0
+
+    # -----------------------------------------------------
+    # PUBLIC API
+    # -----------------------------------------------------
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self, message, text: str):
+        """Store latest progress text (thread-safe, never blocks)"""
+        key = (message.chat_id, message.message_id)
+        with self._lock:
+            if key in self._forgotten:
+                return  # задача вже показала результат
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(message)
+            if entry.final:
+                return  # фінальний текст чекає відправки - прогрес його не замінює
+            if entry.text is not None and entry.text != entry.sent_text:
+                self.dropped += 1  # попередній стан так і не був показаний
+            entry.text = text
+
+    async def edit(self, message, text: str, final: bool = False):
+        """
+        Edit right away (status changes, errors), replaces pending progress
+
+        final=True forgets the message once the text is shown (result or
+        error text); under flood control it is sent after the pause.
+        """
+        key = (message.chat_id, message.message_id)
+        with self._lock:
+            self._forgotten.pop(key, None)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(message)
+            entry.text = text
+            entry.final = final
+            entry.failures = 0
+
+        await self._wait_flood()
+        await self._send(key, entry)
+
+    async def delete(self, message):
+        """Forget message and delete it"""
+        self.forget(message)
+        try:
+            await message.delete()
+        except Exception as e:
+            log.debug(f"Failed to delete message: {e}")
+
+    def forget(self, message):
+        key = (message.chat_id, message.message_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._forgotten[key] = None
+            while len(self._forgotten) > FORGOTTEN_LIMIT:
+                self._forgotten.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": len(self._entries),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "flood_waits": self.flood_waits,
+        }
+
+    # -----------------------------------------------------
+    # FLUSH
+    # -----------------------------------------------------
+    def _interval(self, active: int) -> float:
+        """Per-message edit interval adapted to global budget"""
+        return max(self.min_interval, active / self.edits_per_second)
+
+    async def _wait_flood(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _flush_loop(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+
+            # Token bucket: не більше edits_per_second в середньому
+            self._tokens = min(self.edits_per_second, self._tokens + (now - last) * self.edits_per_second)
+            last = now
+
+            if now < self._paused_until:
+                continue
+
+            with self._lock:
+                pending = [
+                    (key, entry) for key, entry in self._entries.items()
+                    if entry.text is not None and entry.text != entry.sent_text
+                ]
+                interval = self._interval(len(pending))
+
+            due = sorted(
+                ((key, entry) for key, entry in pending if now - entry.sent_at >= interval),
+                key=lambda item: item[1].sent_at,
+            )
+            batch = due[:int(self._tokens)]
+            if not batch:
+                continue
+
+            self._tokens -= len(batch)
+            await asyncio.gather(*(self._send(key, entry) for key, entry in batch))
+
+    async def _send(self, key, entry: _Entry):
+        """Send the newest text of the entry (one edit per message at a time)"""
+        async with entry.lock:
+            text, final = entry.text, entry.final
+            if text is None or text == entry.sent_text:
+                return
+
+            entry.sent_at = time.monotonic()
+            try:
+                await entry.message.get_bot().edit_message_text(
+                    text, chat_id=key[0], message_id=key[1]
+                )
+                entry.sent_text = text
+                self.sent += 1
+
+            except RetryAfter as e:
+                retry_after = retry_seconds(e)
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self.flood_waits += 1
+                log.warning(f"🐢 Flood control: pausing status edits for {retry_after}s")
+                return  # текст лишається в черзі, flush loop відправить після паузи
+
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    entry.sent_text = text
+                else:
+                    # Повідомлення видалене або недоступне - більше не редагуємо
+                    log.debug(f"Status edit rejected: {e}")
+                    self.forget(entry.message)
+                    return
+
+            except Exception as e:
+                log.debug(f"Failed to edit message: {e}")
+                entry.failures += 1
+                if final and entry.failures >= FINAL_ATTEMPTS:
+                    self.forget(entry.message)
+                return
+
+            if final and entry.text == text:
+                self.forget(entry.message)
@@ -0,0 +1,134 @@
+"""Async short-link resolver with a TTL cache"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, Optional
+
+import aiohttp
+
+from .ttl_cache import TTLCache
+
+log = logging.getLogger("ytbot")
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Посилання, за якими немає ID медіа - тільки редирект на справжню адресу
+SHORT_LINK_PATTERNS = [
+    r'(?:vm|vt)\.tiktok\.com/',
+    r'tiktok\.com/t/',
+    r'facebook\.com/share/[rvp]/',
+    r'fb\.watch/',
+    r'fb\.com/',
+]
+
+
+class LinkResolver:
+    """
+    Expands short links (vm.tiktok.com, facebook.com/share/..., fb.watch)
+    by following redirects on one pooled aiohttp session, never blocking
+    the event loop. Results are kept in a TTL/LRU cache, concurrent lookups
+    of the same link share one request. On any failure the original URL is
+    returned - downloaders can still try it themselves.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str] = SHORT_LINK_PATTERNS,
+        ttl: float = 24 * 3600,
+        max_entries: int = 10000,
+        timeout: float = 10.0,
+        max_redirects: int = 10,
+        pool_size: int = 20,
+    ):
+        self._short = re.compile("|".join(f"(?:{p})" for p in patterns), re.I)
+        self.cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.pool_size = pool_size
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+        self.resolved = 0
+        self.failed = 0
+
+    def is_short(self, url: str) -> bool:
+        return self._short.search(url) is not None
+
+    async def resolve(self, url: str) -> str:
+        """Final URL after redirects (the same URL if it isn't a short link)"""
+        if not self.is_short(url):
+            return url
+
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+
+        pending = self._pending.get(url)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[url] = future
+        try:
+            result = await self._expand(url)
+            future.set_result(result)
+            return result
+        finally:
+            self._pending.pop(url, None)
+            if not future.done():
+                future.set_result(url)
+
+    async def _expand(self, url: str) -> str:
+        try:
+            session = self._get_session()
+            # HEAD без тіла; частина сервісів на HEAD не редиректить - тоді GET
+            for method in ("HEAD", "GET"):
+                async with session.request(method, url, allow_redirects=True, max_redirects=self.max_redirects) as response:
+                    final = str(response.url)
+                if final != url:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.failed += 1
+            log.warning(f"Could not expand link {url}: [{type(e).__name__}] {e}, trying original URL")
+            return url
+
+        self.resolved += 1
+        self.cache.put(url, final)
+        log.info(f"📍 Expanded {url} → {final}")
+        return final
+
+    async def content_length(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[int]:
+        """Size of a media URL by HEAD (None if the server doesn't tell)"""
+        try:
+            session = self._get_session()
+            async with session.head(url, headers=headers, allow_redirects=True, max_redirects=self.max_redirects) as response:
+                if response.status >= 400:
+                    return None
+                return response.content_length
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning(f"HEAD failed for {url[:80]}: [{type(e).__name__}] {e}")
+            return None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, float]:
+        stats = {"resolved": self.resolved, "failed": self.failed}
+        stats.update({f"cache_{key}": value for key, value in self.cache.stats().items()})
+        return stats
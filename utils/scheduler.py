@@ -0,0 +1,261 @@
+"""Bounded job scheduler with per-platform limits and per-chat fairness"""
+
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+log = logging.getLogger("ytbot")
+
+# Задача планувальника, в якій виконується поточний код
+_current_job: ContextVar[Optional["Job"]] = ContextVar("scheduler_job", default=None)
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler can't accept more jobs"""
+
+
+class Job:
+    """Queued unit of work"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, chat_id: int, platform: str, run: Callable[[], Awaitable]):
+        self.id = next(self._ids)
+        self.chat_id = chat_id
+        self.platform = platform
+        self.run = run
+        self.holds_slot = False
+
+
+class JobScheduler:
+    """
+    Runs jobs in the background instead of inside update handlers.
+
+    - global cap on concurrently running jobs
+    - per-platform caps (e.g. YouTube is heavier than Instagram)
+    - round-robin between chats, so one chat can't starve the others
+    - bounded queue: submit() raises QueueFullError on overload
+    - a running job that has to wait on something else (disk space) can
+      pause() to give its slot away and resume() to get the next free slot
+      back, ahead of queued jobs
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        platform_limits: Optional[Dict[str, int]] = None,
+        max_queued: int = 100,
+        max_queued_per_chat: int = 5,
+    ):
+        self.max_concurrent = max_concurrent
+        self.platform_limits = platform_limits or {}
+        self.max_queued = max_queued
+        self.max_queued_per_chat = max_queued_per_chat
+
+        self._queues: "OrderedDict[int, deque]" = OrderedDict()  # chat_id → jobs, порядок = round-robin
+        self._queued = 0
+        self._running: Dict[str, int] = {}
+        self._resuming: Deque[Tuple[Job, asyncio.Future]] = deque()
+        self._tasks = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # -----------------------------------------------------
+    # PUBLIC API
+    # -----------------------------------------------------
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        log.info(
+            f"🚦 Scheduler started: {self.max_concurrent} workers, "
+            f"platform limits {self.platform_limits}, queue {self.max_queued}"
+        )
+
+    async def stop(self):
+        """Stop dispatching and wait for running jobs"""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+        if self._tasks:
+            log.info(f"⏳ Waiting for {len(self._tasks)} running job(s)...")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        dropped = self._queued
+        self._queues.clear()
+        self._queued = 0
+        if dropped:
+            log.warning(f"⚠️ Dropped {dropped} queued job(s) on shutdown")
+
+    def submit(self, chat_id: int, platform: str, run: Callable[[], Awaitable]) -> int:
+        """
+        Enqueue job
+
+        Returns:
+            int: jobs ahead of this one (0 = starts right away)
+        """
+        if self._queued >= self.max_queued:
+            raise QueueFullError("queue is full")
+
+        queue = self._queues.get(chat_id)
+        if queue is not None and len(queue) >= self.max_queued_per_chat:
+            raise QueueFullError("too many queued jobs for this chat")
+
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+
+        job = Job(chat_id, platform, run)
+        queue.append(job)
+        self._queued += 1
+
+        position = self.position(job)
+        log.info(f"📥 Job #{job.id} queued ({platform}, chat {chat_id}), position {position}")
+        self._wakeup.set()
+        return position
+
+    def pause(self) -> bool:
+        """
+        Free the slot of the job running in the current task, so a queued
+        job can start meanwhile. False if not inside a running job.
+        """
+        job = _current_job.get()
+        if job is None or not job.holds_slot:
+            return False
+        self._release(job)
+        log.info(f"⏸️ Job #{job.id} paused, slot freed")
+        self._wakeup.set()
+        return True
+
+    async def resume(self):
+        """Wait for a free slot for the paused job; it goes before queued jobs"""
+        job = _current_job.get()
+        if job is None or job.holds_slot:
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (job, future)
+        self._resuming.append(entry)
+        self._wakeup.set()
+        try:
+            await future
+        finally:
+            if entry in self._resuming:
+                self._resuming.remove(entry)
+        log.info(f"▶️ Job #{job.id} resumed")
+
+    def position(self, job: Job) -> int:
+        """Estimated number of jobs dispatched before this one (round-robin)"""
+        own = self._queues.get(job.chat_id)
+        if own is None or job not in own:
+            return 0
+
+        index = own.index(job)
+        ahead = index
+        for chat_id, queue in self._queues.items():
+            if chat_id != job.chat_id:
+                ahead += min(len(queue), index + 1)
+
+        # Якщо всі слоти зайняті - чекаємо ще й на них
+        if self._total_running() >= self.max_concurrent or not self._platform_free(job.platform):
+            ahead += 1
+        return ahead
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "queued": self._queued,
+            "running": dict(self._running),
+            "resuming": len(self._resuming),
+            "chats_waiting": len(self._queues),
+        }
+
+    # -----------------------------------------------------
+    # DISPATCH
+    # -----------------------------------------------------
+    def _total_running(self) -> int:
+        return sum(self._running.values())
+
+    def _platform_free(self, platform: str) -> bool:
+        limit = self.platform_limits.get(platform)
+        return limit is None or self._running.get(platform, 0) < limit
+
+    def _acquire(self, job: Job):
+        self._running[job.platform] = self._running.get(job.platform, 0) + 1
+        job.holds_slot = True
+
+    def _release(self, job: Job):
+        job.holds_slot = False
+        self._running[job.platform] -= 1
+        if not self._running[job.platform]:
+            del self._running[job.platform]
+
+    def _next_resumed(self) -> bool:
+        """Give a free slot to the first paused job whose platform has room"""
+        if self._total_running() >= self.max_concurrent:
+            return False
+        for entry in self._resuming:
+            job, future = entry
+            if future.done() or not self._platform_free(job.platform):
+                continue
+            self._resuming.remove(entry)
+            self._acquire(job)
+            future.set_result(None)
+            return True
+        return False
+
+    def _next_job(self) -> Optional[Job]:
+        """Pick next job: first chat in rotation whose head job has a free platform slot"""
+        if self._total_running() >= self.max_concurrent:
+            return None
+
+        for chat_id, queue in self._queues.items():
+            job = queue[0]
+            if not self._platform_free(job.platform):
+                continue
+
+            queue.popleft()
+            self._queued -= 1
+            if queue:
+                # Чат йде в кінець черги - round-robin
+                self._queues.move_to_end(chat_id)
+            else:
+                del self._queues[chat_id]
+            return job
+
+        return None
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Призупинені задачі вже тримають резерв диска - вони мають перевагу
+            while self._next_resumed():
+                pass
+
+            while True:
+                job = self._next_job()
+                if job is None:
+                    break
+                self._acquire(job)
+                task = asyncio.create_task(self._run(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job):
+        log.info(f"▶️ Job #{job.id} started ({job.platform}, chat {job.chat_id})")
+        _current_job.set(job)
+        try:
+            await job.run()
+        except Exception as e:
+            log.error(f"Job #{job.id} failed: {e}", exc_info=True)
+        finally:
+            # Задача могла завершитись призупиненою - тоді слот уже вільний
+            if job.holds_slot:
+                self._release(job)
+            self._wakeup.set()
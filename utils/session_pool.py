@@ -0,0 +1,197 @@
+"""Pool of warm, reusable client sessions (instaloader contexts etc.)"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger("ytbot")
+
+
+class PoolCoolingDown(Exception):
+    """Every slot is cooling down after rate limits"""
+
+
+class _Entry:
+    def __init__(self, session: Any, version: Any):
+        self.session = session
+        self.version = version
+        self.created = time.monotonic()
+        self.uses = 0
+
+
+class Lease:
+    """Checked-out session; the job reports how it went"""
+
+    def __init__(self, entry: _Entry):
+        self.entry = entry
+        self.session = entry.session
+        self.outcome = "ok"
+
+    def failed(self):
+        """Session is broken (connection errors, logged out) - replace it"""
+        self.outcome = "failed"
+
+    def rate_limited(self):
+        """Platform throttles this session - retire it and cool the slot down"""
+        self.outcome = "rate_limited"
+
+
+class SessionPool:
+    """
+    Keeps up to ``size`` sessions alive between jobs so connections stay
+    warm (keep-alive, TLS) and auth is set up once. A session is used by
+    one job at a time.
+
+    On checkout a session is health-checked: it is rebuilt when it is older
+    than ``max_age``, when ``version()`` changed (e.g. cookies reloaded) or
+    when ``health_check`` says no. A rate-limited session is closed and its
+    slot stays empty for ``cooldown`` seconds, so traffic rotates to the
+    other sessions; when all slots are cooling, lease() raises
+    PoolCoolingDown instead of hammering the platform.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        close: Callable[[Any], None] = lambda session: None,
+        size: int = 2,
+        max_age: float = 3600.0,
+        cooldown: float = 300.0,
+        wait_timeout: float = 60.0,
+        version: Callable[[], Any] = lambda: None,
+        health_check: Optional[Callable[[Any], bool]] = None,
+        name: str = "session",
+    ):
+        self.factory = factory
+        self.close_session = close
+        self.size = size
+        self.max_age = max_age
+        self.cooldown = cooldown
+        self.wait_timeout = wait_timeout
+        self.version = version
+        self.health_check = health_check
+        self.name = name
+
+        self._idle: List[_Entry] = []
+        self._busy = 0
+        self._cooling: List[float] = []
+        self._cond = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.replaced = 0
+        self.rate_limits = 0
+
+    # -----------------------------------------------------
+    # CHECKOUT
+    # -----------------------------------------------------
+    def _free_slots(self, now: float) -> int:
+        self._cooling = [until for until in self._cooling if until > now]
+        return self.size - self._busy - len(self._idle) - len(self._cooling)
+
+    def _acquire(self) -> _Entry:
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._free_slots(now) > 0:
+                    entry = None
+                    break
+                if len(self._cooling) == self.size:
+                    raise PoolCoolingDown(
+                        f"all {self.name} sessions are rate limited, next in {min(self._cooling) - now:.0f}s"
+                    )
+                if now >= deadline:
+                    raise TimeoutError(f"no free {self.name} session in {self.wait_timeout:.0f}s")
+                # Прокидаємося й без notify - слот може звільнитися після cooldown
+                self._cond.wait(min(deadline - now, 1.0))
+            self._busy += 1
+
+        try:
+            if entry is not None and not self._healthy(entry):
+                self._close(entry)
+                self.replaced += 1
+                entry = None
+            if entry is None:
+                entry = _Entry(self.factory(), self.version())
+                self.created += 1
+                log.info(f"🔌 New {self.name} session ({self.created} created)")
+            else:
+                self.reused += 1
+        except BaseException:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+        return entry
+
+    def _healthy(self, entry: _Entry) -> bool:
+        if time.monotonic() - entry.created > self.max_age:
+            return False
+        if entry.version != self.version():
+            return False
+        if self.health_check is not None:
+            try:
+                return self.health_check(entry.session)
+            except Exception as e:
+                log.warning(f"⚠️ {self.name} health check failed: {e}")
+                return False
+        return True
+
+    def _release(self, lease: Lease):
+        entry = lease.entry
+        entry.uses += 1
+        if lease.outcome != "ok":
+            self._close(entry)
+        with self._cond:
+            self._busy -= 1
+            if lease.outcome == "ok":
+                self._idle.append(entry)
+            elif lease.outcome == "rate_limited":
+                self.rate_limits += 1
+                self._cooling.append(time.monotonic() + self.cooldown)
+            else:
+                self.replaced += 1
+            self._cond.notify()
+        if lease.outcome == "rate_limited":
+            log.warning(f"🐢 {self.name} session rate limited, slot cooling down for {self.cooldown:.0f}s")
+
+    def _close(self, entry: _Entry):
+        try:
+            self.close_session(entry.session)
+        except Exception as e:
+            log.warning(f"⚠️ Could not close {self.name} session: {e}")
+
+    @contextmanager
+    def lease(self):
+        """with pool.lease() as lease: use lease.session, call lease.rate_limited()/failed() on errors"""
+        lease = Lease(self._acquire())
+        try:
+            yield lease
+        finally:
+            self._release(lease)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._close(entry)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "busy": self._busy,
+                "cooling": len([until for until in self._cooling if until > now]),
+                "created": self.created,
+                "reused": self.reused,
+                "replaced": self.replaced,
+                "rate_limits": self.rate_limits,
+            }
@@ -0,0 +1,92 @@
+"""Single-flight coalescing of concurrent requests for the same media"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+log = logging.getLogger("ytbot")
+
+
+class FlightJob:
+    """One in-flight download shared by every requester with the same key"""
+
+    def __init__(self, key: Optional[Hashable]):
+        self.key = key
+        self.listeners: List[Callable] = []
+        # Будує progress callback для status-повідомлення учасника (задає лідер)
+        self.renderer: Optional[Callable] = None
+        self.future = asyncio.get_running_loop().create_future()
+        self.error: Optional[BaseException] = None
+
+    @property
+    def followers(self) -> int:
+        return max(len(self.listeners) - 1, 0)
+
+    def progress(self, *args):
+        """Broadcast progress of the leader to all attached requesters (thread-safe)"""
+        for callback in list(self.listeners):
+            try:
+                callback(*args)
+            except Exception as e:
+                log.debug(f"Progress listener failed: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent jobs by key.
+
+    The first requester becomes the leader and does the work, later ones
+    attach to the running job, receive the same progress updates and get the
+    leader's result once it finishes.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[Hashable, FlightJob] = {}
+        self.coalesced = 0
+
+    def join(self, key: Optional[Hashable], progress_callback=None) -> Tuple[FlightJob, bool]:
+        """
+        Attach to the job for key
+
+        Returns:
+            Tuple[FlightJob, bool]: (job, is_leader)
+            key=None means "not coalescable" - always a fresh leader job.
+        """
+        job = self._jobs.get(key) if key is not None else None
+        leader = job is None
+
+        if leader:
+            job = FlightJob(key)
+            if key is not None:
+                self._jobs[key] = job
+        else:
+            self.coalesced += 1
+            log.info(f"🔗 Attached to in-flight job {key} ({job.followers + 1} waiting)")
+
+        if progress_callback:
+            job.listeners.append(progress_callback)
+
+        return job, leader
+
+    def has(self, key: Optional[Hashable]) -> bool:
+        """Is a job for key already running"""
+        return key is not None and key in self._jobs
+
+    def finish(self, job: FlightJob, result: Any = None, error: Optional[BaseException] = None):
+        """Publish leader result (or error) to followers"""
+        if job.key is not None and self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        job.error = error
+        if not job.future.done():
+            job.future.set_result(result)
+
+    async def wait(self, job: FlightJob) -> Any:
+        """Wait for the leader (cancelling a follower doesn't cancel the job)"""
+        return await asyncio.shield(job.future)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._jobs),
+            "waiting": sum(job.followers for job in self._jobs.values()),
+            "coalesced": self.coalesced,
+        }
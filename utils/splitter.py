@@ -0,0 +1,275 @@
+"""Lossless splitting of oversized videos into parts at keyframes"""
+
+import asyncio
+import bisect
+import json
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger("ytbot")
+
+# Зсув від точки розрізу, щоб seek не зісковзнув на попередній keyframe через округлення
+SEEK_EPSILON = 0.001
+
+
+class SplitError(Exception):
+    """Video can't be split into parts under the limit"""
+
+
+class VideoLayout:
+    """
+    Keyframe positions and byte layout of a video (from one ffprobe pass
+    over packets). Times are relative to the file start, as ffmpeg -ss
+    expects them.
+    """
+
+    def __init__(self, keyframes: List[float], times: List[float], sizes: List[int], duration: float):
+        self.keyframes = keyframes
+        self.duration = duration
+        self._times = times
+        self._prefix = [0]
+        for size in sizes:
+            self._prefix.append(self._prefix[-1] + size)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._prefix[-1]
+
+    def bytes_between(self, start: float, end: Optional[float]) -> int:
+        """Payload bytes of all streams with start <= t < end (end=None - to the end)"""
+        lo = bisect.bisect_left(self._times, start)
+        hi = len(self._times) if end is None else bisect.bisect_left(self._times, end)
+        return self._prefix[hi] - self._prefix[lo]
+
+    def next_cut(self, start: int, budget: int) -> Optional[int]:
+        """
+        Index of the furthest keyframe after keyframes[start] that keeps the
+        part within budget, None if the rest of the video fits.
+        """
+        begin = self.keyframes[start]
+        if self.bytes_between(begin, None) <= budget:
+            return None
+
+        # Байти частини ростуть разом з кінцем - бінарний пошук по keyframes
+        lo, hi = start + 1, len(self.keyframes) - 1
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if self.bytes_between(begin, self.keyframes[mid]) <= budget:
+                best = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        if best is None:
+            raise SplitError(f"keyframe interval at {begin:.1f}s is larger than {budget / 1024 / 1024:.0f} MB")
+        return best
+
+    def plan(self, start: int, budget: int) -> List[int]:
+        """Start keyframe indexes of all parts from ``start`` on"""
+        starts = [start]
+        while True:
+            cut = self.next_cut(starts[-1], budget)
+            if cut is None:
+                return starts
+            starts.append(cut)
+
+
+class VideoSplitter:
+    """
+    Cuts a video that is over the Telegram limit into parts that fit, with
+    stream copy only (ffmpeg -c copy): no re-encode, CPU cost is a file copy.
+
+    Cut points are keyframes, chosen from ffprobe's packet sizes so every
+    part carries as much as possible without going over ``max_size`` minus
+    ``margin`` (container overhead). A part that still comes out too big is
+    cut again with a smaller budget. Parts are produced one ahead of the
+    consumer: part N+1 is being cut while part N uploads, and at most two
+    parts are on disk at a time.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        margin: float = 0.03,
+        extensions: Iterable[str] = (".mp4",),
+        ffmpeg: str = "ffmpeg",
+        ffprobe: str = "ffprobe",
+        attempts: int = 3,
+    ):
+        self.max_size = max_size
+        self.margin = margin
+        self.extensions = {ext.lower() for ext in extensions}
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.attempts = attempts
+
+        self.splits = 0
+        self.parts = 0
+        self.failed = 0
+        self.recuts = 0
+        self.cut_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(shutil.which(self.ffmpeg) and shutil.which(self.ffprobe))
+
+    def can_split(self, fp: Path) -> bool:
+        return fp.suffix.lower() in self.extensions and self.available
+
+    # -----------------------------------------------------
+    # PROBE / CUT (worker thread)
+    # -----------------------------------------------------
+    def _run(self, args: List[str]) -> bytes:
+        result = subprocess.run(args, capture_output=True)
+        if result.returncode != 0:
+            raise SplitError(result.stderr.decode(errors="replace").strip()[-300:] or f"{args[0]} failed")
+        return result.stdout
+
+    def probe(self, fp: Path) -> VideoLayout:
+        meta = json.loads(self._run([
+            self.ffprobe, "-v", "error", "-show_entries", "stream=index,codec_type:format=start_time,duration",
+            "-of", "json", str(fp),
+        ]))
+        video = next((s["index"] for s in meta.get("streams", []) if s.get("codec_type") == "video"), None)
+        if video is None:
+            raise SplitError("no video stream")
+        fmt = meta.get("format") or {}
+        origin = float(fmt.get("start_time") or 0)
+        duration = float(fmt.get("duration") or 0)
+
+        output = self._run([
+            self.ffprobe, "-v", "error", "-show_entries", "packet=stream_index,pts_time,dts_time,size,flags",
+            "-of", "compact=p=0", str(fp),
+        ])
+        packets, keyframes = [], []
+        for line in output.decode(errors="replace").splitlines():
+            fields = dict(item.split("=", 1) for item in line.split("|") if "=" in item)
+            stamp = fields.get("pts_time", "N/A")
+            if stamp == "N/A":
+                stamp = fields.get("dts_time", "N/A")
+            if stamp == "N/A" or not fields.get("size", "").isdigit():
+                continue
+            t = float(stamp) - origin
+            packets.append((t, int(fields["size"])))
+            if fields.get("stream_index") == str(video) and "K" in fields.get("flags", ""):
+                keyframes.append(t)
+
+        if not keyframes:
+            raise SplitError("no keyframes found")
+        packets.sort()
+        keyframes = sorted(set(keyframes))
+        # Пакети до першого keyframe (аудіо трохи раніше) - теж у першу частину
+        keyframes[0] = min(keyframes[0], packets[0][0])
+        return VideoLayout(keyframes, [p[0] for p in packets], [p[1] for p in packets], duration)
+
+    def cut(self, src: Path, dest: Path, start: float, end: Optional[float]):
+        args = [self.ffmpeg, "-y", "-loglevel", "error"]
+        if start > 0:
+            args += ["-ss", f"{start + SEEK_EPSILON:.6f}"]
+        args += ["-i", str(src)]
+        if end is not None:
+            args += ["-t", f"{end - start:.6f}"]
+        args += [
+            "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+            "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", str(dest),
+        ]
+        started = time.monotonic()
+        try:
+            self._run(args)
+        except SplitError:
+            dest.unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.cut_seconds += time.monotonic() - started
+
+    def _cut_part(self, src: Path, dest: Path, layout: VideoLayout, start: int, budget: int) -> Tuple[Optional[int], int]:
+        """Cut one part starting at keyframe ``start``: (next start index, budget used)"""
+        for _ in range(self.attempts):
+            end = layout.next_cut(start, budget)
+            self.cut(src, dest, layout.keyframes[start], None if end is None else layout.keyframes[end])
+            if dest.stat().st_size <= self.max_size:
+                return end, budget
+            # Контейнер вийшов більшим за оцінку - ріжемо коротше
+            with self._lock:
+                self.recuts += 1
+            budget = int(budget * 0.95)
+        raise SplitError(f"part {dest.name} stays over {self.max_size / 1024 / 1024:.0f} MB")
+
+    # -----------------------------------------------------
+    # PIPELINE (event loop)
+    # -----------------------------------------------------
+    async def split(self, fp: Path, out_dir: Optional[Path] = None) -> AsyncIterator[Tuple[int, int, Path]]:
+        """
+        Yield (number, total, path) of parts in order while the next part is
+        being cut. total can grow if a part had to be cut again. The
+        consumer deletes a part when done with it.
+        """
+        out_dir = out_dir or fp.parent
+        layout = await asyncio.to_thread(self.probe, fp)
+        budget = int(self.max_size * (1 - self.margin))
+        starts = layout.plan(0, budget)
+        log.info(
+            f"✂️ Splitting {fp.name} ({fp.stat().st_size / 1024 / 1024:.0f} MB) into {len(starts)} parts, "
+            f"{len(layout.keyframes)} keyframes"
+        )
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        async def produce():
+            nonlocal budget, starts
+            number, start = 1, 0
+            try:
+                while start is not None:
+                    dest = out_dir / f"{fp.stem}_part{number:02d}{fp.suffix}"
+                    end, used = await asyncio.to_thread(self._cut_part, fp, dest, layout, start, budget)
+                    if used != budget:
+                        # Бюджет зменшився - решту частин перераховуємо
+                        budget = used
+                        starts = starts[:number] + (layout.plan(end, budget) if end is not None else [])
+                    await queue.put((number, max(len(starts), number), dest))
+                    # Наступну частину ріжемо лише коли попередню забрали - на диску не більше двох
+                    await queue.join()
+                    number, start = number + 1, end
+                await queue.put(None)
+            except Exception as e:
+                # Споживач живий (інакше нас скасували б) - помилка дійде до нього
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                queue.task_done()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                with self._lock:
+                    self.parts += 1
+                yield item
+            with self._lock:
+                self.splits += 1
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "available": self.available,
+                "splits": self.splits,
+                "parts": self.parts,
+                "failed": self.failed,
+                "recuts": self.recuts,
+                "cut_seconds": round(self.cut_seconds, 1),
+            }
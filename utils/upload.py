@@ -1,36 +1,262 @@
 """Upload utilities for large files"""
 
+import asyncio
 import logging
+import random
+import time
 from pathlib import Path
+from typing import Dict, List, Optional
+
 import aiohttp
 
+from .multipart import CHUNK_SIZE, MultipartBody
+
 log = logging.getLogger("ytbot")
 
+GOFILE_API_URL = "https://api.gofile.io"
+GOFILE_UPLOAD_URL = "https://{server}.gofile.io/contents/uploadfile"
+
+
+class GofileError(Exception):
+    """gofile.io refused a request; ``transient`` - worth trying again"""
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        self.transient = transient
+
+
+class GofileUploader:
+    """
+    Uploads files to gofile.io over one pooled aiohttp session.
+
+    The server list (/servers) is cached and refreshed in the background
+    every ``refresh_interval``, an upload never waits for it unless the
+    cache is empty or long stale. gofile does not publish server load, so
+    the pick is by our own traffic: the server with the fewest uploads in
+    flight from this process, servers that failed within ``error_ttl``
+    last.
+
+    The file is streamed from disk in ``chunk_size`` pieces with a known
+    Content-Length. gofile has no resumable uploads, so a failed upload
+    starts over on the next best server, with exponential backoff + jitter
+    between attempts.
+
+    ``api_url`` and ``upload_url`` (``{server}`` is substituted) can point
+    at a local stand-in server for tests and benchmarks.
+    """
+
+    def __init__(
+        self,
+        api_url: str = GOFILE_API_URL,
+        upload_url: str = GOFILE_UPLOAD_URL,
+        refresh_interval: float = 300.0,
+        attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 30.0,
+        chunk_size: int = CHUNK_SIZE,
+        connect_timeout: float = 30.0,
+        read_timeout: float = 300.0,
+        pool_size: int = 10,
+        error_ttl: float = 600.0,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.upload_url = upload_url
+        self.refresh_interval = refresh_interval
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.chunk_size = chunk_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.error_ttl = error_ttl
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._servers: List[str] = []
+        self._servers_at = 0.0
+        self._refreshing: Optional[asyncio.Future] = None
+        self._active: Dict[str, int] = {}
+        self._failed_at: Dict[str, float] = {}
+
+        self.uploads = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.refreshes = 0
+        self.upload_seconds = 0.0
+
+    # -----------------------------------------------------
+    # LIFECYCLE
+    # -----------------------------------------------------
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                # Без total - великий файл вантажиться довго; обмежуємо лише тишу в сокеті
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning(f"⚠️ gofile server list refresh failed: [{type(e).__name__}] {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    # -----------------------------------------------------
+    # SERVERS
+    # -----------------------------------------------------
+    async def refresh(self) -> List[str]:
+        """Fetch the server list; concurrent callers share one request"""
+        if self._refreshing is not None:
+            return await asyncio.shield(self._refreshing)
+
+        self._refreshing = asyncio.get_running_loop().create_future()
+        try:
+            async with self._get_session().get(f"{self.api_url}/servers") as response:
+                data = await response.json(content_type=None)
+            if data.get("status") != "ok":
+                raise GofileError(f"/servers: {data.get('status')}", transient=True)
+            servers = [server["name"] for server in data["data"]["servers"]]
+            if not servers:
+                raise GofileError("/servers: empty list", transient=True)
+        except asyncio.CancelledError:
+            self._refreshing.cancel()
+            raise
+        except Exception as e:
+            self._refreshing.set_exception(e)
+            # Виняток уже піднімається тут - щоб asyncio не скаржився на непрочитаний
+            self._refreshing.exception()
+            raise
+        else:
+            self._servers = servers
+            self._servers_at = time.monotonic()
+            self.refreshes += 1
+            self._refreshing.set_result(servers)
+            return servers
+        finally:
+            self._refreshing = None
+
+    async def servers(self) -> List[str]:
+        """Cached server list, fetched only if empty or stale for two refresh periods"""
+        if self._servers and time.monotonic() - self._servers_at < 2 * self.refresh_interval:
+            return self._servers
+        try:
+            return await self.refresh()
+        except Exception:
+            if not self._servers:
+                raise
+            # Старий список краще, ніж жодного
+            log.warning("⚠️ gofile server list is stale, using cached one")
+            return self._servers
+
+    def pick(self, servers: List[str], tried: List[str]) -> str:
+        """Least loaded server: not tried in this upload, healthy, fewest uploads in flight"""
+        now = time.monotonic()
+        candidates = [s for s in servers if s not in tried] or servers
+        return min(
+            candidates,
+            key=lambda s: (
+                now - self._failed_at.get(s, -self.error_ttl) < self.error_ttl,
+                self._active.get(s, 0),
+                servers.index(s),
+            ),
+        )
+
+    # -----------------------------------------------------
+    # UPLOAD
+    # -----------------------------------------------------
+    async def upload(self, filepath: Path) -> str:
+        """Upload a file, return its download page URL"""
+        size = filepath.stat().st_size
+        tried: List[str] = []
+        for attempt in range(1, self.attempts + 1):
+            server = self.pick(await self.servers(), tried)
+            tried.append(server)
+            self._active[server] = self._active.get(server, 0) + 1
+            started = time.monotonic()
+            try:
+                link = await self._upload_once(server, filepath)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, GofileError) as e:
+                self._failed_at[server] = time.monotonic()
+                transient = not isinstance(e, GofileError) or e.transient
+                if attempt == self.attempts or not transient:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                log.warning(
+                    f"⚠️ gofile upload to {server}: attempt {attempt}/{self.attempts} failed "
+                    f"[{type(e).__name__}] {e}, retry in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                self._active[server] -= 1
+
+            elapsed = time.monotonic() - started
+            self.uploads += 1
+            self.bytes_sent += size
+            self.upload_seconds += elapsed
+            log.info(f"🔗 Uploaded {filepath.name} ({size / 1024 / 1024:.1f} MB) to gofile {server} in {elapsed:.1f}s")
+            return link
+
+    async def _upload_once(self, server: str, filepath: Path) -> str:
+        body = MultipartBody({}, {"file": filepath}, self.chunk_size)
+        headers = {"Content-Type": body.content_type, "Content-Length": str(len(body))}
+        url = self.upload_url.format(server=server)
+        async with self._get_session().post(url, data=body, headers=headers) as response:
+            if response.status == 429 or response.status >= 500:
+                raise GofileError(f"HTTP {response.status}", transient=True)
+            result = await response.json(content_type=None)
+        if result.get("status") != "ok":
+            raise GofileError(f"Upload failed: {result}")
+        return result["data"]["downloadPage"]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "uploads": self.uploads,
+            "failed": self.failed,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "upload_seconds": round(self.upload_seconds, 1),
+            "servers": len(self._servers),
+            "refreshes": self.refreshes,
+            "in_flight": sum(self._active.values()),
+        }
+
 
 async def upload_to_gofile(filepath: Path) -> str:
     """
-    Upload file to gofile.io (more reliable than file.io)
-    
-    Args:
-        filepath: Path to file to upload
-    
-    Returns:
-        str: Download URL
+    One-off upload to gofile.io with a throwaway GofileUploader.
+
+    Long-running code should keep one GofileUploader instead - it pools
+    connections and caches the server list.
     """
-    async with aiohttp.ClientSession() as session:
-        # Get server
-        async with session.get('https://api.gofile.io/servers') as resp:
-            data = await resp.json()
-            server = data['data']['servers'][0]['name']
-        
-        # Upload file
-        with open(filepath, 'rb') as f:
-            form = aiohttp.FormData()
-            form.add_field('file', f, filename=filepath.name)
-            
-            async with session.post(f'https://{server}.gofile.io/contents/uploadfile', data=form) as resp:
-                result = await resp.json()
-                if result['status'] != 'ok':
-                    raise Exception(f"Upload failed: {result}")
-                
-                return result['data']['downloadPage']
+    uploader = GofileUploader()
+    try:
+        return await uploader.upload(filepath)
+    finally:
+        await uploader.close()
@@ -0,0 +1,88 @@
+"""Embedded aiohttp server for Telegram webhook delivery"""
+
+import hmac
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+
+log = logging.getLogger("ytbot")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Receives updates from Telegram and puts them straight into the
+    Application update queue (same pipeline as polling).
+
+    Routes:
+        POST <path>   - Telegram updates, checked against secret token
+        GET  /healthz - liveness/readiness + optional stats (async health())
+    """
+
+    def __init__(
+        self,
+        application,
+        secret_token: str,
+        path: str = "/telegram",
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        health: Optional[Callable[[], Awaitable[Dict]]] = None,
+    ):
+        self.application = application
+        self.secret_token = secret_token
+        self.path = path
+        self.host = host
+        self.port = port
+        self.health = health
+
+        self.received = 0
+        self.rejected = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        web_app = web.Application()
+        web_app.router.add_post(self.path, self._handle_update)
+        web_app.router.add_get("/healthz", self._handle_health)
+
+        self._runner = web.AppRunner(web_app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        log.info(f"🌐 Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            log.warning(f"🚫 Webhook request with invalid secret from {request.remote}")
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            log.warning(f"⚠️ Invalid webhook payload: {e}")
+            return web.Response(status=400)
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response(status=200)
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        body = {
+            "status": "ok" if self.application.running else "starting",
+            "updates_received": self.received,
+            "updates_rejected": self.rejected,
+        }
+        if self.health:
+            body.update(await self.health())
+        return web.json_response(body, status=200 if self.application.running else 503)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Download worker for durable job queue mode
+Забирає задачі з JOB_BACKEND черги (sqlite/redis), качає та надсилає результат.
+Запускається окремо від app.py, масштабується кількістю процесів/нод.
+"""
+
+import os
+import signal
+import asyncio
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+import app
+from utils import cleanup_old_files
+from app import log, JOB_BACKEND, JOB_QUEUE, PROGRESS, FILE_CACHE, DELIVERY, LOCAL_API, JANITOR, GOFILE
+
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+STALE_JOB_MINUTES = int(os.getenv("WORKER_STALE_JOB_MINUTES", "120"))
+
+
+async def heartbeat(job, interval: float):
+    """Extend visibility timeout while the job is running"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(JOB_QUEUE.extend, job)
+
+
+async def process(bot: Bot, job):
+    """Run one queued job: download + delivery"""
+    payload = job.payload
+    chat_id = payload["chat_id"]
+    status_msg = app.status_message(bot, chat_id, payload["status_message_id"])
+
+    log.info(f"▶️ Job {job.id} started ({payload['platform']}, chat {chat_id}, attempt {job.attempts})")
+
+    beat = asyncio.create_task(heartbeat(job, JOB_QUEUE.visibility_timeout / 3))
+    try:
+        # Помилки завантаження download_* вже показує користувачу - це фінальний
+        # результат; повторюємо лише коли впав сам обробник (мережа, Telegram)
+        await app.run_download(
+            bot,
+            chat_id,
+            payload["platform"],
+            payload["url"],
+            payload["mode"],
+            payload["quality"],
+            status_msg=status_msg,
+        )
+    except Exception as e:
+        log.error(f"Job {job.id} failed: {e}", exc_info=True)
+        retried = await asyncio.to_thread(JOB_QUEUE.nack, job, str(e))
+        if not retried:
+            await app.safe_edit_message(status_msg, "❌ Не вдалося обробити запит, спробуйте пізніше", final=True)
+        return
+    finally:
+        beat.cancel()
+
+    await asyncio.to_thread(JOB_QUEUE.ack, job)
+    log.info(f"✅ Job {job.id} done")
+
+
+async def worker_loop(bot: Bot, n: int, stop: asyncio.Event):
+    while not stop.is_set():
+        job = await asyncio.to_thread(JOB_QUEUE.reserve)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await process(bot, job)
+    log.info(f"👋 Worker {n} stopped")
+
+
+async def run():
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN not set")
+    if JOB_QUEUE is None:
+        raise RuntimeError("JOB_BACKEND must be 'sqlite' or 'redis' for worker mode")
+
+    bot = Bot(
+        token,
+        base_url=app.BOT_API_URL,
+        base_file_url=app.BOT_API_FILE_URL,
+        local_mode=LOCAL_API is not None,
+        request=HTTPXRequest(connection_pool_size=WORKER_CONCURRENCY * 4),
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with bot:
+        await PROGRESS.start()
+        await JANITOR.start()
+        await GOFILE.start()
+        try:
+            log.info(f"🛠️ Worker started: {WORKER_CONCURRENCY} slots, backend {JOB_BACKEND}")
+            # Поточні задачі доробляємо, нові не беремо
+            await asyncio.gather(*(worker_loop(bot, n, stop) for n in range(WORKER_CONCURRENCY)))
+        finally:
+            await JANITOR.stop()
+            await GOFILE.stop()
+            await PROGRESS.stop()
+            await DELIVERY.close()
+            await app.RESOLVER.close()
+
+
+def main():
+    # downloads/ не чистимо повністю: на ноді можуть працювати інші воркери,
+    # тільки директорії задач, залишені після падіння
+    cleanup_old_files(app.DOWNLOAD_DIR, max_age_minutes=STALE_JOB_MINUTES)
+    if LOCAL_API:
+        LOCAL_API.sweep()
+    try:
+        asyncio.run(run())
+    finally:
+        app.EXECUTOR.shutdown()
+        if app.PROCESSES:
+            app.PROCESSES.shutdown()
+        if app.INSTALOADER_POOL:
+            app.INSTALOADER_POOL.close()
+        log.info(f"📊 Job queue: {JOB_QUEUE.stats() if JOB_QUEUE else None}")
+        log.info(f"📊 File cache: {FILE_CACHE.stats()}")
+        FILE_CACHE.close()
+        if app.ARTIFACTS:
+            log.info(f"📊 Artifacts: {app.ARTIFACTS.stats()}")
+            app.ARTIFACTS.close()
+        if JOB_QUEUE is not None:
+            JOB_QUEUE.close()
+
+
+if __name__ == "__main__":
+    main()